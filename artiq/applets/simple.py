@@ -10,6 +10,8 @@ from sipyco.sync_struct import Subscriber, process_mod
 from sipyco import pyon
 from sipyco.pipe_ipc import AsyncioChildComm
 
+from artiq.master.publisher import filtered_name
+
 
 logger = logging.getLogger(__name__)
 
@@ -113,6 +115,8 @@ class SimpleApplet:
         self.embed = os.getenv("ARTIQ_APPLET_EMBED")
         self.datasets = {getattr(self.args, arg.replace("-", "_"))
                          for arg in self.dataset_args}
+        # optional datasets that were not given
+        self.datasets.discard(None)
 
     def qasync_init(self):
         app = QtWidgets.QApplication([])
@@ -197,18 +201,36 @@ class SimpleApplet:
         else:
             self.emit_data_changed(self.data, [mod])
 
+    async def connect_subscriber(self, notifier_name):
+        subscriber = Subscriber(notifier_name, self.sub_init, self.sub_mod,
+                                disconnect_cb=lambda: self.sub_disconnect(
+                                    subscriber, notifier_name))
+        self.subscriber = subscriber
+        await subscriber.connect(self.args.server, self.args.port)
+
+    def sub_disconnect(self, subscriber, notifier_name):
+        # Masters that do not serve filtered notifier names (e.g. with the
+        # publisher of sipyco) close the connection before sending the
+        # initial structure. All datasets are then subscribed to, and
+        # filtered by filter_mod.
+        if (subscriber is self.subscriber and self.data is None
+                and notifier_name != "datasets"):
+            logger.warning("master does not support filtered dataset "
+                           "subscriptions, subscribing to all datasets")
+            asyncio.ensure_future(self.connect_subscriber("datasets"))
+
     def subscribe(self):
         if self.embed is None:
-            self.subscriber = Subscriber("datasets",
-                                         self.sub_init, self.sub_mod)
-            self.loop.run_until_complete(self.subscriber.connect(
-                self.args.server, self.args.port))
+            self.data = None
+            self.loop.run_until_complete(self.connect_subscriber(
+                filtered_name("datasets", keys=self.datasets)))
         else:
             self.ipc.subscribe(self.datasets, self.sub_init, self.sub_mod)
 
     def unsubscribe(self):
         if self.embed is None:
-            self.loop.run_until_complete(self.subscriber.close())
+            subscriber, self.subscriber = self.subscriber, None
+            self.loop.run_until_complete(subscriber.close())
 
     def run(self):
         self.args_init()
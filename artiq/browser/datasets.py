@@ -8,6 +8,7 @@ from sipyco.pc_rpc import AsyncioClient as RPCClient
 from artiq.tools import short_format
 from artiq.gui.tools import LayoutWidget, QRecursiveFilterProxyModel
 from artiq.gui.models import DictSyncTreeSepModel
+from artiq.gui.lazy_datasets import LazyDataset, resolve
 
 # reduced read-only version of artiq.dashboard.datasets
 
@@ -20,6 +21,8 @@ class Model(DictSyncTreeSepModel):
         DictSyncTreeSepModel.__init__(self, ".", ["Dataset", "Value"], init)
 
     def convert(self, k, v, column):
+        if isinstance(v[1], LazyDataset):
+            return v[1].describe()
         return short_format(v[1])
 
 
@@ -85,6 +88,8 @@ class DatasetsDock(QtWidgets.QDockWidget):
     async def _upload_dataset(self, name, value,):
         logger.info("Uploading dataset '%s' to master...", name)
         try:
+            value = await asyncio.get_event_loop().run_in_executor(
+                None, resolve, value)
             remote = RPCClient()
             await remote.connect_rpc(self.master_host, self.master_port,
                                      "master_dataset_db")
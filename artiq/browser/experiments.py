@@ -12,6 +12,7 @@ from sipyco import pyon
 from artiq import __artiq_dir__ as artiq_dir
 from artiq.gui.tools import LayoutWidget, log_level_to_name, get_open_file_name
 from artiq.gui.entries import procdesc_to_entry
+from artiq.gui.lazy_datasets import resolve
 from artiq.master.worker import Worker, log_worker_exception
 
 logger = logging.getLogger(__name__)
@@ -386,7 +387,7 @@ class LocalDatasetDB:
         self._data = data
 
     def get(self, key):
-        return self._data.backing_store[key][1]
+        return resolve(self._data.backing_store[key][1])
 
     def update(self, mod):
         self.datasets_sub.update(mod)
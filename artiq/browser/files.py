@@ -1,5 +1,6 @@
 import logging
 import os
+from collections import OrderedDict
 from datetime import datetime
 
 import h5py
@@ -7,6 +8,11 @@ from PyQt5 import QtCore, QtWidgets, QtGui
 
 from sipyco import pyon
 
+from artiq.tools import get_user_config_dir
+from artiq.gui import lazy_datasets
+from artiq.master.results_catalog import (
+    ResultsCatalog, CatalogIndexer, find_catalog)
+
 
 logger = logging.getLogger(__name__)
 
@@ -25,32 +31,6 @@ def open_h5(info):
                        exc_info=True)
 
 
-class ThumbnailIconProvider(QtWidgets.QFileIconProvider):
-    def icon(self, info):
-        icon = self.hdf5_thumbnail(info)
-        if icon is None:
-            icon = QtWidgets.QFileIconProvider.icon(self, info)
-        return icon
-
-    def hdf5_thumbnail(self, info):
-        f = open_h5(info)
-        if not f:
-            return
-        with f:
-            try:
-                t = f["datasets/thumbnail"]
-            except KeyError:
-                return
-            try:
-                img = QtGui.QImage.fromData(t[()])
-            except:
-                logger.warning("unable to read thumbnail from %s",
-                               info.filePath(), exc_info=True)
-                return
-            pix = QtGui.QPixmap.fromImage(img)
-            return QtGui.QIcon(pix)
-
-
 class DirsOnlyProxy(QtCore.QSortFilterProxyModel):
     def filterAcceptsRow(self, row, parent):
         idx = self.sourceModel().index(row, 0, parent)
@@ -89,30 +69,103 @@ class ZoomIconView(QtWidgets.QListView):
 
 
 class Hdf5FileSystemModel(QtWidgets.QFileSystemModel):
-    def __init__(self):
+    """File system model showing the metadata and thumbnails of HDF5 results
+    files.
+
+    The metadata and thumbnails are read from the results catalog by a
+    background indexer, which also adds missing or stale files to the
+    catalog. Until the indexer has processed a file, the file is shown
+    without tooltip and with the default icon. Files that cannot be read
+    (e.g. while they are being written) are requested again once they
+    change.
+    """
+    cache_size = 1000
+
+    _indexed = QtCore.pyqtSignal(str, object, object)
+
+    def __init__(self, catalog):
         QtWidgets.QFileSystemModel.__init__(self)
         self.setFilter(QtCore.QDir.Drives | QtCore.QDir.NoDotAndDotDot |
                        QtCore.QDir.AllDirs | QtCore.QDir.Files)
         self.setNameFilterDisables(False)
-        self.setIconProvider(ThumbnailIconProvider())
+
+        # LRU cache of (entry, icon) indexed by (path, size, mtime); entry
+        # is None for files that could not be read
+        self._cache = OrderedDict()
+        # keys of the files requested from the indexer
+        self._pending = set()
+        self._indexed.connect(self._file_indexed)
+        self.indexer = CatalogIndexer(catalog, self._index_callback)
+        self.directoryLoaded.connect(self.indexer.request)
+
+    def close(self):
+        self.indexer.close()
+        self.indexer.catalog.close()
+
+    def _index_callback(self, filename, entry):
+        # Runs in the indexer thread.
+        image = None
+        if entry is not None and entry["has_thumbnail"]:
+            data = self.indexer.catalog.thumbnail(filename)
+            if data is not None:
+                image = QtGui.QImage.fromData(data)
+                if image.isNull():
+                    logger.warning("unable to read thumbnail from %s",
+                                   filename)
+                    image = None
+        self._indexed.emit(filename, entry, image)
+
+    def _file_indexed(self, filename, entry, image):
+        info = QtCore.QFileInfo(filename)
+        key = self._cache_key(info)
+        self._pending.discard(key)
+        icon = None
+        if image is not None:
+            icon = QtGui.QIcon(QtGui.QPixmap.fromImage(image))
+        self._cache[key] = entry, icon
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        idx = self.index(filename)
+        if idx.isValid():
+            self.dataChanged.emit(idx, idx, [QtCore.Qt.ToolTipRole,
+                                             QtCore.Qt.DecorationRole])
+
+    @staticmethod
+    def _cache_key(info):
+        return (info.absoluteFilePath(), info.size(),
+                info.lastModified().toMSecsSinceEpoch())
+
+    def _cached(self, info):
+        if not (info.isFile() and info.suffix() == "h5"):
+            return None
+        key = self._cache_key(info)
+        try:
+            self._cache.move_to_end(key)
+        except KeyError:
+            if key not in self._pending:
+                self._pending.add(key)
+                self.indexer.request(info.absoluteFilePath())
+            return None
+        return self._cache[key]
 
     def data(self, idx, role):
         if role == QtCore.Qt.ToolTipRole:
-            info = self.fileInfo(idx)
-            h5 = open_h5(info)
-            if h5 is not None:
-                try:
-                    expid = pyon.decode(h5["expid"][()])
-                    start_time = datetime.fromtimestamp(h5["start_time"][()])
-                    v = ("artiq_version: {}\nrepo_rev: {}\nfile: {}\n"
-                         "class_name: {}\nrid: {}\nstart_time: {}").format(
-                             h5["artiq_version"][()], expid["repo_rev"],
-                             expid.get("file", "<none>"), expid["class_name"],
-                             h5["rid"][()], start_time)
-                    return v
-                except:
-                    logger.warning("unable to read metadata from %s",
-                                   info.filePath(), exc_info=True)
+            cached = self._cached(self.fileInfo(idx))
+            if (cached is not None and cached[0] is not None
+                    and cached[0]["expid"] is not None):
+                entry = cached[0]
+                expid = entry["expid"]
+                start_time = datetime.fromtimestamp(entry["start_time"])
+                v = ("artiq_version: {}\nrepo_rev: {}\nfile: {}\n"
+                     "class_name: {}\nrid: {}\nstart_time: {}").format(
+                         entry["artiq_version"], expid.get("repo_rev"),
+                         expid.get("file", "<none>"), expid.get("class_name"),
+                         entry["rid"], start_time)
+                return v
+        elif role == QtCore.Qt.DecorationRole and idx.column() == 0:
+            cached = self._cached(self.fileInfo(idx))
+            if cached is not None and cached[1] is not None:
+                return cached[1]
         return QtWidgets.QFileSystemModel.data(self, idx, role)
 
 
@@ -121,7 +174,7 @@ class FilesDock(QtWidgets.QDockWidget):
     dataset_changed = QtCore.pyqtSignal(str)
     metadata_changed = QtCore.pyqtSignal(dict)
 
-    def __init__(self, datasets, browse_root=""):
+    def __init__(self, datasets, browse_root="", catalog_file=None):
         QtWidgets.QDockWidget.__init__(self, "Files")
         self.setObjectName("Files")
         self.setFeatures(self.DockWidgetMovable | self.DockWidgetFloatable)
@@ -131,7 +184,12 @@ class FilesDock(QtWidgets.QDockWidget):
 
         self.datasets = datasets
 
-        self.model = Hdf5FileSystemModel()
+        if catalog_file is None and browse_root != "":
+            catalog_file = find_catalog(browse_root)
+        if catalog_file is None:
+            catalog_file = os.path.join(get_user_config_dir(),
+                                        "artiq_browser_catalog.sqlite")
+        self.model = Hdf5FileSystemModel(ResultsCatalog(catalog_file))
 
         self.rt = QtWidgets.QTreeView()
         rt_model = DirsOnlyProxy()
@@ -189,24 +247,7 @@ class FilesDock(QtWidgets.QDockWidget):
                 logger.warning("unable to read metadata from %s",
                                info.filePath(), exc_info=True)
 
-            rd = {}
-            if "archive" in f:
-                def visitor(k, v):
-                    if isinstance(v, h5py.Dataset):
-                        rd[k] = (True, v[()])
-
-                f["archive"].visititems(visitor)
-
-            if "datasets" in f:
-                def visitor(k, v):
-                    if isinstance(v, h5py.Dataset):
-                        if k in rd:
-                            logger.warning("dataset '%s' is both in archive "
-                                           "and outputs", k)
-                        rd[k] = (True, v[()])
-
-                f["datasets"].visititems(visitor)
-
+            rd = lazy_datasets.list_datasets(f)
             self.datasets.init(rd)
 
         self.dataset_changed.emit(info.filePath())
@@ -265,6 +306,9 @@ class FilesDock(QtWidgets.QDockWidget):
             return
         self.rl.setCurrentIndex(idx)
 
+    def close_catalog(self):
+        self.model.close()
+
     def save_state(self):
         state = {
             "dir": self.model.filePath(self.rl.rootIndex()),
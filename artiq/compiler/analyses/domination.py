@@ -5,6 +5,30 @@ control flow graphs.
 See http://www.cs.rice.edu/~keith/EMBED/dom.pdf.
 """
 
+def _traverse_in_postorder(roots, next_blocks):
+    # Equivalent to a recursive depth-first traversal, but does not
+    # exhaust the Python stack on large (e.g. unrolled) functions.
+    postorder = []
+
+    visited = set()
+    for root in roots:
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(next_blocks(root)))]
+        while stack:
+            block, next_block_iter = stack[-1]
+            for next_block in next_block_iter:
+                if next_block not in visited:
+                    visited.add(next_block)
+                    stack.append((next_block, iter(next_blocks(next_block))))
+                    break
+            else:
+                stack.pop()
+                postorder.append(block)
+
+    return postorder
+
 class GenericDominatorTree:
     def __init__(self):
         self._assign_names()
@@ -25,24 +49,27 @@ class GenericDominatorTree:
         for block_name, block in enumerate(postorder):
             self._name_of_block[block] = block_name
 
+        # The CFG does not change while the tree is computed, so the edges
+        # are only looked up once.
+        self._prev_names = [list(self._prev_block_names(block_name))
+                            for block_name in range(len(postorder))]
+
     def _intersect(self, block_name_1, block_name_2):
+        doms = self._doms
         finger_1, finger_2 = block_name_1, block_name_2
         while finger_1 != finger_2:
             while finger_1 < finger_2:
-                finger_1 = self._doms[finger_1]
+                finger_1 = doms[finger_1]
             while finger_2 < finger_1:
-                finger_2 = self._doms[finger_2]
+                finger_2 = doms[finger_2]
         return finger_1
 
     def _compute(self):
-        self._doms = {}
+        # We don't yet know what blocks dominate all other blocks.
+        self._doms = doms = [None] * (self._start_name + 1)
 
         # Start block dominates itself.
-        self._doms[self._start_name] = self._start_name
-
-        # We don't yet know what blocks dominate all other blocks.
-        for block_name in range(self._start_name):
-            self._doms[block_name] = None
+        doms[self._start_name] = self._start_name
 
         changed = True
         while changed:
@@ -55,19 +82,19 @@ class GenericDominatorTree:
                 # We've already processed at least one previous block because
                 # of the graph traverse order.
                 new_idom, prev_block_names = None, []
-                for prev_block_name in self._prev_block_names(block_name):
-                    if new_idom is None and self._doms[prev_block_name] is not None:
+                for prev_block_name in self._prev_names[block_name]:
+                    if new_idom is None and doms[prev_block_name] is not None:
                         new_idom = prev_block_name
                     else:
                         prev_block_names.append(prev_block_name)
 
                 # Find a common previous block
                 for prev_block_name in prev_block_names:
-                    if self._doms[prev_block_name] is not None:
+                    if doms[prev_block_name] is not None:
                         new_idom = self._intersect(prev_block_name, new_idom)
 
-                if self._doms[block_name] != new_idom:
-                    self._doms[block_name] = new_idom
+                if doms[block_name] != new_idom:
+                    doms[block_name] = new_idom
                     changed = True
 
     def immediate_dominator(self, block):
@@ -92,19 +119,8 @@ class DominatorTree(GenericDominatorTree):
         super().__init__()
 
     def _traverse_in_postorder(self):
-        postorder = []
-
-        visited = set()
-        def visit(block):
-            visited.add(block)
-            for next_block in block.successors():
-                if next_block not in visited:
-                    visit(next_block)
-            postorder.append(block)
-
-        visit(self.function.entry())
-
-        return postorder
+        return _traverse_in_postorder([self.function.entry()],
+                                      lambda block: block.successors())
 
     def _prev_block_names(self, block_name):
         for block in self._block_of_name[block_name].predecessors():
@@ -118,24 +134,18 @@ class PostDominatorTree(GenericDominatorTree):
         super().__init__()
 
     def _traverse_in_postorder(self):
-        postorder = []
-
-        visited = set()
-        def visit(block):
-            visited.add(block)
-            for next_block in block.predecessors():
-                if next_block not in visited:
-                    visit(next_block)
-            postorder.append(block)
-
-        for block in self.function.basic_blocks:
-            if not any(block.successors()):
-                visit(block)
+        exits = [block for block in self.function.basic_blocks
+                 if not any(block.successors())]
+        postorder = _traverse_in_postorder(exits,
+                                           lambda block: block.predecessors())
 
         postorder.append(None) # virtual exit block
         return postorder
 
     def _prev_block_names(self, block_name):
+        if block_name == self._start_name:
+            return # virtual exit block
+
         succ_blocks = self._block_of_name[block_name].successors()
         if len(succ_blocks) > 0:
             for block in succ_blocks:
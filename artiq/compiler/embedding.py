@@ -725,24 +725,6 @@ class StitchingInferencer(Inferencer):
                                     loc=node.loc,
                                     self_loc=node.self_loc)
 
-class TypedtreeHasher(algorithm.Visitor):
-    def generic_visit(self, node):
-        def freeze(obj):
-            if isinstance(obj, ast.AST):
-                return self.visit(obj)
-            elif isinstance(obj, list):
-                return hash(tuple(freeze(elem) for elem in obj))
-            elif isinstance(obj, types.Type):
-                return hash(obj.find())
-            else:
-                # We don't care; only types change during inference.
-                pass
-
-        fields = node._fields
-        if hasattr(node, '_types'):
-            fields = fields + node._types
-        return hash(tuple(freeze(getattr(node, field_name)) for field_name in fields))
-
 class Stitcher:
     def __init__(self, core, dmgr, engine=None, print_as_rpc=True):
         self.core = core
@@ -770,6 +752,9 @@ class Stitcher:
         self.value_map = defaultdict(lambda: [])
         self.definitely_changed = False
 
+        self.unifications = types.UnificationTracker()
+        self.inference_iterations = 0
+
     def stitch_call(self, function, args, kwargs, callback=None):
         # We synthesize source code for the initial call so that
         # diagnostics would have something meaningful to display to the user.
@@ -782,26 +767,34 @@ class Stitcher:
         inferencer = StitchingInferencer(engine=self.engine,
                                          value_map=self.value_map,
                                          quote=self._quote)
-        typedtree_hasher = TypedtreeHasher()
 
-        # Iterate inference to fixed point.
-        old_typedtree_hash = None
+        # Iterate inference to fixed point. Progress is detected by counting
+        # the type variables bound during an iteration, and only the top-level
+        # nodes that still contain type variables are revisited, as long as
+        # no new host objects or attributes were discovered.
+        resolved = set()
         old_attr_count = None
-        while True:
-            inferencer.visit(self.typedtree)
-            if self.definitely_changed:
-                changed = True
-                self.definitely_changed = False
-            else:
-                typedtree_hash = typedtree_hasher.visit(self.typedtree)
+        old_value_count = None
+        with self.unifications.active():
+            while True:
+                changes = self.unifications.new_round()
+                inferencer.visit_dirty(list(self.typedtree), resolved)
+                self.inference_iterations += 1
+
                 attr_count = self.embedding_map.attribute_count()
-                changed = old_attr_count != attr_count or \
-                          old_typedtree_hash != typedtree_hash
-                old_typedtree_hash = typedtree_hash
+                value_count = sum(len(values) for values in self.value_map.values())
+                discovered = old_attr_count != attr_count or \
+                             old_value_count != value_count
+                if discovered:
+                    resolved.clear()
                 old_attr_count = attr_count
+                old_value_count = value_count
 
-            if not changed:
-                break
+                changed = self.definitely_changed or discovered or \
+                          self.unifications.changes != changes
+                self.definitely_changed = False
+                if not changed:
+                    break
 
         # After we've discovered every referenced attribute, check if any kernel_invariant
         # specifications refers to ones we didn't encounter.
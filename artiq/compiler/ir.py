@@ -78,6 +78,13 @@ def rpc_tag(typ, error_handler):
         error_handler(typ)
 
 
+def _invalidate_predecessors(values):
+    """Drops the cached predecessor lists of every basic block in ``values``,
+    after the set of terminators using it has changed."""
+    for value in values:
+        if isinstance(value, BasicBlock) and value.function is not None:
+            value.function._predecessors.pop(value, None)
+
 class Value:
     """
     An SSA value that keeps track of its uses.
@@ -174,9 +181,11 @@ class User(NamedValue):
     def set_operands(self, new_operands):
         for operand in set(self.operands):
             operand.uses.remove(self)
+        _invalidate_predecessors(self.operands)
         self.operands = new_operands
         for operand in set(self.operands):
             operand.uses.add(self)
+        _invalidate_predecessors(self.operands)
 
     def drop_references(self):
         self.set_operands([])
@@ -190,6 +199,7 @@ class User(NamedValue):
 
         value.uses.remove(self)
         replacement.uses.add(self)
+        _invalidate_predecessors((value, replacement))
 
 class Instruction(User):
     """
@@ -214,6 +224,8 @@ class Instruction(User):
         return self_copy
 
     def set_basic_block(self, new_basic_block):
+        if isinstance(self, Terminator):
+            _invalidate_predecessors(self.operands)
         self.basic_block = new_basic_block
         if self.basic_block is not None:
             self._set_function(self.basic_block.function)
@@ -415,6 +427,18 @@ class BasicBlock(NamedValue):
         return self.terminator().successors()
 
     def predecessors(self):
+        if self.function is None:
+            return self._find_predecessors()
+
+        # Predecessors are cached in the function, and invalidated whenever
+        # the set of terminators using this block changes.
+        predecessors = self.function._predecessors.get(self)
+        if predecessors is None:
+            predecessors = self._find_predecessors()
+            self.function._predecessors[self] = predecessors
+        return list(predecessors)
+
+    def _find_predecessors(self):
         return [use.basic_block for use in self.uses if isinstance(use, Terminator)]
 
     def as_entity(self, type_printer):
@@ -481,9 +505,13 @@ class Function:
         Flag ``fast-math`` is the equivalent of gcc's ``-ffast-math``.
     """
 
+    # _predecessors: (dict of :class:`BasicBlock` to list of :class:`BasicBlock`)
+    #   cache of :meth:`BasicBlock.predecessors` for blocks of this function
+
     def __init__(self, typ, name, arguments, loc=None):
         self.type, self.name, self.loc = typ, name, loc
         self.names, self.arguments, self.basic_blocks = set(), [], []
+        self._predecessors = {}
         self.next_name = 1
         self.set_arguments(arguments)
         self.is_internal = False
@@ -515,10 +543,12 @@ class Function:
             argument._set_function(self)
 
     def add(self, basic_block):
+        _invalidate_predecessors((basic_block,))
         basic_block._set_function(self)
         self.basic_blocks.append(basic_block)
 
     def remove(self, basic_block):
+        _invalidate_predecessors((basic_block,))
         basic_block._detach()
         self.basic_blocks.remove(basic_block)
 
@@ -1122,8 +1152,10 @@ class Branch(Terminator):
 
     def set_target(self, new_target):
         self.operands[0].uses.remove(self)
+        _invalidate_predecessors(self.operands[0:1])
         self.operands[0] = new_target
         self.operands[0].uses.add(self)
+        _invalidate_predecessors(self.operands[0:1])
 
 class BranchIf(Terminator):
     """
@@ -1181,6 +1213,7 @@ class IndirectBranch(Terminator):
     def add_destination(self, destination):
         destination.uses.add(self)
         self.operands.append(destination)
+        _invalidate_predecessors((destination,))
 
     def _operands_as_string(self, type_printer):
         return "{}, [{}]".format(self.operands[0].as_operand(type_printer),
@@ -1370,6 +1403,7 @@ class LandingPad(Terminator):
         self.operands.append(target)
         self.types.append(typ.find() if typ is not None else None)
         target.uses.add(self)
+        _invalidate_predecessors((target,))
 
     def _operands_as_string(self, type_printer):
         table = []
@@ -1421,8 +1455,10 @@ class Delay(Terminator):
 
     def set_target(self, new_target):
         self.operands[1].uses.remove(self)
+        _invalidate_predecessors(self.operands[1:2])
         self.operands[1] = new_target
         self.operands[1].uses.add(self)
+        _invalidate_predecessors(self.operands[1:2])
 
     def _operands_as_string(self, type_printer):
         result = "decomp {}, to {}".format(self.decomposition().as_operand(type_printer),
@@ -1504,3 +1540,4 @@ class Interleave(Terminator):
     def add_destination(self, destination):
         destination.uses.add(self)
         self.operands.append(destination)
+        _invalidate_predecessors((destination,))
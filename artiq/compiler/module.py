@@ -11,6 +11,7 @@ string and infers types for it using a trivial :module:`prelude`.
 import os
 from pythonparser import source, diagnostic, parse_buffer
 from . import prelude, types, transforms, analyses, validators, embedding
+from .profiler import NullProfiler, typedtree_size, artiq_ir_size
 
 class Source:
     def __init__(self, source_buffer, engine=None):
@@ -40,7 +41,8 @@ class Source:
             return cls(source.Buffer(f.read(), filename, 1), engine=engine)
 
 class Module:
-    def __init__(self, src, ref_period=1e-6, attribute_writeback=True, remarks=False):
+    def __init__(self, src, ref_period=1e-6, attribute_writeback=True, remarks=False,
+                 profiler=None):
         self.attribute_writeback = attribute_writeback
         self.engine = src.engine
         self.embedding_map = src.embedding_map
@@ -67,31 +69,62 @@ class Module:
         interleaver = transforms.Interleaver(engine=self.engine)
         invariant_detection = analyses.InvariantDetection(engine=self.engine)
 
-        int_monomorphizer.visit(src.typedtree)
-        cast_monomorphizer.visit(src.typedtree)
-        inferencer.visit(src.typedtree)
-        monomorphism_validator.visit(src.typedtree)
-        escape_validator.visit(src.typedtree)
-        iodelay_estimator.visit_fixpoint(src.typedtree)
-        constness_validator.visit(src.typedtree)
-        devirtualization.visit(src.typedtree)
-        self.artiq_ir = artiq_ir_generator.visit(src.typedtree)
-        artiq_ir_generator.annotate_calls(devirtualization)
-        dead_code_eliminator.process(self.artiq_ir)
-        interleaver.process(self.artiq_ir)
-        local_access_validator.process(self.artiq_ir)
-        local_demoter.process(self.artiq_ir)
-        constant_hoister.process(self.artiq_ir)
+        if profiler is None:
+            profiler = NullProfiler()
+        self.profiler = profiler
+
+        def tree_size():
+            return typedtree_size(src.typedtree)
+        def ir_size():
+            return artiq_ir_size(self.artiq_ir)
+
+        def frontend(name, size=tree_size):
+            return profiler.measure(name, "frontend", size)
+        def artiq(name, size=ir_size):
+            return profiler.measure(name, "artiq", size)
+
+        with frontend("IntMonomorphizer"):
+            int_monomorphizer.visit(src.typedtree)
+        with frontend("CastMonomorphizer"):
+            cast_monomorphizer.visit(src.typedtree)
+        with frontend("Inferencer"):
+            inferencer.visit(src.typedtree)
+        with frontend("MonomorphismValidator"):
+            monomorphism_validator.visit(src.typedtree)
+        with frontend("EscapeValidator"):
+            escape_validator.visit(src.typedtree)
+        with frontend("IODelayEstimator"):
+            iodelay_estimator.visit_fixpoint(src.typedtree)
+        with frontend("ConstnessValidator"):
+            constness_validator.visit(src.typedtree)
+        with frontend("Devirtualization"):
+            devirtualization.visit(src.typedtree)
+        with profiler.measure("ARTIQIRGenerator", "artiq",
+                              size=tree_size, output_size=ir_size):
+            self.artiq_ir = artiq_ir_generator.visit(src.typedtree)
+            artiq_ir_generator.annotate_calls(devirtualization)
+        with artiq("DeadCodeEliminator"):
+            dead_code_eliminator.process(self.artiq_ir)
+        with artiq("Interleaver"):
+            interleaver.process(self.artiq_ir)
+        with artiq("LocalAccessValidator"):
+            local_access_validator.process(self.artiq_ir)
+        with artiq("LocalDemoter"):
+            local_demoter.process(self.artiq_ir)
+        with artiq("ConstantHoister"):
+            constant_hoister.process(self.artiq_ir)
         if remarks:
-            invariant_detection.process(self.artiq_ir)
+            with artiq("InvariantDetection"):
+                invariant_detection.process(self.artiq_ir)
 
     def build_llvm_ir(self, target):
         """Compile the module to LLVM IR for the specified target."""
         llvm_ir_generator = transforms.LLVMIRGenerator(
             engine=self.engine, module_name=self.name, target=target,
             embedding_map=self.embedding_map)
-        return llvm_ir_generator.process(self.artiq_ir,
-            attribute_writeback=self.attribute_writeback)
+        with self.profiler.measure("LLVMIRGenerator", "llvm"):
+            return llvm_ir_generator.process(self.artiq_ir,
+                attribute_writeback=self.attribute_writeback)
 
     def __repr__(self):
         printer = types.TypePrinter()
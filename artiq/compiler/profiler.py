@@ -0,0 +1,149 @@
+"""
+The :class:`PassProfiler` class records per-pass compilation metrics:
+wall time, memory allocated while the pass runs, and the size of
+the intermediate representation before and after the pass.
+
+Profiling is disabled unless the ``profile_compiler`` argument of
+:class:`artiq.coredevice.core.Core` is set or the ``ARTIQ_PROFILE_COMPILER``
+environment variable is non-empty. The resulting reports are plain
+dictionaries that can be serialized with PYON.
+"""
+
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from pythonparser import ast
+
+
+__all__ = ["PassProfiler", "NullProfiler", "profiling_requested",
+           "typedtree_size", "artiq_ir_size", "llvm_ir_size"]
+
+
+def profiling_requested():
+    """Returns ``True`` if compiler profiling was requested through
+    the environment."""
+    return bool(os.getenv("ARTIQ_PROFILE_COMPILER"))
+
+
+def typedtree_size(node):
+    """Returns the number of AST nodes in a typed tree (or list of trees)."""
+    count = 0
+    worklist = [node]
+    while worklist:
+        obj = worklist.pop()
+        if isinstance(obj, ast.AST):
+            count += 1
+            worklist.extend(getattr(obj, field, None) for field in obj._fields)
+        elif isinstance(obj, list):
+            worklist.extend(obj)
+    return count
+
+
+def artiq_ir_size(functions):
+    """Returns the number of ARTIQ IR instructions in a list of functions."""
+    return sum(len(block.instructions)
+               for func in functions for block in func.basic_blocks)
+
+
+def llvm_ir_size(llmodule):
+    """Returns the number of instructions in a parsed LLVM module."""
+    return sum(len(list(block.instructions))
+               for func in llmodule.functions for block in func.blocks)
+
+
+class PassProfiler:
+    """
+    Collects metrics for each compiler pass executed inside
+    :meth:`measure`.
+
+    :param name: name of the compiled kernel, used in the report.
+    :param track_allocations: whether to measure memory allocations
+        with :mod:`tracemalloc`. This slows down compilation noticeably.
+    """
+
+    def __init__(self, name, track_allocations=True):
+        self.name = name
+        self.track_allocations = track_allocations
+        self.target = None
+        self.passes = []
+
+    @contextmanager
+    def measure(self, pass_name, phase, size=None, output_size=None):
+        """
+        Measures the pass executed in the body of the ``with`` statement.
+
+        :param pass_name: name of the pass, e.g. ``"Inferencer"``.
+        :param phase: one of ``"frontend"``, ``"artiq"``, ``"llvm"`` or
+            ``"link"``.
+        :param size: callable without arguments returning the current IR size,
+            evaluated before and after the pass; or ``None``.
+        :param output_size: callable returning the IR size after the pass,
+            if it differs from ``size`` (i.e. the pass lowers to another IR).
+        """
+        record = {
+            "name": pass_name,
+            "phase": phase,
+            "size_before": None if size is None else size(),
+            "size_after": None,
+        }
+
+        started_tracing = False
+        if self.track_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+            alloc_start, _ = tracemalloc.get_traced_memory()
+
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["time"] = time.perf_counter() - start
+            if self.track_allocations:
+                alloc_end, alloc_peak = tracemalloc.get_traced_memory()
+                record["alloc_net"] = alloc_end - alloc_start
+                record["alloc_peak"] = alloc_peak - alloc_start
+                if started_tracing:
+                    tracemalloc.stop()
+            self.passes.append(record)
+
+        # Only measure the output size if the pass succeeded.
+        if output_size is None:
+            output_size = size
+        if output_size is not None:
+            record["size_after"] = output_size()
+
+    def report(self):
+        """Returns the collected metrics as a dictionary."""
+        return {
+            "kernel": self.name,
+            "target": self.target,
+            "total_time": sum(record["time"] for record in self.passes),
+            "passes": list(self.passes),
+        }
+
+    def format_report(self):
+        """Returns the collected metrics as a human-readable table."""
+        lines = ["Compilation profile for {}:".format(self.name)]
+        for record in self.passes:
+            line = "  {:<8} {:<28} {:>9.2f}ms".format(
+                record["phase"], record["name"], record["time"]*1e3)
+            if record.get("alloc_peak") is not None:
+                line += " {:>10.1f}KiB".format(record["alloc_peak"]/1024)
+            if record.get("size_before") is not None:
+                line += " {:>8} -> {}".format(record["size_before"],
+                                              record["size_after"])
+            lines.append(line)
+        return "\n".join(lines)
+
+
+class NullProfiler:
+    """A profiler that does not record anything; used when profiling
+    is disabled."""
+
+    @contextmanager
+    def measure(self, pass_name, phase, size=None, output_size=None):
+        yield {}
@@ -1,5 +1,6 @@
 import os, sys, tempfile, subprocess, io
 from artiq.compiler import types, ir
+from artiq.compiler.profiler import NullProfiler, llvm_ir_size
 from llvmlite import ir as ll, binding as llvm
 
 llvm.initialize()
@@ -81,6 +82,9 @@ class Target:
         provided by the target, e.g. ``"printf"``.
     :var now_pinning: (boolean)
         Whether the target implements the now-pinning RTIO optimization.
+
+    :param profiler: (:class:`artiq.compiler.profiler.PassProfiler`)
+        Profiler recording the LLVM and linking stages; or ``None``.
     """
     triple = "unknown"
     data_layout = ""
@@ -94,8 +98,11 @@ class Target:
     tool_addr2line = "llvm-addr2line"
     tool_cxxfilt = "llvm-cxxfilt"
 
-    def __init__(self):
+    def __init__(self, profiler=None):
         self.llcontext = ll.Context()
+        if profiler is None:
+            profiler = NullProfiler()
+        self.profiler = profiler
 
     def target_machine(self):
         lltarget = llvm.Target.from_triple(self.triple)
@@ -154,8 +161,9 @@ class Target:
         llmod = module.build_llvm_ir(self)
 
         try:
-            llparsedmod = llvm.parse_assembly(str(llmod))
-            llparsedmod.verify()
+            with self.profiler.measure("parse_assembly", "llvm"):
+                llparsedmod = llvm.parse_assembly(str(llmod))
+                llparsedmod.verify()
         except RuntimeError:
             _dump("", "LLVM IR (broken)", ".ll", lambda: str(llmod))
             raise
@@ -163,7 +171,9 @@ class Target:
         _dump(os.getenv("ARTIQ_DUMP_UNOPT_LLVM"), "LLVM IR (generated)", "_unopt.ll",
               lambda: str(llparsedmod))
 
-        self.optimize(llparsedmod)
+        with self.profiler.measure("optimize", "llvm",
+                                   size=lambda: llvm_ir_size(llparsedmod)):
+            self.optimize(llparsedmod)
 
         _dump(os.getenv("ARTIQ_DUMP_LLVM"), "LLVM IR (optimized)", ".ll",
               lambda: str(llparsedmod))
@@ -179,10 +189,20 @@ class Target:
         _dump(os.getenv("ARTIQ_DUMP_OBJ"), "Object file", ".o",
               lambda: llmachine.emit_object(llmodule))
 
-        return llmachine.emit_object(llmodule)
+        with self.profiler.measure("emit_object", "llvm") as record:
+            obj = llmachine.emit_object(llmodule)
+            record["size_after"] = len(obj)
+        return obj
 
     def link(self, objects):
         """Link the relocatable objects into a shared library for this target."""
+        with self.profiler.measure("link", "link") as record:
+            library = self._link(objects)
+            record["size_before"] = sum(len(obj) for obj in objects)
+            record["size_after"] = len(library)
+        return library
+
+    def _link(self, objects):
         with RunTool([self.tool_ld, "-shared", "--eh-frame-hdr"] +
                      self.additional_linker_options +
                      ["-T" + os.path.join(os.path.dirname(__file__), "kernel.ld")] +
@@ -203,10 +223,14 @@ class Target:
         return self.link([self.assemble(self.compile(module)) for module in modules])
 
     def strip(self, library):
-        with RunTool([self.tool_strip, "--strip-debug", "{library}", "-o", "{output}"],
-                     library=library, output=None) \
-                as results:
-            return results["output"].read()
+        with self.profiler.measure("strip", "link") as record:
+            with RunTool([self.tool_strip, "--strip-debug", "{library}", "-o", "{output}"],
+                         library=library, output=None) \
+                    as results:
+                stripped_library = results["output"].read()
+            record["size_before"] = len(library)
+            record["size_after"] = len(stripped_library)
+        return stripped_library
 
     def symbolize(self, library, addresses):
         if addresses == []:
@@ -260,10 +284,17 @@ class Target:
             return results["__stdout__"].read().rstrip().split("\n")
 
 class NativeTarget(Target):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, profiler=None):
+        super().__init__(profiler)
         self.triple = llvm.get_default_triple()
-        host_data_layout = str(llvm.targets.Target.from_default_triple().create_target_machine().target_data)
+        self.data_layout = str(llvm.targets.Target.from_default_triple().create_target_machine().target_data)
+
+    def _link(self, objects):
+        # Native kernels are loaded by the LLVM JIT (see artiq.sim.comm_kernel),
+        # which takes a relocatable object.
+        if len(objects) != 1:
+            raise ValueError("Native kernels must consist of a single object")
+        return objects[0]
 
 class RV32IMATarget(Target):
     triple = "riscv32-unknown-linux"
@@ -2,6 +2,7 @@ import sys, os
 from pythonparser import diagnostic
 from ..module import Module, Source
 from ..targets import RV32GTarget
+from ..profiler import PassProfiler
 from . import benchmark
 
 def main():
@@ -33,5 +34,11 @@ def main():
     benchmark(lambda: RV32GTarget().compile_and_link([module]),
               "LLVM optimization and linking")
 
+    profiler = PassProfiler(filename)
+    source = Source.from_string(code, filename, engine=engine)
+    module = Module(source, profiler=profiler)
+    RV32GTarget(profiler=profiler).compile_and_link([module])
+    print(profiler.format_report())
+
 if __name__ == "__main__":
     main()
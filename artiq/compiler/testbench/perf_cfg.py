@@ -0,0 +1,49 @@
+import sys
+from collections import OrderedDict
+from .. import ir, types, builtins
+from ..analyses.domination import DominatorTree, PostDominatorTree
+from . import benchmark
+
+
+def make_function(diamonds):
+    """Build a function consisting of a chain of ``diamonds`` if/else
+    diamonds, resembling the CFG of a heavily unrolled kernel."""
+    func = ir.Function(types.TFunction(OrderedDict(), OrderedDict(), builtins.TNone()),
+                       "cfg", [])
+    cond = ir.Constant(True, builtins.TBool())
+
+    block = ir.BasicBlock([], "entry")
+    func.add(block)
+    for _ in range(diamonds):
+        if_true = ir.BasicBlock([], "if.true")
+        if_false = ir.BasicBlock([], "if.false")
+        tail = ir.BasicBlock([], "if.tail")
+        for new_block in (if_true, if_false, tail):
+            func.add(new_block)
+        block.append(ir.BranchIf(cond, if_true, if_false))
+        if_true.append(ir.Branch(tail))
+        if_false.append(ir.Branch(tail))
+        block = tail
+    block.append(ir.Return(ir.Constant(None, builtins.TNone())))
+    return func
+
+
+def main():
+    if len(sys.argv) > 2:
+        print("Expected at most one argument (number of diamonds)", file=sys.stderr)
+        exit(1)
+    diamonds = int(sys.argv[1]) if len(sys.argv) == 2 else 2000
+
+    func = make_function(diamonds)
+    print("{} basic blocks".format(len(func.basic_blocks)))
+
+    def predecessors():
+        for block in func.basic_blocks:
+            block.predecessors()
+
+    benchmark(predecessors, "Predecessor lookup")
+    benchmark(lambda: DominatorTree(func), "Dominator tree")
+    benchmark(lambda: PostDominatorTree(func), "Postdominator tree")
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,23 @@ def is_nested_empty_list(node):
     return result + 1
 
 
+def has_type_variables(node):
+    """Returns ``True`` if any type annotating the typed subtree ``node``
+    still contains a type variable, i.e. further inference could change it."""
+    worklist = [node]
+    while worklist:
+        obj = worklist.pop()
+        if isinstance(obj, ast.AST):
+            for field_name in getattr(obj, "_types", ()):
+                typ = getattr(obj, field_name, None)
+                if isinstance(typ, types.Type) and types.is_polymorphic(typ):
+                    return True
+            worklist.extend(getattr(obj, field_name, None) for field_name in obj._fields)
+        elif isinstance(obj, list):
+            worklist.extend(obj)
+    return False
+
+
 class Inferencer(algorithm.Visitor):
     """
     :class:`Inferencer` infers types by recursively applying the unification
@@ -47,6 +64,24 @@ class Inferencer(algorithm.Visitor):
         self.in_loop = False
         self.has_return = False
 
+    def visit_dirty(self, nodes, resolved):
+        """
+        Visits the nodes in the list ``nodes`` that are not in the set
+        ``resolved``, then adds those whose types are now fully inferred
+        to ``resolved``.
+
+        Revisiting a node whose types contain no type variables cannot
+        produce any new information, as long as everything it refers to
+        outside of the typed tree is unchanged; the caller is responsible
+        for clearing ``resolved`` otherwise.
+        """
+        visited = [node for node in nodes if node not in resolved]
+        for node in visited:
+            self.visit(node)
+        for node in visited:
+            if not has_type_variables(node):
+                resolved.add(node)
+
     def _unify(self, typea, typeb, loca, locb, makenotes=None, when=""):
         try:
             typea.unify(typeb)
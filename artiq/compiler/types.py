@@ -5,7 +5,9 @@ in :mod:`asttyped`.
 
 import builtins
 import string
+import threading
 from collections import OrderedDict
+from contextlib import contextmanager
 from . import iodelay
 
 
@@ -46,17 +48,60 @@ class Type(object):
     def __str__(self):
         return TypePrinter().name(self)
 
+class _Tracking(threading.local):
+    tracker = None
+
+_tracking = _Tracking()
+
+class UnificationTracker:
+    """
+    Detects progress of fixpoint iteration of inference cheaply.
+
+    While the tracker is active (see :meth:`active`), :attr:`changes` counts
+    the unifications that bound a type variable created before the current
+    round; variables created and bound within the same round carry no
+    information from the previous iteration.
+    """
+
+    def __init__(self):
+        self.round = object()
+        self.changes = 0
+
+    def new_round(self):
+        """
+        Starts a new round and returns the current value of :attr:`changes`.
+        If :attr:`changes` is still equal to the returned value later, no type
+        variable that existed before this call has been bound since.
+        """
+        self.round = object()
+        return self.changes
+
+    @contextmanager
+    def active(self):
+        """Makes this tracker record the unifications in the current thread
+        within the ``with`` statement."""
+        previous, _tracking.tracker = _tracking.tracker, self
+        try:
+            yield self
+        finally:
+            _tracking.tracker = previous
+
 class TVar(Type):
     """
     A type variable.
 
     In effect, the classic union-find data structure is intrusively
     folded into this class.
+
+    Every type variable records the round of the active
+    :class:`UnificationTracker` it was created in, if any.
     """
 
     def __init__(self):
         self.parent = self
         self.rank = 0
+        tracker = _tracking.tracker
+        self.round = None if tracker is None else tracker.round
 
     def find(self):
         parent = self.parent
@@ -87,6 +132,9 @@ class TVar(Type):
                     x.rank += 1
             else:
                 y.parent = x
+            tracker = _tracking.tracker
+            if tracker is not None and y.round is not tracker.round:
+                tracker.changes += 1
         else:
             y.unify(x)
 
@@ -1,3 +1,7 @@
+from collections import OrderedDict
+from functools import wraps
+
+import numpy
 from numpy import int32, int64
 
 from artiq.language.core import (
@@ -65,6 +69,25 @@ RAM_MODE_CONT_RAMPUP = 4
 _DEFAULT_PROFILE_RAM = 0
 
 
+def _host_implementation(portable_function, host_function):
+    """Return a function that runs ``host_function`` when called from the
+    host, and is compiled from ``portable_function`` in kernels."""
+    @wraps(portable_function)
+    def wrapper(*args, **kwargs):
+        return host_function(*args, **kwargs)
+    return wrapper
+
+
+def _round_int32(value):
+    # Same results and errors as int32(round(value)) on each element.
+    if numpy.isnan(value).any():
+        raise ValueError("cannot convert float NaN to integer")
+    value = numpy.rint(value)
+    if ((value < -(1 << 31)) | (value >= 1 << 31)).any():
+        raise OverflowError("value out of bounds for int32")
+    return value.astype(int32)
+
+
 class SyncDataUser:
     def __init__(self, core, sync_delay_seed, io_update_delay):
         self.core = core
@@ -186,6 +209,10 @@ class AD9910:
 
         self.phase_mode = PHASE_MODE_CONTINUOUS
 
+        # RAM images converted on the host, see _ram_host()
+        self.ram_cache = OrderedDict()
+        self.ram_cache_size = 64
+
     @kernel
     def set_phase_mode(self, phase_mode: TInt32):
         r"""Set the default phase mode.
@@ -734,6 +761,59 @@ class AD9910:
         amplitude scale factor."""
         return asf / float(0x3fff)
 
+    def _ram_host(self, ram, kind, convert, *values):
+        # Host implementation of the *_to_ram methods. Converted RAM images
+        # are cached, keyed by the input values.
+        n = len(ram)
+        arrays = []
+        for value in values:
+            if len(value) < n:
+                raise IndexError("list index out of range")
+            arrays.append(numpy.ascontiguousarray(value[:n], dtype=float))
+        key = (kind,) + tuple(array.tobytes() for array in arrays)
+        try:
+            data = self.ram_cache[key]
+            self.ram_cache.move_to_end(key)
+        except KeyError:
+            data = convert(*arrays)
+            data.flags.writeable = False
+            self.ram_cache[key] = data
+            while len(self.ram_cache) > self.ram_cache_size:
+                self.ram_cache.popitem(last=False)
+        if isinstance(ram, list):
+            ram[:] = list(data)
+        else:
+            ram[:] = data
+
+    @staticmethod
+    def _pow_ram(turns):
+        pow_ = _round_int32(turns * 0x10000) & 0xffff
+        return (pow_.astype(numpy.uint32) << 16).view(int32)
+
+    @staticmethod
+    def _asf_ram(amplitude, shift):
+        code = _round_int32(amplitude * 0x3fff)
+        if ((code < 0) | (code > 0x3fff)).any():
+            raise ValueError("Invalid AD9910 fractional amplitude!")
+        return (code.astype(numpy.uint32) << shift).view(int32)
+
+    def _frequency_to_ram_host(self, frequency, ram):
+        self._ram_host(ram, RAM_DEST_FTW,
+                       lambda f: _round_int32(self.ftw_per_hz * f),
+                       frequency)
+
+    def _turns_to_ram_host(self, turns, ram):
+        self._ram_host(ram, RAM_DEST_POW, self._pow_ram, turns)
+
+    def _amplitude_to_ram_host(self, amplitude, ram):
+        self._ram_host(ram, RAM_DEST_ASF,
+                       lambda a: self._asf_ram(a, 18), amplitude)
+
+    def _turns_amplitude_to_ram_host(self, turns, amplitude, ram):
+        self._ram_host(ram, RAM_DEST_POWASF,
+                       lambda t, a: self._pow_ram(t) | self._asf_ram(a, 2),
+                       turns, amplitude)
+
     @portable(flags={"fast-math"})
     def frequency_to_ram(self, frequency: TList(TFloat), ram: TList(TInt32)):
         """Convert frequency values to RAM profile data.
@@ -789,6 +869,15 @@ class AD9910:
             ram[i] = ((self.turns_to_pow(turns[i]) << 16) |
                       self.amplitude_to_asf(amplitude[i]) << 2)
 
+    # On the host, the conversions to RAM data are vectorized with numpy.
+    frequency_to_ram = _host_implementation(
+        frequency_to_ram, _frequency_to_ram_host)
+    turns_to_ram = _host_implementation(turns_to_ram, _turns_to_ram_host)
+    amplitude_to_ram = _host_implementation(
+        amplitude_to_ram, _amplitude_to_ram_host)
+    turns_amplitude_to_ram = _host_implementation(
+        turns_amplitude_to_ram, _turns_amplitude_to_ram_host)
+
     @kernel
     def set_frequency(self, frequency: TFloat):
         """Set the value stored to the AD9910's frequency tuning word (FTW)
@@ -1,4 +1,5 @@
 import struct
+import hashlib
 import logging
 import traceback
 import numpy
@@ -23,6 +24,12 @@ class Request(Enum):
     RPCReply = 7
     RPCException = 8
 
+    LoadCachedKernel = 9
+    LoadKernelCaching = 10
+    CacheKernel = 11
+
+    DMAUpload = 12
+
 
 class Reply(Enum):
     SystemInfo = 2
@@ -38,6 +45,8 @@ class Reply(Enum):
 
     ClockFailure = 15
 
+    KernelNotCached = 16
+
 
 class UnsupportedDevice(Exception):
     pass
@@ -163,12 +172,18 @@ class CommKernelDummy:
     def run(self):
         pass
 
+    def load_and_run(self, kernel_library, prefetch=None):
+        pass
+
     def serve(self, embedding_map, symbolizer, demangler):
         pass
 
     def check_system_info(self):
         pass
 
+    def dma_upload(self, name, trace, duration):
+        pass
+
 
 def incompatible_versions(v1, v2):
     if v1.endswith(".beta") or v2.endswith(".beta"):
@@ -190,6 +205,17 @@ class CommKernel:
         self.read_buffer = bytearray()
         self.write_buffer = bytearray()
 
+        # Set by check_system_info() if the runtime keeps recently loaded
+        # kernel libraries, which are then identified by their hash.
+        self.kernel_cache = False
+        # Set by check_system_info() if DMA traces can be uploaded.
+        self.dma_upload_supported = False
+        # Hashes of the kernel libraries uploaded to the runtime cache.
+        self.cached_kernels = set()
+        self.kernel_upload_bytes = 0
+        self.kernel_cache_hits = 0
+        # Kernel library whose load request has not been answered yet.
+        self._pending_load = None
 
     def open(self):
         if hasattr(self, "socket"):
@@ -217,6 +243,7 @@ class CommKernel:
             return
         self.socket.close()
         del self.socket
+        self._pending_load = None
         logger.debug("disconnected")
 
     #
@@ -355,7 +382,10 @@ class CommKernel:
         self._read_expect(Reply.SystemInfo)
         runtime_id = self._read(4)
         if runtime_id == b"AROR":
-            gateware_version = self._read_string().split(";")[0]
+            ident = self._read_string().split(";")
+            gateware_version = ident[0]
+            self.kernel_cache = "kernel_cache" in ident[2:]
+            self.dma_upload_supported = "dma_upload" in ident[2:]
             if not self.warned_of_mismatch and incompatible_versions(gateware_version, software_version):
                 logger.warning("Mismatch between gateware (%s) "
                                "and software (%s) versions",
@@ -371,22 +401,111 @@ class CommKernel:
             raise UnsupportedDevice("Unsupported runtime ID: {}"
                                     .format(runtime_id))
 
-    def load(self, kernel_library):
-        self._write_header(Request.LoadKernel)
-        self._write_bytes(kernel_library)
-        self._flush()
+    def _write_load(self, kernel_library, offer_hash=True):
+        if not self.kernel_cache:
+            digest = None
+            offer_hash = False
+        else:
+            digest = hashlib.sha256(kernel_library).digest()
+            offer_hash = offer_hash and digest in self.cached_kernels
+        if offer_hash:
+            # The library is only uploaded if the runtime has evicted it or
+            # was restarted.
+            self._write_header(Request.LoadCachedKernel)
+            self._write_bytes(digest)
+        else:
+            if digest is None:
+                self._write_header(Request.LoadKernel)
+            else:
+                self._write_header(Request.LoadKernelCaching)
+                self._write_bytes(digest)
+            self._write_bytes(kernel_library)
+            self.kernel_upload_bytes += len(kernel_library)
+        self._pending_load = (kernel_library, digest, offer_hash)
+
+    def _read_load_reply(self, run=False):
+        # If run is set, a RunKernel request followed the load request, and
+        # the runtime replies KernelStartupFailed to it if loading failed.
+        kernel_library, digest, offered_hash = self._pending_load
+        self._pending_load = None
 
         self._read_header()
+        if self._read_type == Reply.KernelNotCached:
+            logger.debug("kernel library not cached by the runtime")
+            self.cached_kernels.discard(digest)
+            if run:
+                self._read_empty(Reply.KernelStartupFailed)
+            self._write_load(kernel_library, offer_hash=False)
+            if run:
+                self._write_empty(Request.RunKernel)
+            self._flush()
+            self._read_load_reply(run)
+            return
         if self._read_type == Reply.LoadFailed:
-            raise LoadError(self._read_string())
-        else:
-            self._read_expect(Reply.LoadCompleted)
+            message = self._read_string()
+            if run:
+                self._read_empty(Reply.KernelStartupFailed)
+            raise LoadError(message)
+        self._read_expect(Reply.LoadCompleted)
+        if offered_hash:
+            self.kernel_cache_hits += 1
+        elif digest is not None:
+            self.cached_kernels.add(digest)
+
+    def _write_prefetch(self, kernel_library):
+        if not self.kernel_cache:
+            return
+        digest = hashlib.sha256(kernel_library).digest()
+        if (digest in self.cached_kernels
+                or digest == self._pending_load[1]):
+            return
+        self._write_header(Request.CacheKernel)
+        self._write_bytes(digest)
+        self._write_bytes(kernel_library)
+        self.kernel_upload_bytes += len(kernel_library)
+        self.cached_kernels.add(digest)
+
+    def load(self, kernel_library):
+        self._write_load(kernel_library)
+        self._flush()
+        self._read_load_reply()
 
     def run(self):
         self._write_empty(Request.RunKernel)
         self._flush()
         logger.debug("running kernel")
 
+    def load_and_run(self, kernel_library, prefetch=None):
+        """Loads and runs a kernel without waiting for the core device to
+        acknowledge the load request, saving a round trip. Load errors are
+        raised by :meth:`serve`.
+
+        :param prefetch: a kernel library that the runtime stores in its
+            cache while the kernel runs, so that loading it later only
+            requires sending its hash. It is only sent if the runtime
+            supports the kernel library cache and does not have it already.
+        """
+        self._write_load(kernel_library)
+        self._write_empty(Request.RunKernel)
+        if prefetch is not None:
+            self._write_prefetch(prefetch)
+        self._flush()
+        logger.debug("running kernel")
+
+    def dma_upload(self, name, trace, duration):
+        """Stores a DMA trace, as built by
+        :func:`artiq.coredevice.dma.encode_trace`, in the runtime. The
+        runtime does not reply."""
+        if not self.dma_upload_supported:
+            raise UnsupportedDevice("The runtime does not support uploading "
+                                    "DMA traces; upgrade the firmware")
+        self._write_header(Request.DMAUpload)
+        self._write_string(name)
+        self._write_int64(duration)
+        self._write_bytes(trace)
+        self._flush()
+        logger.debug("uploaded DMA trace %s (%d bytes)", name, len(trace))
+
     _rpc_sentinel = object()
 
     # See rpc_proto.rs and compiler/ir.py:rpc_tag.
@@ -699,6 +818,8 @@ class CommKernel:
                            f"reported during kernel execution")
 
     def serve(self, embedding_map, symbolizer, demangler):
+        if self._pending_load is not None:
+            self._read_load_reply(run=True)
         while True:
             self._read_header()
             if self._read_type == Reply.RPCRequest:
@@ -22,6 +22,51 @@ class TTLOverride(Enum):
     oe = 2
 
 
+_monitor_struct = struct.Struct("<lbq")
+_injection_status_struct = struct.Struct("<lbb")
+
+
+def parse_packets(buffer, packet_types):
+    """Decodes all the complete packets at the beginning of ``buffer``.
+
+    :param packet_types: dictionary mapping the type byte of each packet to
+        a ``(struct.Struct, callback)`` pair. The callback is called with the
+        unpacked payload.
+    :returns: the number of bytes consumed.
+    """
+    offset = 0
+    length = len(buffer)
+    while offset < length:
+        ty = buffer[offset]
+        try:
+            payload_struct, callback = packet_types[ty]
+        except KeyError:
+            raise ValueError("Unknown packet type", bytes([ty]))
+        end = offset + 1 + payload_struct.size
+        if end > length:
+            break
+        callback(*payload_struct.unpack_from(buffer, offset + 1))
+        offset = end
+    return offset
+
+
+async def receive_packets(reader, packet_types, read_size=65536):
+    """Reads packets from ``reader`` until the end of the stream, decoding
+    as many packets as are available after each read
+    (see :func:`parse_packets`)."""
+    buffer = bytearray()
+    while True:
+        data = await reader.read(read_size)
+        if not data:
+            return
+        if buffer:
+            buffer += data
+        else:
+            buffer = bytearray(data)
+        consumed = parse_packets(buffer, packet_types)
+        del buffer[:consumed]
+
+
 class CommMonInj:
     def __init__(self, monitor_cb, injection_status_cb, disconnect_cb=None):
         self.monitor_cb = monitor_cb
@@ -77,20 +122,10 @@ class CommMonInj:
 
     async def _receive_cr(self):
         try:
-            while True:
-                ty = await self._reader.read(1)
-                if not ty:
-                    return
-                if ty == b"\x00":
-                    payload = await self._reader.readexactly(13)
-                    channel, probe, value = struct.unpack("<lbq", payload)
-                    self.monitor_cb(channel, probe, value)
-                elif ty == b"\x01":
-                    payload = await self._reader.readexactly(6)
-                    channel, override, value = struct.unpack("<lbb", payload)
-                    self.injection_status_cb(channel, override, value)
-                else:
-                    raise ValueError("Unknown packet type", ty)
+            await receive_packets(self._reader, {
+                0: (_monitor_struct, self.monitor_cb),
+                1: (_injection_status_struct, self.injection_status_cb)
+            })
         finally:
             if self.disconnect_cb is not None:
                 self.disconnect_cb()
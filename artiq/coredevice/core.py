@@ -1,5 +1,7 @@
 import os, sys
+import logging
 import numpy
+from collections import deque
 from functools import wraps
 
 from pythonparser import diagnostic
@@ -12,13 +14,18 @@ from artiq.language.units import *
 
 from artiq.compiler.module import Module
 from artiq.compiler.embedding import Stitcher
-from artiq.compiler.targets import RV32IMATarget, RV32GTarget, CortexA9Target
+from artiq.compiler.targets import (RV32IMATarget, RV32GTarget, CortexA9Target,
+                                    NativeTarget)
+from artiq.compiler.profiler import PassProfiler, NullProfiler, profiling_requested
 
 from artiq.coredevice.comm_kernel import CommKernel, CommKernelDummy
 # Import for side effects (creating the exception classes).
 from artiq.coredevice import exceptions
 
 
+logger = logging.getLogger(__name__)
+
+
 def _render_diagnostic(diagnostic, colored):
     def shorten_path(path):
         return path.replace(artiq_dir, "<artiq>")
@@ -66,13 +73,25 @@ class Core:
     :param ref_multiplier: ratio between the RTIO fine timestamp frequency
         and the RTIO coarse timestamp frequency (e.g. SERDES multiplication
         factor).
+    :param target: instruction set of the core device CPU: ``"rv32g"``,
+        ``"rv32ima"`` or ``"cortexa9"``. ``"native"`` compiles kernels for
+        the host, to be run by the core device emulator
+        (``artiq_coreemu``).
+    :param profile_compiler: record per-pass compilation metrics for each
+        kernel in :attr:`compiler_profiles`. Also enabled by setting the
+        ``ARTIQ_PROFILE_COMPILER`` environment variable. When running under
+        the master, the reports are written to the ``compiler_profiles``
+        group of the results file.
+    :param max_compiler_profiles: number of most recent compilation reports
+        kept in :attr:`compiler_profiles`.
     """
 
     kernel_invariants = {
         "core", "ref_period", "coarse_ref_period", "ref_multiplier",
     }
 
-    def __init__(self, dmgr, host, ref_period, ref_multiplier=8, target="rv32g"):
+    def __init__(self, dmgr, host, ref_period, ref_multiplier=8, target="rv32g",
+                 profile_compiler=False, max_compiler_profiles=100):
         self.ref_period = ref_period
         self.ref_multiplier = ref_multiplier
         if target == "rv32g":
@@ -81,6 +100,8 @@ class Core:
             self.target_cls = RV32IMATarget
         elif target == "cortexa9":
             self.target_cls = CortexA9Target
+        elif target == "native":
+            self.target_cls = NativeTarget
         else:
             raise ValueError("Unsupported target")
         self.coarse_ref_period = ref_period*ref_multiplier
@@ -89,7 +110,11 @@ class Core:
         else:
             self.comm = CommKernel(host)
 
+        self.profile_compiler = profile_compiler or profiling_requested()
+        self.compiler_profiles = deque(maxlen=max_compiler_profiles)
+
         self.first_run = True
+        self.prefetch_library = None
         self.dmgr = dmgr
         self.core = self
         self.comm.core = self
@@ -99,22 +124,34 @@ class Core:
 
     def compile(self, function, args, kwargs, set_result=None,
                 attribute_writeback=True, print_as_rpc=True):
+        if self.profile_compiler:
+            profiler = PassProfiler(getattr(function, "__qualname__", repr(function)))
+            profiler.target = self.target_cls.triple
+        else:
+            profiler = NullProfiler()
+
         try:
             engine = _DiagnosticEngine(all_errors_are_fatal=True)
 
             stitcher = Stitcher(engine=engine, core=self, dmgr=self.dmgr,
                                 print_as_rpc=print_as_rpc)
-            stitcher.stitch_call(function, args, kwargs, set_result)
-            stitcher.finalize()
+            with profiler.measure("Stitcher", "frontend"):
+                stitcher.stitch_call(function, args, kwargs, set_result)
+                stitcher.finalize()
 
             module = Module(stitcher,
                 ref_period=self.ref_period,
-                attribute_writeback=attribute_writeback)
-            target = self.target_cls()
+                attribute_writeback=attribute_writeback,
+                profiler=profiler)
+            target = self.target_cls(profiler=profiler)
 
             library = target.compile_and_link([module])
             stripped_library = target.strip(library)
 
+            if self.profile_compiler:
+                self.compiler_profiles.append(profiler.report())
+                logger.debug("%s", profiler.format_report())
+
             return stitcher.embedding_map, stripped_library, \
                    lambda addresses: target.symbolize(library, addresses), \
                    lambda symbols: target.demangle(symbols)
@@ -125,8 +162,9 @@ class Core:
         if self.first_run:
             self.comm.check_system_info()
             self.first_run = False
-        self.comm.load(kernel_library)
-        self.comm.run()
+        # The load and run requests are sent together, and a load error is
+        # reported by serve().
+        self.comm.load_and_run(kernel_library, self.prefetch_library)
         self.comm.serve(embedding_map, symbolizer, demangler)
 
     def run(self, function, args, kwargs):
@@ -181,9 +219,28 @@ class Core:
             nonlocal result
             self._run_compiled(kernel_library, embedding_map, symbolizer, demangler)
             return result
+        run_precompiled.kernel_library = kernel_library
 
         return run_precompiled
 
+    def prefetch(self, precompiled):
+        """Upload a precompiled kernel to the core device while the next
+        kernels run, so that running it later only requires sending a hash
+        of it.
+
+        The kernel remains selected until this method is called again, and
+        it is only uploaded if the core device does not have it already.
+        This requires firmware that keeps a cache of kernel libraries;
+        otherwise, it has no effect.
+
+        :param precompiled: a callable returned by :meth:`precompile`, or
+            ``None`` to stop prefetching.
+        """
+        if precompiled is None:
+            self.prefetch_library = None
+        else:
+            self.prefetch_library = precompiled.kernel_library
+
     @portable
     def seconds_to_mu(self, seconds):
         """Convert seconds to the corresponding number of machine units
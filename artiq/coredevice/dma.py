@@ -5,6 +5,8 @@ the core device's SDRAM, and playing them back at higher speeds than the CPU
 alone could achieve.
 """
 
+import numpy
+
 from artiq.language.core import syscall, kernel
 from artiq.language.types import TInt32, TInt64, TStr, TNone, TTuple
 from artiq.coredevice.exceptions import DMAError
@@ -33,6 +35,119 @@ def dma_playback(timestamp: TInt64, ptr: TInt32) -> TNone:
     raise NotImplementedError("syscall not simulated")
 
 
+# See gateware/rtio/dma.py and dma_record_output_prepare in ksupport/lib.rs.
+_RECORD_HEADER_LENGTH = 13
+_MAX_WORDS = 16
+
+#: Data type of the events returned by :func:`decode_trace`. ``data`` holds
+#: ``words`` 32-bit words of RTIO data; the remaining words are zero.
+trace_event_dtype = numpy.dtype([
+    ("timestamp", numpy.int64),
+    ("channel", numpy.int32),
+    ("address", numpy.uint8),
+    ("words", numpy.uint8),
+    ("data", numpy.int32, (_MAX_WORDS,)),
+])
+
+
+def encode_trace(timestamp, channel, address, data):
+    """Builds a DMA trace from arrays of RTIO output events, in the format
+    recorded by :meth:`CoreDMA.record`. Events are played back in the given
+    order.
+
+    :param timestamp: timestamps of the events in machine units, relative to
+        the start of the playback.
+    :param channel: RTIO channel numbers.
+    :param address: RTIO addresses (e.g. register numbers); a scalar applies
+        to all events.
+    :param data: RTIO data, one 32-bit word per event, or a 2-dimensional
+        array with one row of words per event for wide channels (at most 16
+        words). Unsigned 32-bit values are accepted.
+    :returns: the trace, as ``bytes``, without the terminating record.
+    """
+    timestamp = numpy.asarray(timestamp, numpy.int64)
+    count = len(timestamp)
+    channel = numpy.broadcast_to(numpy.asarray(channel, numpy.int64), (count,))
+    address = numpy.broadcast_to(numpy.asarray(address, numpy.int64), (count,))
+    data = numpy.asarray(data, numpy.int64)
+    if data.ndim == 1:
+        data = data[:, None]
+    if data.ndim != 2 or data.shape[0] != count:
+        raise ValueError("data must have one row per event")
+    words = data.shape[1]
+    if not 1 <= words <= _MAX_WORDS:
+        raise ValueError("events must have between 1 and {} words of data"
+                         .format(_MAX_WORDS))
+    if ((channel < 0) | (channel >= 1 << 24)).any():
+        raise ValueError("channel numbers must fit in 24 bits")
+    if ((address < 0) | (address >= 1 << 8)).any():
+        raise ValueError("addresses must fit in 8 bits")
+    if ((data < -(1 << 31)) | (data >= 1 << 32)).any():
+        raise ValueError("data words must fit in 32 bits")
+
+    length = _RECORD_HEADER_LENGTH + 4*words
+    records = numpy.empty((count, length), numpy.uint8)
+    records[:, 0] = length
+    records[:, 1:4] = channel.astype("<u4").view(numpy.uint8) \
+        .reshape(count, 4)[:, :3]
+    records[:, 4:12] = timestamp.astype("<i8").view(numpy.uint8) \
+        .reshape(count, 8)
+    records[:, 12] = address
+    records[:, 13:] = (data & 0xffffffff).astype("<u4").view(numpy.uint8) \
+        .reshape(count, 4*words)
+    return records.tobytes()
+
+
+def decode_trace(trace):
+    """Parses a DMA trace, e.g. built by :func:`encode_trace`.
+
+    Decoding stops at the terminating record (a zero byte), if any.
+
+    :returns: a numpy array of dtype :data:`trace_event_dtype`.
+    """
+    trace = numpy.frombuffer(trace, numpy.uint8)
+    offsets = None
+    if len(trace) and trace[0]:
+        # Fast path for traces where all events have the same width.
+        length = int(trace[0])
+        count = len(trace)//length
+        candidate = numpy.arange(count, dtype=numpy.int64)*length
+        end = count*length
+        if ((trace[candidate] == length).all()
+                and (end == len(trace) or trace[end] == 0)):
+            offsets = candidate
+    if offsets is None:
+        offsets = []
+        offset = 0
+        while offset < len(trace) and trace[offset] != 0:
+            offsets.append(offset)
+            offset += int(trace[offset])
+        offsets = numpy.array(offsets, numpy.int64)
+
+    lengths = trace[offsets].astype(numpy.int64)
+    words, remainder = numpy.divmod(lengths - _RECORD_HEADER_LENGTH, 4)
+    invalid = ((remainder != 0) | (words < 1) | (words > _MAX_WORDS)
+               | (offsets + lengths > len(trace)))
+    if invalid.any():
+        raise ValueError("invalid record at offset {}".format(
+            offsets[invalid][0]))
+
+    events = numpy.zeros(len(offsets), trace_event_dtype)
+    header = trace[offsets[:, None] + numpy.arange(_RECORD_HEADER_LENGTH)]
+    channel = numpy.zeros((len(offsets), 4), numpy.uint8)
+    channel[:, :3] = header[:, 1:4]
+    events["channel"] = channel.view("<u4")[:, 0]
+    events["timestamp"] = header[:, 4:12].copy().view("<i8")[:, 0]
+    events["address"] = header[:, 12]
+    events["words"] = words
+    for width in numpy.unique(words):
+        selected = words == width
+        data = trace[offsets[selected, None] + _RECORD_HEADER_LENGTH
+                     + numpy.arange(4*width)]
+        events["data"][selected, :width] = data.view("<i4")
+    return events
+
+
 class DMARecordContextManager:
     """Context manager returned by :meth:`CoreDMA.record()`.
 
@@ -82,6 +197,29 @@ class CoreDMA:
         self.recorder.name = name
         return self.recorder
 
+    def upload(self, name, timestamp, channel, address, data, duration=None):
+        """Builds a DMA trace from arrays of RTIO output events with
+        :func:`encode_trace` and stores it on the core device under the given
+        name, without running a kernel. Any previously recorded trace with the
+        same name is overwritten.
+
+        The trace is played back with :meth:`playback` or
+        :meth:`playback_handle`, like a recorded trace. This method must be
+        called from the host, not from a kernel.
+
+        :param duration: the time by which ``now`` advances when the trace is
+            played back, in machine units. Defaults to the largest timestamp.
+        """
+        trace = encode_trace(timestamp, channel, address, data)
+        if duration is None:
+            duration = int(numpy.max(timestamp, initial=0))
+        core = self.core
+        if core.first_run:
+            core.comm.check_system_info()
+            core.first_run = False
+        self.epoch += 1
+        core.comm.dma_upload(name, trace, duration)
+
     @kernel
     def erase(self, name):
         """Removes the DMA trace with the given name from storage."""
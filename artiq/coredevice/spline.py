@@ -1,3 +1,4 @@
+import numpy
 from numpy import int32, int64
 from artiq.language.core import kernel, portable, delay
 from artiq.coredevice.rtio import rtio_output, rtio_output_wide
@@ -163,6 +164,83 @@ class Spline:
         self.coeff_to_mu(coeff, coeff64)
         return self.coeff_as_packed_mu(coeff64)
 
+    def coeff_array_to_mu(self, coeff):
+        """Convert an array of floating point coefficients of several
+        segments into 64 bit integer machine units.
+
+        This is a host-only method, the vectorized equivalent of
+        :meth:`coeff_to_mu` applied to each row of ``coeff``.
+
+        :param coeff: Array of shape ``(n_segments, order)`` of coefficients
+            in physical units, lowest order first.
+        :return: Array of shape ``(n_segments, order)`` of ``int64``.
+        """
+        coeff = numpy.array(coeff, dtype=float, ndmin=2)
+        coeff64 = numpy.empty(coeff.shape, dtype=int64)
+        for i in range(coeff.shape[1]):
+            vi = coeff[:, i]*self.scale
+            for j in range(i):
+                vi *= self.time_scale
+            coeff64[:, i] = numpy.rint(vi)
+        # see coeff_to_mu()
+        if coeff.shape[1] > 2:
+            c2 = coeff64[:, 2].copy()
+            coeff64[:, 1] += c2 >> self.time_width + 1
+        if coeff.shape[1] > 3:
+            c3 = coeff64[:, 3]
+            coeff64[:, 2] += c3 >> self.time_width
+            coeff64[:, 1] += c3 // 6 >> 2*self.time_width
+        return coeff64
+
+    def coeff_array_as_packed_mu(self, coeff64):
+        """Pack 64 bit integer machine units coefficients of several
+        segments into 32 bit integer RTIO data.
+
+        This is a host-only method, the vectorized equivalent of
+        :meth:`coeff_as_packed_mu` applied to each row of ``coeff64``. All
+        segments have the same number of coefficients; shorter segments
+        can be padded with zeros.
+
+        :param coeff64: Array of shape ``(n_segments, order)`` of integer
+            machine units coefficients, lowest order first.
+        :return: Array of shape ``(n_segments, n_words)`` of ``int32``.
+            Each row (converted with ``list()``) can be passed to
+            :meth:`set_coeff_mu`, embedded into a kernel or recorded into a
+            DMA sequence.
+        """
+        coeff64 = numpy.array(coeff64, dtype=int64, ndmin=2)
+        n = coeff64.shape[1]
+        width = n*self.width + (n - 1)*n//2*self.time_width
+        packed = numpy.zeros((coeff64.shape[0], (width + 31)//32),
+                             dtype=numpy.uint64)
+        pos = 0
+        for i in range(n):
+            wi = self.width + i*self.time_width
+            ci = coeff64[:, i]
+            # Coefficients wider than 64 bits are sign-extended, as in
+            # pack_coeff_mu().
+            offset = 0
+            while offset < wi:
+                j = (pos + offset)//32
+                used = pos + offset - 32*j
+                avail = min(32 - used, wi - offset)
+                cij = (ci >> min(offset, 63)).view(numpy.uint64)
+                cij &= numpy.uint64((1 << avail) - 1)
+                packed[:, j] |= cij << numpy.uint64(used)
+                offset += avail
+            pos += wi
+        return packed.astype(numpy.uint32).view(int32)
+
+    def coeff_array_as_packed(self, coeff):
+        """Convert floating point spline coefficients of several segments
+        into 32 bit integer packed data.
+
+        This is a host-only method, the vectorized equivalent of
+        :meth:`coeff_as_packed` applied to each row of ``coeff``. See
+        :meth:`coeff_array_as_packed_mu`.
+        """
+        return self.coeff_array_as_packed_mu(self.coeff_array_to_mu(coeff))
+
     @kernel(flags={"fast-math"})
     def set_coeff(self, coeff):  # TList(TFloat)
         """Set spline coefficients.
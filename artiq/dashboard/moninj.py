@@ -1,12 +1,12 @@
 import asyncio
 import logging
-from collections import namedtuple
 
 from PyQt5 import QtCore, QtWidgets, QtGui
 
 from sipyco.sync_struct import Subscriber
 
 from artiq.coredevice.comm_moninj import *
+from artiq.dashboard.moninj_ddb import DescriptionTracker
 from artiq.gui.tools import LayoutWidget
 from artiq.gui.flowlayout import FlowLayout
 
@@ -198,48 +198,11 @@ class _DACWidget(_SimpleDisplayWidget):
         return (self.spi_channel, self.channel)
 
 
-_WidgetDesc = namedtuple("_WidgetDesc", "uid comment cls arguments")
-
-
-def setup_from_ddb(ddb):
-    mi_addr = None
-    mi_port = None
-    dds_sysclk = None
-    description = set()
-
-    for k, v in ddb.items():
-        try:
-            if isinstance(v, dict):
-                comment = v.get("comment")
-                if v["type"] == "local":
-                    if v["module"] == "artiq.coredevice.ttl":
-                        channel = v["arguments"]["channel"]
-                        force_out = v["class"] == "TTLOut"
-                        widget = _WidgetDesc(k, comment, _TTLWidget, (channel, force_out, k))
-                        description.add(widget)
-                    elif (v["module"] == "artiq.coredevice.ad9914"
-                            and v["class"] == "AD9914"):
-                        bus_channel = v["arguments"]["bus_channel"]
-                        channel = v["arguments"]["channel"]
-                        dds_sysclk = v["arguments"]["sysclk"]
-                        widget = _WidgetDesc(k, comment, _DDSWidget, (bus_channel, channel, k))
-                        description.add(widget)
-                    elif (   (v["module"] == "artiq.coredevice.ad53xx" and v["class"] == "AD53xx")
-                          or (v["module"] == "artiq.coredevice.zotino" and v["class"] == "Zotino")):
-                        spi_device = v["arguments"]["spi_device"]
-                        spi_device = ddb[spi_device]
-                        while isinstance(spi_device, str):
-                            spi_device = ddb[spi_device]
-                        spi_channel = spi_device["arguments"]["channel"]
-                        for channel in range(32):
-                            widget = _WidgetDesc((k, channel), comment, _DACWidget, (spi_channel, channel, k))
-                            description.add(widget)
-                elif v["type"] == "controller" and k == "core_moninj":
-                    mi_addr = v["host"]
-                    mi_port = v.get("port_proxy", 1383)
-        except KeyError:
-            pass
-    return mi_addr, mi_port, dds_sysclk, description
+_widget_classes = {
+    "ttl": _TTLWidget,
+    "dds": _DDSWidget,
+    "dac": _DACWidget,
+}
 
 
 class _DeviceManager:
@@ -251,7 +214,7 @@ class _DeviceManager:
         self.mi_connector_task = asyncio.ensure_future(self.mi_connector())
 
         self.ddb = dict()
-        self.description = set()
+        self.description_tracker = DescriptionTracker()
         self.widgets_by_uid = dict()
 
         self.dds_sysclk = 0
@@ -267,59 +230,77 @@ class _DeviceManager:
         return ddb
 
     def notify(self, mod):
-        mi_addr, mi_port, dds_sysclk, description = setup_from_ddb(self.ddb)
+        tracker = self.description_tracker
+        removed, added = tracker.update(self.ddb, mod)
 
-        if (mi_addr, mi_port) != (self.mi_addr, self.mi_port):
-            self.mi_addr = mi_addr
-            self.mi_port = mi_port
+        if (tracker.mi_addr, tracker.mi_port) != (self.mi_addr, self.mi_port):
+            self.mi_addr = tracker.mi_addr
+            self.mi_port = tracker.mi_port
             self.reconnect_mi.set()
 
-        self.dds_sysclk = dds_sysclk
+        self.dds_sysclk = tracker.dds_sysclk
 
-        for to_remove in self.description - description:
+        # Widgets are created and deleted first, then each dock is laid out
+        # once and the monitoring subscriptions are updated.
+        relayout = set()
+        unmonitor = []
+        monitor = []
+        for to_remove in removed:
             widget = self.widgets_by_uid[to_remove.uid]
             del self.widgets_by_uid[to_remove.uid]
 
             if isinstance(widget, _TTLWidget):
-                self.setup_ttl_monitoring(False, widget.channel)
-                widget.deleteLater()
                 del self.ttl_widgets[widget.channel]
-                self.ttl_cb()
+                relayout.add(_TTLWidget)
             elif isinstance(widget, _DDSWidget):
-                self.setup_dds_monitoring(False, widget.bus_channel, widget.channel)
-                widget.deleteLater()
                 del self.dds_widgets[(widget.bus_channel, widget.channel)]
-                self.dds_cb()
+                relayout.add(_DDSWidget)
             elif isinstance(widget, _DACWidget):
-                self.setup_dac_monitoring(False, widget.spi_channel, widget.channel)
-                widget.deleteLater()
                 del self.dac_widgets[(widget.spi_channel, widget.channel)]
-                self.dac_cb()     
+                relayout.add(_DACWidget)
             else:
                 raise ValueError
+            widget.deleteLater()
+            unmonitor.append(widget)
 
-        for to_add in description - self.description:
-            widget = to_add.cls(self, *to_add.arguments)
+        for to_add in added:
+            cls = _widget_classes[to_add.kind]
+            widget = cls(self, *to_add.arguments)
             if to_add.comment is not None:
                 widget.setToolTip(to_add.comment)
             self.widgets_by_uid[to_add.uid] = widget
 
             if isinstance(widget, _TTLWidget):
                 self.ttl_widgets[widget.channel] = widget
-                self.ttl_cb()
-                self.setup_ttl_monitoring(True, widget.channel)
             elif isinstance(widget, _DDSWidget):
                 self.dds_widgets[(widget.bus_channel, widget.channel)] = widget
-                self.dds_cb()
-                self.setup_dds_monitoring(True, widget.bus_channel, widget.channel)
             elif isinstance(widget, _DACWidget):
                 self.dac_widgets[(widget.spi_channel, widget.channel)] = widget
-                self.dac_cb()
-                self.setup_dac_monitoring(True, widget.spi_channel, widget.channel)
             else:
                 raise ValueError
-
-        self.description = description
+            relayout.add(cls)
+            monitor.append(widget)
+
+        if _TTLWidget in relayout:
+            self.ttl_cb()
+        if _DDSWidget in relayout:
+            self.dds_cb()
+        if _DACWidget in relayout:
+            self.dac_cb()
+
+        for enable, widgets in (False, unmonitor), (True, monitor):
+            for widget in widgets:
+                self.setup_widget_monitoring(enable, widget)
+
+    def setup_widget_monitoring(self, enable, widget):
+        if isinstance(widget, _TTLWidget):
+            self.setup_ttl_monitoring(enable, widget.channel)
+        elif isinstance(widget, _DDSWidget):
+            self.setup_dds_monitoring(enable, widget.bus_channel, widget.channel)
+        elif isinstance(widget, _DACWidget):
+            self.setup_dac_monitoring(enable, widget.spi_channel, widget.channel)
+        else:
+            raise ValueError
 
     def ttl_set_mode(self, channel, mode):
         if self.mi_connection is not None:
@@ -0,0 +1,168 @@
+"""Derivation of the moninj widgets from the device database.
+
+This module does not depend on Qt, so that the incremental processing of
+device database mods can be tested on its own.
+"""
+
+from collections import namedtuple
+
+
+#: Description of a moninj widget. ``kind`` is ``"ttl"``, ``"dds"`` or
+#: ``"dac"``, and ``arguments`` are passed to the constructor of the widget.
+WidgetDesc = namedtuple("WidgetDesc", "uid comment kind arguments")
+
+
+def _resolve_alias(ddb, key, dependencies):
+    dependencies.add(key)
+    desc = ddb[key]
+    while isinstance(desc, str):
+        dependencies.add(desc)
+        desc = ddb[desc]
+    return desc
+
+
+def setup_from_ddb_entry(ddb, k, v, dependencies):
+    """Returns the moninj address of the entry ``k`` (if it is
+    ``core_moninj``), its DDS system clock (if it is a DDS) and its widget
+    descriptions.
+
+    Other device DB keys that were looked up (e.g. SPI buses, and the
+    aliases leading to them) are added to ``dependencies``, even if the
+    lookup failed.
+    """
+    moninj = None
+    dds_sysclk = None
+    description = set()
+    try:
+        if isinstance(v, dict):
+            comment = v.get("comment")
+            if v["type"] == "local":
+                if v["module"] == "artiq.coredevice.ttl":
+                    channel = v["arguments"]["channel"]
+                    force_out = v["class"] == "TTLOut"
+                    widget = WidgetDesc(k, comment, "ttl", (channel, force_out, k))
+                    description.add(widget)
+                elif (v["module"] == "artiq.coredevice.ad9914"
+                        and v["class"] == "AD9914"):
+                    bus_channel = v["arguments"]["bus_channel"]
+                    channel = v["arguments"]["channel"]
+                    dds_sysclk = v["arguments"]["sysclk"]
+                    widget = WidgetDesc(k, comment, "dds", (bus_channel, channel, k))
+                    description.add(widget)
+                elif (   (v["module"] == "artiq.coredevice.ad53xx" and v["class"] == "AD53xx")
+                      or (v["module"] == "artiq.coredevice.zotino" and v["class"] == "Zotino")):
+                    spi_device = v["arguments"]["spi_device"]
+                    spi_device = _resolve_alias(ddb, spi_device, dependencies)
+                    spi_channel = spi_device["arguments"]["channel"]
+                    for channel in range(32):
+                        widget = WidgetDesc((k, channel), comment, "dac", (spi_channel, channel, k))
+                        description.add(widget)
+            elif v["type"] == "controller" and k == "core_moninj":
+                moninj = v["host"], v.get("port_proxy", 1383)
+    except KeyError:
+        return None, None, set()
+    return moninj, dds_sysclk, description
+
+
+def setup_from_ddb(ddb):
+    mi_addr = None
+    mi_port = None
+    dds_sysclk = None
+    description = set()
+
+    for k, v in ddb.items():
+        moninj, entry_dds_sysclk, entry_description = \
+            setup_from_ddb_entry(ddb, k, v, set())
+        if moninj is not None:
+            mi_addr, mi_port = moninj
+        if entry_dds_sysclk is not None:
+            dds_sysclk = entry_dds_sysclk
+        description |= entry_description
+    return mi_addr, mi_port, dds_sysclk, description
+
+
+class DescriptionTracker:
+    """Keeps the widget descriptions of a device database up to date as
+    mods are applied to it.
+
+    The tracker keeps the widget descriptions of each device DB entry and
+    the keys each entry depends on (SPI buses of DACs and the aliases
+    leading to them), so that a mod only causes the modified entry and its
+    dependents to be processed again.
+    """
+    def __init__(self):
+        self.mi_addr = None
+        self.mi_port = None
+        self.dds_sysclk = None
+        self.description = set()
+
+        self.description_by_key = dict()
+        self.dds_sysclk_by_key = dict()
+        self.dependencies_by_key = dict()
+        self.dependents = dict()
+
+    def _modified_keys(self, ddb, mod):
+        if mod["action"] == "init":
+            return set(ddb) | set(self.description_by_key)
+        path = mod.get("path", [])
+        if path:
+            # modification inside an entry
+            return {path[0]}
+        if mod["action"] in {"setitem", "delitem"}:
+            return {mod["key"]}
+        return set(ddb) | set(self.description_by_key)
+
+    def _update_entry(self, ddb, k):
+        for dependency in self.dependencies_by_key.pop(k, ()):
+            dependents = self.dependents[dependency]
+            dependents.discard(k)
+            if not dependents:
+                del self.dependents[dependency]
+        old_description = self.description_by_key.pop(k, frozenset())
+        self.dds_sysclk_by_key.pop(k, None)
+        moninj = None
+        description = frozenset()
+
+        if k in ddb:
+            dependencies = set()
+            moninj, dds_sysclk, description = setup_from_ddb_entry(
+                ddb, k, ddb[k], dependencies)
+            description = frozenset(description)
+            if description:
+                self.description_by_key[k] = description
+            if dds_sysclk is not None:
+                self.dds_sysclk_by_key[k] = dds_sysclk
+            if dependencies:
+                self.dependencies_by_key[k] = dependencies
+                for dependency in dependencies:
+                    self.dependents.setdefault(dependency, set()).add(k)
+
+        if k == "core_moninj":
+            self.mi_addr, self.mi_port = \
+                (None, None) if moninj is None else moninj
+
+        return old_description - description, description - old_description
+
+    def update(self, ddb, mod):
+        """Processes the mod ``mod``, which has already been applied to
+        ``ddb``, and returns the sets of removed and added widget
+        descriptions."""
+        keys = self._modified_keys(ddb, mod)
+        for k in list(keys):
+            keys |= self.dependents.get(k, set())
+
+        removed = set()
+        added = set()
+        for k in keys:
+            entry_removed, entry_added = self._update_entry(ddb, k)
+            removed |= entry_removed
+            added |= entry_added
+
+        if self.dds_sysclk_by_key:
+            self.dds_sysclk = next(reversed(self.dds_sysclk_by_key.values()))
+        else:
+            self.dds_sysclk = None
+
+        self.description -= removed
+        self.description |= added
+        return removed, added
@@ -34,6 +34,21 @@ impl ListAlloc {
     pub unsafe fn add_range(&mut self, begin: *mut u8, end: *mut u8) {
         self.add(begin, end as usize - begin as usize)
     }
+
+    /// Returns the total size of the idle chunks.
+    pub fn free(&self) -> usize {
+        let mut total_idle = 0;
+        unsafe {
+            let mut curr = self.root;
+            while !curr.is_null() {
+                if (*curr).magic == MAGIC_FREE {
+                    total_idle += (*curr).size;
+                }
+                curr = (*curr).next;
+            }
+        }
+        total_idle
+    }
 }
 
 unsafe impl GlobalAlloc for ListAlloc {
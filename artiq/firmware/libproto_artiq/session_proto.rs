@@ -1,5 +1,6 @@
 use core::str::Utf8Error;
 use alloc::vec::Vec;
+use alloc::string::String;
 use eh::eh_artiq::{Exception, StackPointerBacktrace};
 use cslice::CSlice;
 
@@ -69,6 +70,11 @@ pub enum Request {
 
     LoadKernel(Vec<u8>),
     RunKernel,
+    LoadCachedKernel { hash: Vec<u8> },
+    LoadKernelCaching { hash: Vec<u8>, kernel: Vec<u8> },
+    CacheKernel { hash: Vec<u8>, kernel: Vec<u8> },
+
+    DmaUpload { name: String, duration: u64, trace: Vec<u8> },
 
     RpcReply { tag: Vec<u8> },
     RpcException {
@@ -91,6 +97,7 @@ pub enum Reply<'a> {
 
     LoadCompleted,
     LoadFailed(&'a str),
+    KernelNotCached,
 
     KernelFinished {
         async_errors: u8
@@ -118,6 +125,23 @@ impl Request {
 
             5  => Request::LoadKernel(reader.read_bytes()?),
             6  => Request::RunKernel,
+            9  => Request::LoadCachedKernel {
+                hash: reader.read_bytes()?
+            },
+            10 => Request::LoadKernelCaching {
+                hash:   reader.read_bytes()?,
+                kernel: reader.read_bytes()?
+            },
+            11 => Request::CacheKernel {
+                hash:   reader.read_bytes()?,
+                kernel: reader.read_bytes()?
+            },
+
+            12 => Request::DmaUpload {
+                name:     reader.read_string()?,
+                duration: reader.read_u64()?,
+                trace:    reader.read_bytes()?
+            },
 
             7  => Request::RpcReply {
                 tag: reader.read_bytes()?
@@ -171,6 +195,9 @@ impl<'a> Reply<'a> {
                 writer.write_u8(6)?;
                 writer.write_string(reason)?;
             },
+            Reply::KernelNotCached => {
+                writer.write_u8(16)?;
+            },
 
             Reply::KernelFinished { async_errors } => {
                 writer.write_u8(7)?;
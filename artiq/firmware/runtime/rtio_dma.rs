@@ -41,6 +41,14 @@ impl Manager {
     pub fn record_stop(&mut self, duration: u64) {
         let mut trace = Vec::new();
         mem::swap(&mut self.recording_trace, &mut trace);
+        let mut name = String::new();
+        mem::swap(&mut self.recording_name, &mut name);
+        self.insert(name, trace, duration);
+    }
+
+    // Stores a complete trace, e.g. uploaded by the host, without disturbing
+    // a recording in progress.
+    pub fn insert(&mut self, name: String, mut trace: Vec<u8>, duration: u64) {
         trace.push(0);
         let data_len = trace.len();
 
@@ -56,8 +64,6 @@ impl Manager {
             trace[data_len + padding - i] = trace[data_len - i]
         }
 
-        let mut name = String::new();
-        mem::swap(&mut self.recording_name, &mut name);
         self.entries.insert(name, Entry {
             trace: trace,
             padding_len: padding,
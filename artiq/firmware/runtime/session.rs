@@ -57,11 +57,80 @@ macro_rules! unexpected {
      ($($arg:tt)*) => (return Err(Error::Unexpected(format!($($arg)*))));
 }
 
+// Total size of the kernel libraries kept for LoadCachedKernel requests.
+const KERNEL_CACHE_MAX_BYTES: usize = 4 << 20;
+// Cached kernel libraries are evicted while less than this much heap is idle,
+// so that uploads and DMA recordings do not run out of memory because of
+// the cache.
+const KERNEL_CACHE_HEAP_RESERVE: usize = 8 << 20;
+
+// Capabilities advertised to the host after the gateware identifier in
+// the SystemInfo reply. Older hosts ignore them.
+const CAPABILITIES: &'static str = ";kernel_cache;dma_upload";
+
+// Kernel libraries recently uploaded by the host, indexed by the content hash
+// computed by the host, so that they can be loaded again without being
+// transferred. The most recently used library is last.
+struct KernelCache {
+    entries: Vec<(Vec<u8>, Vec<u8>)>,
+    size: usize
+}
+
+impl core::fmt::Debug for KernelCache {
+    fn fmt(&self, f: &mut core::fmt::Formatter<'_>) -> core::fmt::Result {
+        f.debug_struct("KernelCache")
+         .field("entries", &self.entries.len())
+         .field("size", &self.size)
+         .finish()
+    }
+}
+
+impl KernelCache {
+    fn new() -> KernelCache {
+        KernelCache { entries: Vec::new(), size: 0 }
+    }
+
+    fn take(&mut self, hash: &[u8]) -> Option<Vec<u8>> {
+        let index = self.entries.iter().position(|entry| entry.0[..] == hash[..])?;
+        let (_, library) = self.entries.remove(index);
+        self.size -= library.len();
+        Some(library)
+    }
+
+    fn insert(&mut self, hash: Vec<u8>, library: Vec<u8>) {
+        let _ = self.take(&hash);
+        if library.len() > KERNEL_CACHE_MAX_BYTES {
+            return
+        }
+        while self.size + library.len() > KERNEL_CACHE_MAX_BYTES {
+            self.evict_oldest();
+        }
+        self.size += library.len();
+        self.entries.push((hash, library));
+        self.trim()
+    }
+
+    fn evict_oldest(&mut self) {
+        let (_, library) = self.entries.remove(0);
+        self.size -= library.len();
+    }
+
+    // Evicts the least recently used libraries while the heap is short
+    // of idle memory.
+    fn trim(&mut self) {
+        while !self.entries.is_empty() &&
+                unsafe { ::ALLOC.free() } < KERNEL_CACHE_HEAP_RESERVE {
+            self.evict_oldest();
+        }
+    }
+}
+
 // Persistent state
 #[derive(Debug)]
 struct Congress {
     cache: Cache,
     dma_manager: DmaManager,
+    kernel_cache: KernelCache,
     finished_cleanly: Cell<bool>
 }
 
@@ -70,6 +139,7 @@ impl Congress {
         Congress {
             cache: Cache::new(),
             dma_manager: DmaManager::new(),
+            kernel_cache: KernelCache::new(),
             finished_cleanly: Cell::new(true)
         }
     }
@@ -129,6 +199,13 @@ fn host_read<R>(reader: &mut R) -> Result<host::Request, Error<R::ReadError>>
     let request = host::Request::read_from(reader)?;
     match &request {
         &host::Request::LoadKernel(_) => debug!("comm<-host LoadLibrary(...)"),
+        &host::Request::LoadKernelCaching { .. } =>
+            debug!("comm<-host LoadKernelCaching(...)"),
+        &host::Request::CacheKernel { .. } =>
+            debug!("comm<-host CacheKernel(...)"),
+        &host::Request::DmaUpload { ref name, duration, .. } =>
+            debug!("comm<-host DmaUpload {{ name: {:?}, duration: {}, ... }}",
+                   name, duration),
         _ => debug!("comm<-host {:?}", request)
     }
     Ok(request)
@@ -221,6 +298,20 @@ unsafe fn kern_load(io: &Io, session: &mut Session, library: &[u8])
     })
 }
 
+fn host_load_reply(stream: &mut TcpStream, result: Result<(), Error<SchedError>>)
+                   -> Result<(), Error<SchedError>> {
+    match result {
+        Ok(()) => host_write(stream, host::Reply::LoadCompleted)?,
+        Err(error) => {
+            let mut description = String::new();
+            write!(&mut description, "{}", error).unwrap();
+            host_write(stream, host::Reply::LoadFailed(&description))?;
+            kern_acknowledge()?;
+        }
+    }
+    Ok(())
+}
+
 fn kern_run(session: &mut Session) -> Result<(), Error<SchedError>> {
     if session.kernel_state != KernelState::Loaded {
         unexpected!("attempted to run a kernel while not in Loaded state")
@@ -234,25 +325,45 @@ fn kern_run(session: &mut Session) -> Result<(), Error<SchedError>> {
 fn process_host_message(io: &Io,
                         stream: &mut TcpStream,
                         session: &mut Session) -> Result<(), Error<SchedError>> {
+    // Make room for the request, which may be a kernel library or DMA trace.
+    session.congress.kernel_cache.trim();
     match host_read(stream)? {
         host::Request::SystemInfo => {
+            let mut ident = String::from(ident::read(&mut [0; 64]));
+            ident.push_str(CAPABILITIES);
             host_write(stream, host::Reply::SystemInfo {
-                ident: ident::read(&mut [0; 64]),
+                ident: &ident,
                 finished_cleanly: session.congress.finished_cleanly.get()
             })?;
             session.congress.finished_cleanly.set(true)
         }
 
-        host::Request::LoadKernel(kernel) =>
-            match unsafe { kern_load(io, session, &kernel) } {
-                Ok(()) => host_write(stream, host::Reply::LoadCompleted)?,
-                Err(error) => {
-                    let mut description = String::new();
-                    write!(&mut description, "{}", error).unwrap();
-                    host_write(stream, host::Reply::LoadFailed(&description))?;
-                    kern_acknowledge()?;
+        host::Request::LoadKernel(kernel) => {
+            let result = unsafe { kern_load(io, session, &kernel) };
+            host_load_reply(stream, result)?
+        }
+        host::Request::LoadKernelCaching { hash, kernel } => {
+            let result = unsafe { kern_load(io, session, &kernel) };
+            if result.is_ok() {
+                session.congress.kernel_cache.insert(hash, kernel);
+            }
+            host_load_reply(stream, result)?
+        }
+        host::Request::LoadCachedKernel { hash } =>
+            match session.congress.kernel_cache.take(&hash) {
+                None => host_write(stream, host::Reply::KernelNotCached)?,
+                Some(kernel) => {
+                    let result = unsafe { kern_load(io, session, &kernel) };
+                    session.congress.kernel_cache.insert(hash, kernel);
+                    host_load_reply(stream, result)?
                 }
             },
+        // Sent by the host while a kernel runs, to upload the next one.
+        // There is no reply.
+        host::Request::CacheKernel { hash, kernel } =>
+            session.congress.kernel_cache.insert(hash, kernel),
+        host::Request::DmaUpload { name, duration, trace } =>
+            session.congress.dma_manager.insert(name, trace, duration),
         host::Request::RunKernel =>
             match kern_run(session) {
                 Ok(()) => (),
@@ -368,6 +479,7 @@ fn process_kern_message(io: &Io, aux_mutex: &Mutex,
             }
 
             &kern::DmaRecordStart(name) => {
+                session.congress.kernel_cache.trim();
                 session.congress.dma_manager.record_start(name);
                 kern_acknowledge()
             }
@@ -4,13 +4,14 @@ import argparse
 import logging
 import asyncio
 import struct
+import time
 from enum import Enum
 
 from sipyco.asyncio_tools import AsyncioServer, SignalHandler
 from sipyco.pc_rpc import Server
 from sipyco import common_args
 
-from artiq.coredevice.comm_moninj import CommMonInj
+from artiq.coredevice.comm_moninj import CommMonInj, receive_packets
 
 
 logger = logging.getLogger(__name__)
@@ -25,6 +26,7 @@ class MonitorMux:
     def __init__(self):
         self.listeners = dict()
         self.comm_moninj = None
+        self.events = 0
 
     def _monitor(self, listener, event):
         try:
@@ -79,6 +81,7 @@ class MonitorMux:
             self._unmonitor(listener, (EventType.INJECTION, channel, overrd))
 
     def _event_cb(self, event, value):
+        self.events += 1
         try:
             listeners = self.listeners[event]
         except KeyError:
@@ -117,59 +120,124 @@ class MonitorMux:
                     raise ValueError
 
 
+_probe_struct = struct.Struct("<blbq")
+_injection_status_struct = struct.Struct("<blbb")
+
+
 class ProxyConnection:
-    def __init__(self, monitor_mux, reader, writer):
+    """Connection to a proxy client.
+
+    Monitoring events are not forwarded immediately: the latest value of
+    each channel is kept in a table that is sent to the client every
+    ``update_interval`` seconds, once the client has consumed the previous
+    update. Clients that cannot keep up receive coalesced state, and the
+    memory used for each client is bounded by the number of channels it
+    monitors.
+    """
+    def __init__(self, monitor_mux, reader, writer, update_interval=0.0):
         self.monitor_mux = monitor_mux
         self.reader = reader
         self.writer = writer
+        self.update_interval = update_interval
+
+        self.probe_values = dict()
+        self.injection_values = dict()
+        self.update_pending = asyncio.Event()
+
+        self.events = 0
+        self.coalesced_events = 0
+        self.bytes_sent = 0
 
     async def handle(self):
+        flush_task = asyncio.ensure_future(self._flush_cr())
+        comm_moninj = self.monitor_mux.comm_moninj
         try:
-            while True:
-                ty = await self.reader.read(1)
-                if not ty:
-                    return
-                if ty == b"\x00":     # MonitorProbe
-                    packet = await self.reader.readexactly(6)
-                    enable, channel, probe = struct.unpack("<blb", packet)
-                    self.monitor_mux.monitor_probe(self, enable, channel, probe)
-                elif ty == b"\x01":   # Inject
-                    packet = await self.reader.readexactly(6)
-                    channel, overrd, value = struct.unpack("<lbb", packet)
-                    self.monitor_mux.comm_moninj.inject(channel, overrd, value)
-                elif ty == b"\x02":   # GetInjectionStatus
-                    packet = await self.reader.readexactly(5)
-                    channel, overrd = struct.unpack("<lb", packet)
-                    self.monitor_mux.comm_moninj.get_injection_status(channel, overrd)
-                elif ty == b"\x03":   # MonitorInjection
-                    packet = await self.reader.readexactly(6)
-                    enable, channel, overrd = struct.unpack("<blb", packet)
-                    self.monitor_mux.monitor_injection(self, enable, channel, overrd)
-                else:
-                    raise ValueError
+            await receive_packets(self.reader, {
+                0: (struct.Struct("<blb"),        # MonitorProbe
+                    lambda enable, channel, probe:
+                        self.monitor_mux.monitor_probe(self, enable, channel, probe)),
+                1: (struct.Struct("<lbb"),        # Inject
+                    lambda channel, overrd, value:
+                        comm_moninj.inject(channel, overrd, value)),
+                2: (struct.Struct("<lb"),         # GetInjectionStatus
+                    lambda channel, overrd:
+                        comm_moninj.get_injection_status(channel, overrd)),
+                3: (struct.Struct("<blb"),        # MonitorInjection
+                    lambda enable, channel, overrd:
+                        self.monitor_mux.monitor_injection(self, enable, channel, overrd))
+            })
         finally:
+            flush_task.cancel()
             self.monitor_mux.remove_listener(self)
 
+    async def _flush_cr(self):
+        try:
+            while True:
+                await self.update_pending.wait()
+                # Values keep being coalesced while the client is slow.
+                await self.writer.drain()
+                self.update_pending.clear()
+                packets = [_probe_struct.pack(0, channel, probe, value)
+                           for (channel, probe), value in self.probe_values.items()]
+                packets += [_injection_status_struct.pack(1, channel, override, value)
+                            for (channel, override), value in self.injection_values.items()]
+                self.probe_values.clear()
+                self.injection_values.clear()
+                data = b"".join(packets)
+                self.writer.write(data)
+                self.bytes_sent += len(data)
+                if self.update_interval:
+                    await asyncio.sleep(self.update_interval)
+        except ConnectionError:
+            logger.debug("connection to client lost", exc_info=True)
+
     def monitor_cb(self, channel, probe, value):
-        packet = struct.pack("<blbq", 0, channel, probe, value)
-        self.writer.write(packet)
+        self.events += 1
+        key = (channel, probe)
+        if key in self.probe_values:
+            self.coalesced_events += 1
+        self.probe_values[key] = value
+        self.update_pending.set()
 
     def injection_status_cb(self, channel, override, value):
-        packet = struct.pack("<blbb", 1, channel, override, value)
-        self.writer.write(packet)
+        self.events += 1
+        key = (channel, override)
+        if key in self.injection_values:
+            self.coalesced_events += 1
+        self.injection_values[key] = value
+        self.update_pending.set()
+
+    def get_metrics(self):
+        transport = self.writer.transport
+        return {
+            "peer": str(transport.get_extra_info("peername")),
+            "events": self.events,
+            "coalesced_events": self.coalesced_events,
+            "bytes_sent": self.bytes_sent,
+            "pending_updates": len(self.probe_values) + len(self.injection_values),
+            "write_buffer_size": transport.get_write_buffer_size()
+        }
 
 
 class ProxyServer(AsyncioServer):
-    def __init__(self, monitor_mux):
+    def __init__(self, monitor_mux, update_interval=0.0):
         AsyncioServer.__init__(self)
         self.monitor_mux = monitor_mux
+        self.update_interval = update_interval
+        self.connections = set()
 
     async def _handle_connection_cr(self, reader, writer):
         line = await reader.readline()
         if line != b"ARTIQ moninj\n":
             logger.error("incorrect magic")
             return
-        await ProxyConnection(self.monitor_mux, reader, writer).handle()
+        connection = ProxyConnection(self.monitor_mux, reader, writer,
+                                     self.update_interval)
+        self.connections.add(connection)
+        try:
+            await connection.handle()
+        finally:
+            self.connections.remove(connection)
 
 
 def get_argparser():
@@ -180,15 +248,37 @@ def get_argparser():
         ("proxy", "proxying", 1383),
         ("control", "control", 1384)
     ])
+    parser.add_argument("--update-interval", default=0.05, type=float,
+                        help="minimum interval in seconds between monitoring "
+                             "updates sent to each client; updates of the same "
+                             "channel within an interval are coalesced "
+                             "(default: %(default)s)")
     parser.add_argument("core_addr", metavar="CORE_ADDR",
                         help="hostname or IP address of the core device")
     return parser
 
 
-class PingTarget:
+class ProxyControl:
+    def __init__(self, monitor_mux, proxy_server):
+        self.monitor_mux = monitor_mux
+        self.proxy_server = proxy_server
+        self.start_time = time.monotonic()
+
     def ping(self):
         return True
 
+    def get_metrics(self):
+        """Returns the number of events received from the core device, the
+        time elapsed since the proxy was started, and the backlog and
+        throughput of each client."""
+        return {
+            "uptime": time.monotonic() - self.start_time,
+            "events": self.monitor_mux.events,
+            "monitored": len(self.monitor_mux.listeners),
+            "clients": [connection.get_metrics()
+                        for connection in self.proxy_server.connections]
+        }
+
 
 def main():
     args = get_argparser().parse_args()
@@ -207,10 +297,11 @@ def main():
             monitor_mux.comm_moninj = comm_moninj
             loop.run_until_complete(comm_moninj.connect(args.core_addr))
             try:
-                proxy_server = ProxyServer(monitor_mux)
+                proxy_server = ProxyServer(monitor_mux, args.update_interval)
                 loop.run_until_complete(proxy_server.start(bind_address, args.port_proxy))
                 try:
-                    server = Server({"moninj_proxy": PingTarget()}, None, True)
+                    server = Server({"moninj_proxy": ProxyControl(monitor_mux, proxy_server)},
+                                    None, True)
                     loop.run_until_complete(server.start(bind_address, args.port_control))
                     try:
                         _, pending = loop.run_until_complete(asyncio.wait(
@@ -34,6 +34,13 @@ def get_argparser():
     parser.add_argument("--browse-root", default="",
                         help="root path for directory tree "
                         "(default %(default)s)")
+    parser.add_argument("--catalog", default=None,
+                        help="results catalog used to cache the metadata "
+                        "and thumbnails of results files (default: the "
+                        "catalog maintained by the master in the browse "
+                        "root or its 'results' subdirectory, if any, "
+                        "otherwise one in the user configuration "
+                        "directory)")
     parser.add_argument(
         "-s", "--server", default="::1",
         help="hostname or IP of the master to connect to "
@@ -49,7 +56,7 @@ def get_argparser():
 
 class Browser(QtWidgets.QMainWindow):
     def __init__(self, smgr, datasets_sub, browse_root,
-                 master_host, master_port):
+                 master_host, master_port, catalog_file=None):
         QtWidgets.QMainWindow.__init__(self)
         smgr.register(self)
 
@@ -73,7 +80,7 @@ class Browser(QtWidgets.QMainWindow):
             QtCore.Qt.ScrollBarAsNeeded)
         self.setCentralWidget(self.experiments)
 
-        self.files = files.FilesDock(datasets_sub, browse_root)
+        self.files = files.FilesDock(datasets_sub, browse_root, catalog_file)
         smgr.register(self.files)
 
         self.files.dataset_activated.connect(
@@ -152,7 +159,8 @@ def main():
     smgr = state.StateManager(args.db_file)
 
     browser = Browser(smgr, datasets_sub, args.browse_root,
-                      args.server, args.port)
+                      args.server, args.port, args.catalog)
+    atexit.register(browser.files.close_catalog)
     widget_log_handler.callback = browser.log.append_message
 
     if os.name == "nt":
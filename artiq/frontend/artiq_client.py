@@ -23,6 +23,8 @@ from sipyco.broadcast import Receiver
 from sipyco import common_args, pyon
 
 from artiq.tools import short_format, parse_arguments
+from artiq.master.log import log_batch_channel
+from artiq.master.publisher import filtered_name
 from artiq import __version__ as artiq_version
 
 
@@ -108,6 +110,15 @@ def get_argparser():
         "what", metavar="WHAT",
         choices=["schedule", "log", "ccb", "devices", "datasets"],
         help="select object to show: %(choices)s")
+    parser_show.add_argument(
+        "--log-level", default="DEBUG",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        help="minimum level of the log messages to show "
+             "(default: %(default)s)")
+    parser_show.add_argument(
+        "--prefix", default=[], action="append", dest="prefixes",
+        help="only show the datasets whose name starts with this prefix "
+             "(can be used multiple times)")
 
     subparsers.add_parser(
         "scan-devices", help="trigger a device database (re)scan")
@@ -261,8 +272,11 @@ def _run_subscriber(host, port, subscriber):
 
 def _show_dict(args, notifier_name, display_fun):
     d = dict()
+    initialized = False
 
     def init_d(x):
+        nonlocal initialized
+        initialized = True
         d.clear()
         d.update(x)
         return d
@@ -270,6 +284,21 @@ def _show_dict(args, notifier_name, display_fun):
                             lambda mod: display_fun(d))
     port = 3250 if args.port is None else args.port
     _run_subscriber(args.server, port, subscriber)
+    return initialized
+
+
+def _show_dataset_prefixes(args):
+    prefixes = tuple(args.prefixes)
+    if _show_dict(args, filtered_name("datasets", prefixes=prefixes),
+                  _show_datasets):
+        return
+    # Masters that do not serve filtered notifier names close the
+    # connection before sending the initial structure.
+    print("Master does not support filtered subscriptions, "
+          "filtering all datasets locally")
+    _show_dict(args, "datasets",
+               lambda d: _show_datasets({k: v for k, v in d.items()
+                                         if k.startswith(prefixes)}))
 
 
 def _print_log_record(record):
@@ -278,8 +307,15 @@ def _print_log_record(record):
     print(level, source, t, message)
 
 
+def _print_log_records(records):
+    for record in records:
+        _print_log_record(record)
+
+
 def _show_log(args):
-    subscriber = Receiver("log", [_print_log_record])
+    subscriber = Receiver(
+        log_batch_channel(getattr(logging, args.log_level)),
+        [_print_log_records])
     port = 1067 if args.port is None else args.port
     _run_subscriber(args.server, port, subscriber)
 
@@ -307,7 +343,10 @@ def main():
         elif args.what == "devices":
             _show_dict(args, "devices", _show_devices)
         elif args.what == "datasets":
-            _show_dict(args, "datasets", _show_datasets)
+            if args.prefixes:
+                _show_dataset_prefixes(args)
+            else:
+                _show_dict(args, "datasets", _show_datasets)
         else:
             raise ValueError
     else:
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import argparse
+import logging
+import threading
+
+import numpy
+
+from sipyco import common_args
+
+from artiq.sim.comm_kernel import CoreEmulator
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_argparser():
+    parser = argparse.ArgumentParser(
+        description="ARTIQ core device emulator. Runs kernels compiled with "
+                    "the native target (core device option "
+                    "target=\"native\") on the host.")
+    common_args.verbosity_args(parser)
+    parser.add_argument("--bind", default="127.0.0.1",
+                        help="address to listen on (default: %(default)s)")
+    parser.add_argument("-p", "--port", type=int, default=1381,
+                        help="TCP port to listen on (default: %(default)d)")
+    parser.add_argument("--write-cost", type=int, default=0,
+                        help="number of machine units by which the RTIO "
+                             "counter advances for each RTIO write "
+                             "(default: %(default)d)")
+    parser.add_argument("--rtio-log", default=None,
+                        help="after each kernel, save the RTIO event log "
+                             "to this file (numpy .npy format)")
+    return parser
+
+
+def main():
+    args = get_argparser().parse_args()
+    common_args.init_logger_from_args(args)
+
+    def on_kernel_finished(emulator):
+        logger.info("kernel finished (%d kernels, %d RPCs, %d RTIO events "
+                    "so far)", emulator.kernels_run, emulator.rpc_count,
+                    len(emulator.sed.events()))
+        if args.rtio_log is not None:
+            numpy.save(args.rtio_log, emulator.sed.events())
+
+    emulator = CoreEmulator(host=args.bind, port=args.port,
+                            write_cost=args.write_cost,
+                            on_kernel_finished=on_kernel_finished)
+    emulator.start()
+    print("Listening on {}:{}".format(args.bind, emulator.port))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,7 @@ from artiq import __artiq_dir__ as artiq_dir, __version__ as artiq_version
 from artiq.tools import get_user_config_dir
 from artiq.gui.models import ModelSubscriber
 from artiq.gui import state, log
+from artiq.master.log import log_batch_channel
 from artiq.dashboard import (experiments, shortcuts, explorer,
                              moninj, datasets, schedule, applets_ccb)
 
@@ -43,6 +44,11 @@ def get_argparser():
     parser.add_argument(
         "--db-file", default=None,
         help="database file for local GUI settings")
+    parser.add_argument(
+        "--log-level", default="DEBUG",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        help="minimum level of the log messages sent by the master "
+             "(default: %(default)s)")
     common_args.verbosity_args(parser)
     return parser
 
@@ -143,8 +149,10 @@ def main():
         sub_clients[notifier_name] = subscriber
 
     broadcast_clients = dict()
-    for target in "log", "ccb":
-        client = Receiver(target, [], report_disconnect)
+    for target, channel in (
+            ("log", log_batch_channel(getattr(logging, args.log_level))),
+            ("ccb", "ccb")):
+        client = Receiver(channel, [], report_disconnect)
         loop.run_until_complete(client.connect(
             args.server, args.port_broadcast))
         atexit_register_coroutine(client.close)
@@ -194,7 +202,7 @@ def main():
 
     logmgr = log.LogDockManager(main_window)
     smgr.register(logmgr)
-    broadcast_clients["log"].notify_cbs.append(logmgr.append_message)
+    broadcast_clients["log"].notify_cbs.append(logmgr.append_messages)
     widget_log_handler.callback = logmgr.append_message
 
     # lay out docks
@@ -6,14 +6,14 @@ import atexit
 import logging
 
 from sipyco.pc_rpc import Server as RPCServer
-from sipyco.sync_struct import Publisher
 from sipyco.logging_tools import Server as LoggingServer
 from sipyco.broadcast import Broadcaster
 from sipyco import common_args
 from sipyco.asyncio_tools import atexit_register_coroutine, SignalHandler
 
 from artiq import __version__ as artiq_version
-from artiq.master.log import log_args, init_log
+from artiq.master.log import log_args, init_log, LogBatcher
+from artiq.master.publisher import Publisher
 from artiq.master.databases import DeviceDB, DatasetDB
 from artiq.master.scheduler import Scheduler
 from artiq.master.rid_counter import RIDCounter
@@ -39,9 +39,21 @@ def get_argparser():
     group = parser.add_argument_group("databases")
     group.add_argument("--device-db", default="device_db.py",
                        help="device database file (default: '%(default)s')")
+    group.add_argument("--device-db-cache", default=False, action="store_true",
+                       help="reuse the evaluated device database from the "
+                            "user cache directory while its source files are "
+                            "unchanged; only use this if the device database "
+                            "does not depend on other data")
     group.add_argument("--dataset-db", default="dataset_db.pyon",
                        help="dataset file (default: '%(default)s')")
 
+    group = parser.add_argument_group("results")
+    group.add_argument(
+        "--background-results", default=False, action="store_true",
+        help="write the HDF5 results file of each run in a background "
+             "process, so that the worker can exit and release its devices "
+             "while the results are written")
+
     group = parser.add_argument_group("repository")
     group.add_argument(
         "-g", "--git", default=False, action="store_true",
@@ -87,8 +99,11 @@ def main():
         bind, args.port_broadcast))
     atexit_register_coroutine(server_broadcast.stop)
 
-    log_forwarder.callback = (lambda msg:
-        server_broadcast.broadcast("log", msg))
+    log_batcher = LogBatcher(server_broadcast,
+                             legacy_channel=args.log_legacy_channel)
+    log_forwarder.callback = log_batcher.append
+    log_batcher.start()
+    atexit_register_coroutine(log_batcher.stop)
     def ccb_issue(service, *args, **kwargs):
         msg = {
             "service": service,
@@ -97,7 +112,7 @@ def main():
         }
         server_broadcast.broadcast("ccb", msg)
 
-    device_db = DeviceDB(args.device_db)
+    device_db = DeviceDB(args.device_db, use_cache=args.device_db_cache)
     dataset_db = DatasetDB(args.dataset_db)
     dataset_db.start()
     atexit_register_coroutine(dataset_db.stop)
@@ -111,7 +126,8 @@ def main():
         repo_backend, worker_handlers, args.experiment_subdir)
     atexit.register(experiment_db.close)
 
-    scheduler = Scheduler(RIDCounter(), worker_handlers, experiment_db)
+    scheduler = Scheduler(RIDCounter(), worker_handlers, experiment_db,
+                          background_results=args.background_results)
     scheduler.start()
     atexit_register_coroutine(scheduler.stop)
 
@@ -57,8 +57,7 @@ class FileRunner(EnvExperiment):
     def run(self):
         kernel_library = self.compile()
 
-        self.core.comm.load(kernel_library)
-        self.core.comm.run()
+        self.core.comm.load_and_run(kernel_library)
         self.core.comm.serve(StubEmbeddingMap(),
             lambda addresses: self.target.symbolize(kernel_library, addresses), \
             lambda symbols: self.target.demangle(symbols))
@@ -200,6 +199,7 @@ def run(with_file=False):
     try:
         exp_inst = _build_experiment(device_mgr, dataset_mgr, args)
         exp_inst.prepare()
+        device_mgr.wait_connections()
         exp_inst.run()
         exp_inst.analyze()
     except CompileError as error:
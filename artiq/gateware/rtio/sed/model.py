@@ -0,0 +1,366 @@
+"""
+Software reference model of the SED.
+
+:class:`SEDModel` reproduces the cycle-level behavior of :class:`SED` in
+synchronous mode, for regression testing and for exploring the effect of the
+lane count and FIFO depth on long event sequences without running a gateware
+simulation.
+
+The lane distributor and FIFO occupancy are modelled write by write, as they
+depend on each other through CPU stalls. The gates, the output network and the
+output driver are then evaluated with numpy for all cycles at once, following
+the exact structure (and quirks) of the merge-sort network.
+
+Time is counted in cycles of the RTIO clock, and the coarse RTIO counter is
+assumed to be equal to the cycle number.
+"""
+
+from collections import namedtuple, deque
+
+import numpy
+
+from artiq.gateware.rtio import rtlink
+from artiq.gateware.rtio.sed import layouts
+from artiq.gateware.rtio.sed.output_network import boms_steps_pairs, latency
+
+
+__all__ = ["ChannelModel", "channels_from_rtio",
+           "WRITE_OK", "WRITE_UNDERFLOW", "WRITE_SEQUENCE_ERROR",
+           "WRITE_DROPPED", "write_dtype", "output_dtype", "collision_dtype",
+           "SEDModel"]
+
+
+ChannelModel = namedtuple("ChannelModel", "delay enable_replace fine_ts_width "
+                                          "address_width data_width")
+ChannelModel.__new__.__defaults__ = (0, True, 0, 0, 1)
+
+
+def channels_from_rtio(channels):
+    """Builds the :class:`ChannelModel` list matching a list of
+    :class:`artiq.gateware.rtio.Channel`."""
+    return [ChannelModel(channel.interface.o.delay,
+                         channel.interface.o.enable_replace,
+                         rtlink.get_fine_ts_width(channel.interface.o),
+                         rtlink.get_address_width(channel.interface.o),
+                         rtlink.get_data_width(channel.interface.o))
+            for channel in channels]
+
+
+WRITE_OK = 0
+WRITE_UNDERFLOW = 1
+WRITE_SEQUENCE_ERROR = 2
+# The write was accepted by the lane distributor, but the destination FIFO
+# was full and the event was lost. This happens when the next lane is full
+# while the current lane is not.
+WRITE_DROPPED = 3
+
+write_dtype = numpy.dtype([
+    ("cycle", numpy.int64),  # cycle in which the write command is presented
+    ("wait", numpy.int64),   # number of cycles the CPU is stalled afterwards
+    ("status", numpy.uint8),
+    ("lane", numpy.int16),
+    ("seqn", numpy.int64),
+])
+
+output_dtype = numpy.dtype([
+    ("cycle", numpy.int64),  # cycle in which the PHY strobe is asserted
+    ("channel", numpy.int32),
+    ("fine_ts", numpy.int32),
+    ("address", numpy.int64),
+    ("data", numpy.int64),
+])
+
+collision_dtype = numpy.dtype([
+    ("cycle", numpy.int64),  # cycle in which the collision flag is asserted
+    ("channel", numpy.int32),
+])
+
+
+def _cmp_wrap(a, b, width):
+    # Vectorized version of output_network.cmp_wrap.
+    a1 = (a >> (width - 1)) & 1
+    a2 = (a >> (width - 2)) & 1
+    b1 = (b >> (width - 1)) & 1
+    b2 = (b >> (width - 2)) & 1
+    wrapped = (a2 == a1) & (b2 == b1) & (a1 != b1)
+    return numpy.where(wrapped, a1 == 1, a < b)
+
+
+class SEDModel:
+    """Reference model of :class:`artiq.gateware.rtio.sed.core.SED` in
+    ``"sync"`` mode.
+
+    :param channels: list of :class:`ChannelModel`, see
+        :func:`channels_from_rtio`.
+    :param underflow_margin: number of cycles between the cycle in which a
+        write command is presented and the ``minimum_coarse_timestamp`` that
+        the lane distributor compares the event against.
+    :param write_interval: number of cycles between write commands when the
+        CPU does not have to wait.
+
+    The other parameters are the same as for ``SED``.
+    """
+    def __init__(self, channels, glbl_fine_ts_width,
+                 lane_count=8, fifo_depth=128, enable_spread=True,
+                 quash_channels=[], underflow_margin=14, write_interval=3):
+        if lane_count & (lane_count - 1):
+            raise ValueError("lane count must be a power of 2")
+        if underflow_margin < 2:
+            raise ValueError("events need at least 2 cycles to reach "
+                             "the FIFO outputs")
+
+        self.channels = channels
+        self.glbl_fine_ts_width = glbl_fine_ts_width
+        self.lane_count = lane_count
+        self.fifo_depth = fifo_depth
+        self.enable_spread = enable_spread
+        self.quash_channels = set(quash_channels)
+        self.underflow_margin = underflow_margin
+        self.write_interval = write_interval
+
+        self.seqn_width = layouts.seqn_width(lane_count, fifo_depth)
+        self.address_width = max(c.address_width for c in channels)
+        self.data_width = max(c.data_width for c in channels)
+        # gates, output network, collision detection and demultiplexing
+        self.output_latency = 1 + latency(lane_count) + 2
+
+    def run(self, timestamp, channel, address=None, data=None, start_cycle=0):
+        """Submits a sequence of events, written back-to-back by the CPU.
+
+        :param timestamp: array of event timestamps (fine RTIO units).
+        :param channel: array of event channel numbers.
+        :param address: array of event addresses, or ``None``.
+        :param data: array of event data, or ``None``.
+        :param start_cycle: cycle in which the CPU starts submitting.
+
+        :returns: a tuple ``(writes, outputs, collisions)`` of numpy arrays
+            with dtypes :data:`write_dtype` (one entry per event),
+            :data:`output_dtype` and :data:`collision_dtype` (sorted by
+            cycle).
+        """
+        timestamp = numpy.asarray(timestamp, numpy.int64)
+        channel = numpy.asarray(channel, numpy.int64)
+        count = len(timestamp)
+        if address is None:
+            address = numpy.zeros(count, numpy.int64)
+        if data is None:
+            data = numpy.zeros(count, numpy.int64)
+        address = numpy.asarray(address, numpy.int64) & \
+            ((1 << self.address_width) - 1)
+        data = numpy.asarray(data, numpy.int64)
+        if self.data_width < 64:
+            data = data & ((1 << self.data_width) - 1)
+
+        compensation = numpy.array([c.delay for c in self.channels],
+                                   numpy.int64)
+        coarse = (timestamp >> self.glbl_fine_ts_width) + compensation[channel]
+        fine_ts = timestamp & ((1 << self.glbl_fine_ts_width) - 1)
+
+        writes = self._distribute(coarse, channel, start_cycle)
+        outputs, collisions = self._output(
+            writes, coarse, channel, fine_ts, address, data)
+        return writes, outputs, collisions
+
+    def _distribute(self, coarse, channel, start_cycle):
+        lane_count = self.lane_count
+        fifo_depth = self.fifo_depth
+        enable_spread = self.enable_spread
+        quash_channels = self.quash_channels
+        underflow_margin = self.underflow_margin
+        write_interval = self.write_interval
+
+        # Results are collected in lists, which is much faster than
+        # writing into numpy arrays element by element.
+        cycles = []
+        waits = []
+        statuses = []
+        lanes = []
+        seqns = []
+
+        current_lane = 0
+        last_coarse = 0
+        lane_last = [0]*lane_count
+        # coarse timestamp of the last event actually stored in each lane
+        lane_tail = [0]*lane_count
+        # For each lane, the cycles at which the events still in the FIFO
+        # proper move to the output register of the buffered FIFO.
+        lane_fifo = [deque() for _ in range(lane_count)]
+        force_lane_b = False
+        seqn = 0
+
+        cycle = start_cycle + write_interval - 1
+        for i, (event_coarse, event_channel) in enumerate(
+                zip(coarse.tolist(), channel.tolist())):
+            cycles.append(cycle)
+            if event_channel in quash_channels:
+                waits.append(0)
+                statuses.append(WRITE_OK)
+                lanes.append(-1)
+                seqns.append(0)
+                cycle += write_interval
+                continue
+            if event_coarse <= cycle + underflow_margin:
+                waits.append(0)
+                statuses.append(WRITE_UNDERFLOW)
+                lanes.append(-1)
+                seqns.append(0)
+                cycle += write_interval
+                continue
+
+            if force_lane_b or event_coarse <= last_coarse:
+                lane = (current_lane + 1) % lane_count
+            else:
+                lane = current_lane
+            lanes.append(lane)
+            if event_coarse <= lane_last[lane]:
+                waits.append(0)
+                statuses.append(WRITE_SEQUENCE_ERROR)
+                seqns.append(0)
+                cycle += write_interval
+                continue
+
+            fifo = lane_fifo[lane]
+            while fifo and fifo[0] <= cycle:
+                fifo.popleft()
+            if len(fifo) >= fifo_depth:
+                statuses.append(WRITE_DROPPED)
+            else:
+                # The event reaches the output register two cycles after the
+                # write, or once the previous event has been read.
+                ready = lane_tail[lane] + 1
+                if ready < cycle + 2:
+                    ready = cycle + 2
+                if ready > event_coarse:
+                    raise ValueError("event {} reaches the output of lane {} "
+                                     "after its timestamp".format(i, lane))
+                fifo.append(ready)
+                lane_tail[lane] = event_coarse
+                statuses.append(WRITE_OK)
+            seqns.append(seqn)
+            seqn += 1
+            current_lane = lane
+            last_coarse = event_coarse
+            lane_last[lane] = event_coarse
+            force_lane_b = False
+
+            # The CPU polls the wait status bit of the current lane,
+            # starting the cycle after the write.
+            status_cycle = cycle + 1
+            while fifo and fifo[0] <= status_cycle:
+                fifo.popleft()
+            while len(fifo) >= fifo_depth:
+                status_cycle = fifo.popleft()
+            wait = status_cycle - cycle - 1
+            waits.append(wait)
+            if wait and enable_spread:
+                force_lane_b = True
+            cycle = status_cycle + write_interval - 1
+
+        writes = numpy.zeros(len(cycles), write_dtype)
+        writes["cycle"] = cycles
+        writes["wait"] = waits
+        writes["status"] = statuses
+        writes["lane"] = lanes
+        writes["seqn"] = seqns
+        writes["seqn"] &= (1 << self.seqn_width) - 1
+        return writes
+
+    def _output(self, writes, coarse, channel, fine_ts, address, data):
+        stored = (writes["status"] == WRITE_OK) & (writes["lane"] >= 0)
+        events = {
+            "coarse": coarse[stored],
+            "lane": writes["lane"][stored].astype(numpy.int64),
+            "seqn": writes["seqn"][stored],
+            "channel": channel[stored],
+            "fine_ts": fine_ts[stored],
+            "address": address[stored],
+            "data": data[stored],
+        }
+
+        # Events that are alone on their channel in their cycle go through
+        # the output network unchanged. Only the cycles that contain
+        # simultaneous events on the same channel need to be evaluated.
+        order = numpy.lexsort((events["channel"], events["coarse"]))
+        sorted_coarse = events["coarse"][order]
+        sorted_channel = events["channel"][order]
+        simultaneous = (sorted_coarse[1:] == sorted_coarse[:-1]) & \
+            (sorted_channel[1:] == sorted_channel[:-1])
+        contested = numpy.isin(events["coarse"],
+                               sorted_coarse[1:][simultaneous])
+
+        direct = {field: value[~contested] for field, value in events.items()}
+        network = {field: value[contested] for field, value in events.items()}
+        nodes, read_cycles = self._output_network(network)
+
+        enable_replace = numpy.array([c.enable_replace for c in self.channels],
+                                     bool)
+        collision = nodes["valid"] & nodes["replace"] & \
+            (~enable_replace[nodes["channel"]] | nodes["nondata_replace"])
+        row, node = numpy.nonzero(nodes["valid"] & ~collision)
+
+        outputs = numpy.zeros(len(direct["coarse"]) + len(row), output_dtype)
+        outputs["cycle"] = numpy.concatenate(
+            (direct["coarse"], read_cycles[row])) + self.output_latency
+        for field in "channel", "fine_ts", "address", "data":
+            outputs[field] = numpy.concatenate(
+                (direct[field], nodes[field][row, node]))
+        ts_shift = self.glbl_fine_ts_width - numpy.array(
+            [c.fine_ts_width for c in self.channels], numpy.int64)
+        outputs["fine_ts"] >>= ts_shift[outputs["channel"]]
+        outputs = outputs[numpy.lexsort((outputs["channel"], outputs["cycle"]))]
+
+        # When several lanes have a collision in the same cycle, the
+        # channel of the last one is reported.
+        collision_rows = numpy.nonzero(collision.any(axis=1))[0]
+        last_node = self.lane_count - 1 - numpy.argmax(
+            collision[collision_rows, ::-1], axis=1)
+        collisions = numpy.zeros(len(collision_rows), collision_dtype)
+        collisions["cycle"] = read_cycles[collision_rows] + self.output_latency
+        collisions["channel"] = nodes["channel"][collision_rows, last_node]
+
+        return outputs, collisions
+
+    def _output_network(self, events):
+        # One row per cycle in which at least one lane is read,
+        # one column per output network node.
+        read_cycles, row = numpy.unique(events["coarse"], return_inverse=True)
+        lane = events["lane"]
+        shape = (len(read_cycles), self.lane_count)
+        nodes = {
+            "valid": numpy.zeros(shape, bool),
+            "replace": numpy.zeros(shape, bool),
+            "nondata_replace": numpy.zeros(shape, bool),
+        }
+        nodes["valid"][row, lane] = True
+        for field in "seqn", "channel", "fine_ts", "address", "data":
+            nodes[field] = numpy.zeros(shape, numpy.int64)
+            nodes[field][row, lane] = events[field]
+
+        channel_width = max(len(self.channels) - 1, 1).bit_length()
+        for step in boms_steps_pairs(self.lane_count):
+            node1 = [pair[0] for pair in step]
+            node2 = [pair[1] for pair in step]
+            in1 = {field: value[:, node1] for field, value in nodes.items()}
+            in2 = {field: value[:, node2] for field, value in nodes.items()}
+
+            k1 = in1["channel"] | ((~in1["valid"]).astype(numpy.int64)
+                                   << channel_width)
+            k2 = in2["channel"] | ((~in2["valid"]).astype(numpy.int64)
+                                   << channel_width)
+            replace = k1 == k2
+            swap = numpy.where(replace,
+                               _cmp_wrap(in1["seqn"], in2["seqn"],
+                                         self.seqn_width),
+                               k1 > k2)
+            nondata_difference = (in1["fine_ts"] != in2["fine_ts"]) | \
+                (in1["address"] != in2["address"])
+
+            for field, value in nodes.items():
+                value[:, node1] = numpy.where(swap, in2[field], in1[field])
+                value[:, node2] = numpy.where(swap, in1[field], in2[field])
+            nodes["replace"][:, node1] |= replace
+            nodes["nondata_replace"][:, node1] = numpy.where(
+                replace, nondata_difference, nodes["nondata_replace"][:, node1])
+            nodes["valid"][:, node2] &= ~replace
+
+        return nodes, read_cycles
@@ -0,0 +1,175 @@
+import unittest
+import itertools
+import random
+
+import numpy
+from migen import *
+
+from artiq.gateware import rtio
+from artiq.gateware.rtio import cri, rtlink
+from artiq.gateware.rtio.sed.core import *
+from artiq.gateware.rtio.sed.model import *
+
+
+class PHY(Module):
+    def __init__(self, **kwargs):
+        self.rtlink = rtlink.Interface(rtlink.OInterface(8, 2, **kwargs))
+
+
+class DUT(Module):
+    def __init__(self, **kwargs):
+        self.submodules.phy0 = PHY()
+        self.submodules.phy1 = PHY(delay=3)
+        self.submodules.phy2 = PHY(enable_replace=False)
+
+        self.rtio_channels = [
+            rtio.Channel.from_phy(self.phy0),
+            rtio.Channel.from_phy(self.phy1),
+            rtio.Channel.from_phy(self.phy2)
+        ]
+
+        self.submodules.sed = SED(self.rtio_channels, 0, "sync", **kwargs)
+        self.sync += [
+            self.sed.coarse_timestamp.eq(self.sed.coarse_timestamp + 1),
+            self.sed.minimum_coarse_timestamp.eq(self.sed.coarse_timestamp + 16)
+        ]
+
+
+def simulate(events, **kwargs):
+    dut = DUT(**kwargs)
+
+    statuses = []
+    outputs = []
+    collisions = []
+
+    def gen():
+        for timestamp, channel, address, data in events:
+            yield dut.sed.cri.chan_sel.eq(channel)
+            yield dut.sed.cri.o_timestamp.eq(timestamp)
+            yield dut.sed.cri.o_address.eq(address)
+            yield dut.sed.cri.o_data.eq(data)
+            yield
+
+            yield dut.sed.cri.cmd.eq(cri.commands["write"])
+            yield
+            yield dut.sed.cri.cmd.eq(cri.commands["nop"])
+
+            wait = 0
+            yield
+            while (yield dut.sed.cri.o_status) & 0x01:
+                yield
+                wait += 1
+
+            status = WRITE_OK
+            if (yield dut.sed.cri.o_status) & 0x02:
+                status = WRITE_UNDERFLOW
+            if (yield dut.sed.sequence_error):
+                status = WRITE_SEQUENCE_ERROR
+            statuses.append((status, wait))
+
+    @passive
+    def monitor():
+        for cycle in itertools.count():
+            for n, channel in enumerate(dut.rtio_channels):
+                oif = channel.interface.o
+                if (yield oif.stb):
+                    outputs.append((cycle, n, (yield oif.address),
+                                    (yield oif.data)))
+            if (yield dut.sed.collision):
+                collisions.append((cycle, (yield dut.sed.collision_channel)))
+            yield
+
+    run_simulation(dut, {"sys": [
+        gen(), monitor(),
+        (None for _ in range(max(ts for ts, _, _, _ in events) + 40))
+    ]}, {"sys": 5, "rio": 5, "rio_phy": 5})
+
+    return dut.rtio_channels, statuses, outputs, collisions
+
+
+def random_events(count, seed, spacing=(3, 8)):
+    rng = random.Random(seed)
+    events = []
+    now = 40
+    while len(events) < count:
+        r = rng.random()
+        if r < 0.05:
+            timestamps = [0]    # underflow
+        elif r < 0.07:
+            timestamps = [now]*9    # more rewinds than lanes
+            now += 30
+        elif r < 0.25:
+            timestamps = [now - rng.randrange(4)]
+        else:
+            now += rng.randrange(*spacing)
+            timestamps = [now]
+        for timestamp in timestamps:
+            events.append((timestamp, rng.randrange(3), rng.randrange(4),
+                           rng.randrange(256)))
+    return events[:count]
+
+
+class TestSEDModel(unittest.TestCase):
+    def check(self, events, **kwargs):
+        """Compares the model with the gateware simulation. Output and
+        collision cycles are compared up to a constant latency."""
+        rtio_channels, statuses, outputs, collisions = simulate(events, **kwargs)
+
+        model = SEDModel(channels_from_rtio(rtio_channels), 0, **kwargs)
+        timestamp, channel, address, data = zip(*events)
+        m_writes, m_outputs, m_collisions = model.run(
+            timestamp, channel, address, data)
+
+        # A dropped event is not reported to the CPU.
+        m_statuses = numpy.where(m_writes["status"] == WRITE_DROPPED,
+                                 WRITE_OK, m_writes["status"])
+        self.assertEqual(statuses, list(zip(m_statuses.tolist(),
+                                            m_writes["wait"].tolist())))
+
+        self.assertEqual(len(outputs), len(m_outputs))
+        self.assertEqual([o[1:] for o in outputs],
+                         list(zip(m_outputs["channel"].tolist(),
+                                  m_outputs["address"].tolist(),
+                                  m_outputs["data"].tolist())))
+        if outputs:
+            offset = outputs[0][0] - m_outputs["cycle"][0]
+            self.assertEqual([o[0] for o in outputs],
+                             (m_outputs["cycle"] + offset).tolist())
+            self.assertEqual(collisions,
+                             list(zip((m_collisions["cycle"] + offset).tolist(),
+                                      m_collisions["channel"].tolist())))
+
+    def test_random(self):
+        for seed in range(2):
+            with self.subTest(seed=seed):
+                self.check(random_events(200, seed))
+
+    def test_small_fifos(self):
+        for seed in range(2):
+            with self.subTest(seed=seed):
+                events = random_events(200, seed, spacing=(8, 16))
+                self.check(events,
+                           lane_count=2, fifo_depth=2, enable_spread=False)
+                self.check(events,
+                           lane_count=4, fifo_depth=4, enable_spread=True)
+
+    def test_long_trace(self):
+        rng = numpy.random.default_rng(0)
+        count = 100000
+        increment = rng.integers(3, 8, count)
+        increment[rng.random(count) < 0.1] = 0
+        timestamp = 100 + numpy.cumsum(increment)
+        channels = [ChannelModel(enable_replace=True, data_width=8)]*4
+        model = SEDModel(channels, 0, fifo_depth=16)
+        channel = rng.integers(0, 4, count)
+        writes, outputs, collisions = model.run(
+            timestamp, channel, data=rng.integers(0, 256, count))
+
+        self.assertTrue((writes["status"] == WRITE_OK).all())
+        self.assertGreater(writes["wait"].sum(), 0)
+        self.assertEqual(len(collisions), 0)
+        # Simultaneous events on the same channel are replaced.
+        distinct = numpy.unique(numpy.stack((timestamp, channel), axis=1),
+                                axis=0)
+        self.assertEqual(len(outputs), len(distinct))
+        self.assertTrue((numpy.diff(outputs["cycle"]) >= 0).all())
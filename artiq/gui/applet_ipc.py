@@ -0,0 +1,146 @@
+"""Server side of the IPC between the dashboard or browser and the applets
+they start.
+
+This module does not depend on Qt.
+"""
+
+import asyncio
+import logging
+
+from sipyco.pipe_ipc import AsyncioParentComm
+from sipyco import pyon
+
+from artiq.gui.lazy_datasets import LazyDataset, resolve
+
+
+logger = logging.getLogger(__name__)
+
+
+class AppletIPCServer(AsyncioParentComm):
+    def __init__(self, datasets_sub):
+        AsyncioParentComm.__init__(self)
+        self.datasets_sub = datasets_sub
+        self.datasets = set()
+        self._pending_mods = None
+
+    def write_pyon(self, obj):
+        self.write(pyon.encode(obj).encode() + b"\n")
+
+    async def read_pyon(self):
+        line = await self.readline()
+        return pyon.decode(line.decode())
+
+    def _synthesize_init(self, data):
+        struct = {k: v for k, v in data.items() if k in self.datasets}
+        return {"action": "init",
+                "struct": struct}
+
+    def _on_mod(self, mod):
+        if mod["action"] == "init":
+            mod = self._synthesize_init(mod["struct"])
+        else:
+            if mod["path"]:
+                if mod["path"][0] not in self.datasets:
+                    return
+            elif mod["action"] in {"setitem", "delitem"}:
+                if mod["key"] not in self.datasets:
+                    return
+        self._write_mod(mod)
+
+    @staticmethod
+    def _lazy_values(mod):
+        if mod["action"] == "init":
+            values = mod["struct"].values()
+        elif mod["action"] == "setitem" and not mod["path"]:
+            values = [mod["value"]]
+        else:
+            return False
+        return any(isinstance(v, tuple) and isinstance(v[1], LazyDataset)
+                   for v in values)
+
+    def _write_mod(self, mod):
+        # Values of datasets read lazily from files (artiq_browser) are
+        # loaded in a thread before being sent. Mods are queued behind
+        # pending loads to preserve their order.
+        if self._pending_mods is None and not self._lazy_values(mod):
+            self.write_pyon({"action": "mod", "mod": mod})
+            return
+        if self._pending_mods is None:
+            self._pending_mods = []
+            asyncio.ensure_future(self._write_pending_mods())
+        self._pending_mods.append(mod)
+
+    @staticmethod
+    def _resolve_value(key, v):
+        if not isinstance(v, tuple):
+            return v
+        try:
+            return v[0], resolve(v[1])
+        except:
+            logger.warning("failed to load dataset '%s' for applet", key,
+                           exc_info=True)
+            return v[0], None
+
+    def _resolve_mod(self, mod):
+        # Values that cannot be loaded are replaced with None, so that the
+        # applet still receives the mod and the other values.
+        if mod["action"] == "init":
+            struct = {k: self._resolve_value(k, v)
+                      for k, v in mod["struct"].items()}
+            return {"action": "init", "struct": struct}
+        if mod["action"] == "setitem" and not mod["path"]:
+            mod = dict(mod, value=self._resolve_value(mod["key"], mod["value"]))
+        return mod
+
+    async def _write_pending_mods(self):
+        loop = asyncio.get_event_loop()
+        try:
+            while self._pending_mods:
+                mod = self._pending_mods.pop(0)
+                if self._lazy_values(mod):
+                    mod = await loop.run_in_executor(
+                        None, self._resolve_mod, mod)
+                self.write_pyon({"action": "mod", "mod": mod})
+        finally:
+            self._pending_mods = None
+
+    async def serve(self, embed_cb, fix_initial_size_cb):
+        self.datasets_sub.notify_cbs.append(self._on_mod)
+        try:
+            while True:
+                obj = await self.read_pyon()
+                try:
+                    action = obj["action"]
+                    if action == "embed":
+                        embed_cb(obj["win_id"])
+                        self.write_pyon({"action": "embed_done"})
+                    elif action == "fix_initial_size":
+                        fix_initial_size_cb()
+                    elif action == "subscribe":
+                        self.datasets = obj["datasets"]
+                        if self.datasets_sub.model is not None:
+                            mod = self._synthesize_init(
+                                self.datasets_sub.model.backing_store)
+                            self._write_mod(mod)
+                    else:
+                        raise ValueError("unknown action in applet message")
+                except:
+                    logger.warning("error processing applet message",
+                                   exc_info=True)
+                    self.write_pyon({"action": "error"})
+        except asyncio.CancelledError:
+            pass
+        except:
+            logger.error("error processing data from applet, "
+                         "server stopped", exc_info=True)
+        finally:
+            self.datasets_sub.notify_cbs.remove(self._on_mod)
+
+    def start_server(self, embed_cb, fix_initial_size_cb):
+        self.server_task = asyncio.ensure_future(
+            self.serve(embed_cb, fix_initial_size_cb))
+
+    async def stop_server(self):
+        if hasattr(self, "server_task"):
+            self.server_task.cancel()
+            await asyncio.wait([self.server_task])
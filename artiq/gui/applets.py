@@ -10,88 +10,15 @@ from itertools import count
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 
-from sipyco.pipe_ipc import AsyncioParentComm
 from sipyco.logging_tools import LogParser
-from sipyco import pyon
 
 from artiq.gui.tools import QDockWidgetCloseDetect, LayoutWidget
+from artiq.gui.applet_ipc import AppletIPCServer
 
 
 logger = logging.getLogger(__name__)
 
 
-class AppletIPCServer(AsyncioParentComm):
-    def __init__(self, datasets_sub):
-        AsyncioParentComm.__init__(self)
-        self.datasets_sub = datasets_sub
-        self.datasets = set()
-
-    def write_pyon(self, obj):
-        self.write(pyon.encode(obj).encode() + b"\n")
-
-    async def read_pyon(self):
-        line = await self.readline()
-        return pyon.decode(line.decode())
-
-    def _synthesize_init(self, data):
-        struct = {k: v for k, v in data.items() if k in self.datasets}
-        return {"action": "init",
-                "struct": struct}
-
-    def _on_mod(self, mod):
-        if mod["action"] == "init":
-            mod = self._synthesize_init(mod["struct"])
-        else:
-            if mod["path"]:
-                if mod["path"][0] not in self.datasets:
-                    return
-            elif mod["action"] in {"setitem", "delitem"}:
-                if mod["key"] not in self.datasets:
-                    return
-        self.write_pyon({"action": "mod", "mod": mod})
-
-    async def serve(self, embed_cb, fix_initial_size_cb):
-        self.datasets_sub.notify_cbs.append(self._on_mod)
-        try:
-            while True:
-                obj = await self.read_pyon()
-                try:
-                    action = obj["action"]
-                    if action == "embed":
-                        embed_cb(obj["win_id"])
-                        self.write_pyon({"action": "embed_done"})
-                    elif action == "fix_initial_size":
-                        fix_initial_size_cb()
-                    elif action == "subscribe":
-                        self.datasets = obj["datasets"]
-                        if self.datasets_sub.model is not None:
-                            mod = self._synthesize_init(
-                                self.datasets_sub.model.backing_store)
-                            self.write_pyon({"action": "mod", "mod": mod})
-                    else:
-                        raise ValueError("unknown action in applet message")
-                except:
-                    logger.warning("error processing applet message",
-                                   exc_info=True)
-                    self.write_pyon({"action": "error"})
-        except asyncio.CancelledError:
-            pass
-        except:
-            logger.error("error processing data from applet, "
-                         "server stopped", exc_info=True)
-        finally:
-            self.datasets_sub.notify_cbs.remove(self._on_mod)
-
-    def start_server(self, embed_cb, fix_initial_size_cb):
-        self.server_task = asyncio.ensure_future(
-            self.serve(embed_cb, fix_initial_size_cb))
-
-    async def stop_server(self):
-        if hasattr(self, "server_task"):
-            self.server_task.cancel()
-            await asyncio.wait([self.server_task])
-
-
 class _AppletDock(QDockWidgetCloseDetect):
     def __init__(self, datasets_sub, uid, name, spec):
         QDockWidgetCloseDetect.__init__(self, "Applet: " + name)
@@ -0,0 +1,120 @@
+"""Index of choices for fuzzy (in-order subsequence) matching, as used by
+:class:`artiq.gui.fuzzy_select.FuzzySelectWidget`.
+
+This module does not depend on Qt, so that the matching can be tested on
+its own.
+"""
+
+import heapq
+from bisect import bisect_right
+from typing import List, Tuple
+
+
+def _fold(text):
+    # Case-insensitive matching, keeping one character per character so
+    # that match positions and lengths refer to the original label.
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+def _is_subsequence(a, b):
+    it = iter(b)
+    return all(c in it for c in a)
+
+
+class FuzzyIndex:
+    """Index of choices for fuzzy (in-order subsequence) matching.
+
+    The positions of each character in each label and the set of labels
+    containing each character are tabulated once. The matches of the last
+    query are kept, so that narrowing a query (e.g. typing more characters)
+    only considers the previous matches.
+    """
+    def __init__(self, choices: List[Tuple[str, int]]):
+        self.labels = [label for label, _ in choices]
+        self.weights = [weight for _, weight in choices]
+        self.positions = []
+        self.postings = dict()
+        for i, label in enumerate(self.labels):
+            positions = dict()
+            for pos, c in enumerate(_fold(label)):
+                positions.setdefault(c, []).append(pos)
+            self.positions.append(positions)
+            for c in positions:
+                self.postings.setdefault(c, set()).add(i)
+        self.last_query = None
+        self.last_matches = None
+
+    def _candidates(self, query):
+        if (self.last_query is not None
+                and _is_subsequence(self.last_query, query)):
+            candidates = self.last_matches
+        else:
+            candidates = None
+        for c in sorted(set(query),
+                        key=lambda c: len(self.postings.get(c, ()))):
+            posting = self.postings.get(c, set())
+            if candidates is None:
+                candidates = posting
+            else:
+                candidates = candidates & posting
+            if not candidates:
+                break
+        return candidates
+
+    @staticmethod
+    def _match_end(positions, query, start):
+        # End of the shortest match of the query starting at start.
+        pos = start
+        for c in query[1:]:
+            c_positions = positions[c]
+            j = bisect_right(c_positions, pos)
+            if j == len(c_positions):
+                return None
+            pos = c_positions[j]
+        return pos + 1
+
+    def _score(self, i, query):
+        # Shortest match over all start positions, adjusted by the weight,
+        # then earliest start.
+        positions = self.positions[i]
+        best = None
+        for start in positions[query[0]]:
+            end = self._match_end(positions, query, start)
+            if end is None:
+                break
+            if best is None or end - start < best[0]:
+                best = (end - start, start)
+                if best[0] == len(query):
+                    break
+        return (best[0] - self.weights[i], best[1], self.labels[i])
+
+    def search(self, query: str, limit: int) -> Tuple[List[str], int]:
+        """Return the ``limit`` best matching labels and the total number of
+        matches."""
+        query = _fold(query)
+        matches = set()
+        bounds = []
+        for i in self._candidates(query):
+            positions = self.positions[i]
+            first = positions[query[0]][0]
+            if self._match_end(positions, query, first) is None:
+                continue
+            matches.add(i)
+            # No match is shorter than the query, nor starts earlier than
+            # the first occurrence of its first character.
+            bounds.append((len(query) - self.weights[i], first,
+                           self.labels[i], i))
+        self.last_query = query
+        self.last_matches = matches
+
+        # Only score the choices that can make it into the results.
+        heapq.heapify(bounds)
+        best = []
+        while bounds:
+            bound = heapq.heappop(bounds)
+            if len(best) == limit and bound[:3] > best[-1]:
+                break
+            best.append(self._score(bound[3], query))
+            best.sort()
+            del best[limit:]
+        return [label for _, _, label in best], len(matches)
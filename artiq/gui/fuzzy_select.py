@@ -1,9 +1,8 @@
-import re
-
 from functools import partial
 from typing import List, Tuple
 from PyQt5 import QtCore, QtWidgets
 
+from artiq.gui.fuzzy_index import FuzzyIndex
 from artiq.gui.tools import LayoutWidget
 
 
@@ -63,6 +62,7 @@ class FuzzySelectWidget(LayoutWidget):
         """Update the list of choices available to the user."""
         # Keep sorted in the right order for when the query is empty.
         self.choices = sorted(choices, key=lambda a: (a[1], a[0]))
+        self.index = FuzzyIndex(self.choices)
         if self.menu:
             self._update_menu()
 
@@ -105,7 +105,7 @@ class FuzzySelectWidget(LayoutWidget):
         if not self.update_when_text_changed:
             return
 
-        filtered_choices = self._filter_choices()
+        filtered_choices, num_matches = self._filter_choices()
 
         if not filtered_choices:
             # No matches, don't display menu at all.
@@ -119,8 +119,8 @@ class FuzzySelectWidget(LayoutWidget):
 
         # Truncate the list, leaving room for the "<n> not shown" entry.
         num_omitted = 0
-        if len(filtered_choices) > self.entry_count_limit:
-            num_omitted = len(filtered_choices) - (self.entry_count_limit - 1)
+        if num_matches > self.entry_count_limit:
+            num_omitted = num_matches - (self.entry_count_limit - 1)
             filtered_choices = filtered_choices[:self.entry_count_limit - 1]
 
         # We are going to end up with a menu shown and the line edit losing
@@ -173,9 +173,10 @@ class FuzzySelectWidget(LayoutWidget):
             self.line_edit.setFocus()
 
     def _filter_choices(self):
-        """Return a filtered and ranked list of choices based on the current
-        user input.
-        
+        """Return the best ranked choices based on the current user input
+        (at most ``entry_count_limit``), and the total number of matching
+        choices.
+
         For a choice not to be filtered out, it needs to contain the entered
         characters in order. Entries are further sorted by the length of the
         match (i.e. preferring matches where the entered string occurrs
@@ -184,38 +185,10 @@ class FuzzySelectWidget(LayoutWidget):
         """
         query = self.line_edit.text()
         if not query:
-            return [label for label, _ in self.choices]
-
-        # Find all "substring" matches of the given query in the labels,
-        # allowing any number of characters between each query character.
-        # Sort first by length of match (short matches preferred), to which the
-        # set weight is also applied, then by location (early in the label
-        # preferred), and at last alphabetically.
-
-        # TODO: More SublimeText-like heuristics taking capital letters and
-        # punctuation into account. Also, requiring the matches to be in order
-        # seems to be a bit annoying in practice.
-
-        # `re` seems to be the fastest way of doing this in CPython, even with
-        # all the (non-greedy) wildcards.
-        suggestions = []
-        pattern_str = ".*?".join(map(re.escape, query))
-        pattern = re.compile(pattern_str, flags=re.IGNORECASE)
-        for label, weight in self.choices:
-            matches = []
-            # Manually loop over shortest matches at each position;
-            # re.finditer() only returns non-overlapping matches.
-            pos = 0
-            while True:
-                r = pattern.search(label, pos=pos)
-                if not r:
-                    break
-                start, stop = r.span()
-                matches.append((stop - start - weight, start, label))
-                pos = start + 1
-            if matches:
-                suggestions.append(min(matches))
-        return [x for _, _, x in sorted(suggestions)]
+            return ([label for label, _ in
+                     self.choices[:self.entry_count_limit]],
+                    len(self.choices))
+        return self.index.search(query, self.entry_count_limit)
 
     def _close(self):
         if self.menu:
@@ -0,0 +1,158 @@
+"""Datasets read from HDF5 files on demand.
+
+Listing the datasets of a results file only reads their shape and type;
+values are read when first needed and kept in a size-bounded cache shared
+between files, so that selecting a file again does not read it again.
+"""
+
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import h5py
+
+
+logger = logging.getLogger(__name__)
+
+
+class DatasetCache:
+    """LRU cache of dataset values, bounded by the total size of the
+    values in bytes. Values larger than the bound are not cached."""
+    def __init__(self, max_bytes=256*1024*1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._values.move_to_end(key)
+            except KeyError:
+                raise KeyError(key) from None
+            return self._values[key][0]
+
+    def put(self, key, value):
+        nbytes = getattr(value, "nbytes", None)
+        if nbytes is None:
+            nbytes = sys.getsizeof(value)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._values:
+                self.nbytes -= self._values.pop(key)[1]
+            self._values[key] = value, nbytes
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._values.popitem(last=False)
+                self.nbytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self.nbytes = 0
+
+
+default_cache = DatasetCache()
+
+
+class LazyDataset:
+    """Dataset ``name`` of the HDF5 file ``filename``, of which only the
+    shape and type are known until its value is loaded."""
+    def __init__(self, filename, name, shape, dtype, cache=None):
+        self.filename = filename
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+        self.cache = default_cache if cache is None else cache
+        try:
+            self._mtime = os.stat(filename).st_mtime_ns
+        except OSError:
+            self._mtime = None
+
+    @property
+    def nbytes(self):
+        size = 1
+        for n in self.shape:
+            size *= n
+        return size*self.dtype.itemsize
+
+    def _key(self):
+        return self.filename, self._mtime, self.name
+
+    def _read(self, selection):
+        with h5py.File(self.filename, "r") as f:
+            return f[self.name][selection]
+
+    def load(self):
+        """Returns the value of the dataset, reading it from the file if it
+        is not in the cache."""
+        key = self._key()
+        try:
+            return self.cache.get(key)
+        except KeyError:
+            pass
+        logger.debug("loading dataset %s from %s", self.name, self.filename)
+        value = self._read(())
+        self.cache.put(key, value)
+        return value
+
+    def __getitem__(self, selection):
+        """Reads part of an array dataset. Only the selected elements are
+        read, unless the whole value is already in the cache."""
+        try:
+            return self.cache.get(self._key())[selection]
+        except KeyError:
+            return self._read(selection)
+
+    def describe(self):
+        if self.shape == ():
+            return str(self.dtype)
+        return "ndarray {} {}".format(self.shape, self.dtype)
+
+    def __repr__(self):
+        return "<LazyDataset {} of {}: {}>".format(
+            self.name, self.filename, self.describe())
+
+
+def resolve(value):
+    """Returns the value of ``value`` if it is a :class:`LazyDataset`, or
+    ``value`` itself otherwise."""
+    if isinstance(value, LazyDataset):
+        return value.load()
+    return value
+
+
+def list_datasets(f, cache=None, eager_size=1024):
+    """Lists the archived and output datasets of the open HDF5 results file
+    ``f``.
+
+    Returns a dictionary mapping dataset keys to ``(True, value)``, in the
+    format of the dataset models. Values no larger than ``eager_size`` bytes
+    (e.g. scalars and short strings) are read immediately, other values are
+    :class:`LazyDataset` instances.
+    """
+    filename = f.filename
+    rd = {}
+
+    def visit_group(group, check_duplicates):
+        def visitor(k, v):
+            if not isinstance(v, h5py.Dataset):
+                return
+            if check_duplicates and k in rd:
+                logger.warning("dataset '%s' is both in archive "
+                               "and outputs", k)
+            if v.dtype.itemsize*v.size <= eager_size:
+                rd[k] = (True, v[()])
+            else:
+                rd[k] = (True, LazyDataset(filename, v.name, v.shape,
+                                           v.dtype, cache))
+        group.visititems(visitor)
+
+    if "archive" in f:
+        visit_group(f["archive"], False)
+    if "datasets" in f:
+        visit_group(f["datasets"], True)
+    return rd
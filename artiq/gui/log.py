@@ -333,6 +333,11 @@ class LogDockManager:
         for dock in self.docks.values():
             dock.append_message(msg)
 
+    def append_messages(self, msgs):
+        for dock in self.docks.values():
+            for msg in msgs:
+                dock.append_message(msg)
+
     def create_new_dock(self, add_to_area=True):
         n = 0
         name = "log0"
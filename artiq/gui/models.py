@@ -1,7 +1,15 @@
+import asyncio
+import logging
+
 from PyQt5 import QtCore
 
 from sipyco.sync_struct import Subscriber, process_mod
 
+from artiq.tools import DatasetVersionChecker
+
+
+logger = logging.getLogger(__name__)
+
 
 class ModelManager:
     def __init__(self, model_factory):
@@ -22,11 +30,49 @@ class ModelManager:
 
 
 class ModelSubscriber(ModelManager, Subscriber):
+    """Subscriber keeping a model of the notifier ``notifier_name``.
+
+    If the mods carry versions (datasets) and a mod was missed, the
+    subscriber connects again to receive the whole structure, with the
+    arguments last passed to :meth:`connect`. ``disconnect_cb`` is only
+    called if this connection fails."""
     def __init__(self, notifier_name, model_factory,
                  disconnect_cb=None):
         ModelManager.__init__(self, model_factory)
         Subscriber.__init__(self, notifier_name, self._create_model,
-                            disconnect_cb=disconnect_cb)
+                            self._check_version, self._disconnected)
+        self._disconnect_cb = disconnect_cb
+        self._versions = DatasetVersionChecker()
+        self._resyncing = False
+
+    async def connect(self, *args, **kwargs):
+        self._connect_args = args, kwargs
+        await Subscriber.connect(self, *args, **kwargs)
+
+    def _check_version(self, mod):
+        if not self._versions.check(mod) and not self._resyncing:
+            logger.warning("missed modification of %s, resynchronizing",
+                           self.notifier_name)
+            self._resyncing = True
+            asyncio.ensure_future(self._resync())
+
+    async def _resync(self):
+        try:
+            await self.close()
+        finally:
+            self._resyncing = False
+        args, kwargs = self._connect_args
+        try:
+            await Subscriber.connect(self, *args, **kwargs)
+        except Exception:
+            logger.error("failed to resynchronize %s", self.notifier_name,
+                         exc_info=True)
+            if self._disconnect_cb is not None:
+                self._disconnect_cb()
+
+    def _disconnected(self):
+        if not self._resyncing and self._disconnect_cb is not None:
+            self._disconnect_cb()
 
 
 class LocalModelManager(ModelManager):
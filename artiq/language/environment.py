@@ -330,7 +330,8 @@ class HasEnvironment:
 
     @rpc(flags={"async"})
     def set_dataset(self, key, value,
-                    broadcast=False, persist=False, archive=True):
+                    broadcast=False, persist=False, archive=True,
+                    hdf5_options=None):
         """Sets the contents and handling modes of a dataset.
 
         Datasets must be scalars (``bool``, ``int``, ``float`` or NumPy scalar)
@@ -342,8 +343,18 @@ class HasEnvironment:
             broadcast.
         :param archive: the data is saved into the local storage of the current
             run (archived as a HDF5 file).
+        :param hdf5_options: storage options of the dataset in the HDF5 file.
+            Either the name of a predefined profile (``"gzip"`` or ``"lzf"``,
+            see :data:`artiq.master.worker_db.HDF5_PROFILES`), or a
+            dictionary of keyword arguments of :meth:`h5py.Group.create_dataset`
+            (``chunks``, ``compression``, ``compression_opts``, ``shuffle``,
+            ``fletcher32``, ``scaleoffset`` and ``dtype``, the latter
+            converting the data when it is written), optionally with a
+            ``profile`` entry naming a profile that they update. Chunking
+            and filters only apply to arrays.
         """
-        self.__dataset_mgr.set(key, value, broadcast, persist, archive)
+        self.__dataset_mgr.set(key, value, broadcast, persist, archive,
+                               hdf5_options)
 
     @rpc(flags={"async"})
     def mutate_dataset(self, key, index, value):
@@ -15,11 +15,20 @@ Iterating multiple times on the same scan object is possible, with the scan
 yielding the same values each time. Iterating concurrently on the
 same scan object (e.g. via nested loops) is also supported, and the
 iterators are independent from each other.
+
+The points of :class:`RangeScan` and :class:`CenterScan` are computed on
+demand: the ``points`` attribute of these scans supports ``len`` and
+indexing in constant time, and slicing returns numpy arrays. Their
+``sequence`` attribute is the list of all points, built on first access.
+Randomized scans are ordered by a seeded permutation of the point indices.
 """
 
-import random
 import inspect
 from itertools import product
+from functools import reduce
+from operator import mul
+
+import numpy
 
 from artiq.language.core import *
 from artiq.language.environment import NoDefault, DefaultMissing
@@ -42,6 +51,116 @@ class ScanObject:
         raise NotImplementedError
 
 
+class _ScanSequence:
+    """Sequence of scan points that are computed on demand from their
+    indices, optionally in a random order.
+
+    Indexing with an integer returns a single point, indexing with a slice
+    or an array of indices returns a numpy array of points."""
+    # number of points computed at once when iterating
+    chunk_size = 4096
+
+    def __init__(self, length, randomize=False, seed=None):
+        self.length = length
+        self.randomize = randomize
+        self.seed = seed
+        self._permutation = None
+
+    def _values(self, indices):
+        raise NotImplementedError
+
+    def _permute(self, indices):
+        if not self.randomize:
+            return indices
+        if self._permutation is None:
+            # Computed once so that all iterations yield the same order,
+            # even without a seed.
+            rng = numpy.random.default_rng(self.seed)
+            self._permutation = rng.permutation(self.length)
+        return self._permutation[indices]
+
+    def take(self, indices):
+        """Returns the points at the given positions, as a numpy array."""
+        return self._values(self._permute(numpy.asarray(indices)))
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.take(numpy.arange(*key.indices(self.length)))
+        if isinstance(key, (int, numpy.integer)):
+            if key < 0:
+                key += self.length
+            if not 0 <= key < self.length:
+                raise IndexError("scan point index out of range")
+            return self.take([key])[0].item()
+        return self.take(key)
+
+    def __iter__(self):
+        for start in range(0, self.length, self.chunk_size):
+            yield from self[start:start + self.chunk_size].tolist()
+
+    def __array__(self, dtype=None, copy=None):
+        return numpy.asarray(self[:], dtype)
+
+
+class _RangeSequence(_ScanSequence):
+    def __init__(self, start, stop, npoints, randomize=False, seed=None):
+        _ScanSequence.__init__(self, max(npoints, 0), randomize, seed)
+        self.start = start
+        if npoints > 1:
+            self.dx = (stop - start)/(npoints - 1)
+        else:
+            self.dx = 0.
+
+    def _values(self, indices):
+        if self.length == 1:
+            return numpy.full(len(indices), self.start)
+        return indices*self.dx + self.start
+
+
+class _CenterSequence(_ScanSequence):
+    def __init__(self, center, span, step, randomize=False, seed=None):
+        if step == 0.:
+            length = 0
+        else:
+            n = 1 + int(span/(2.*step))
+            length = max(2*n - 1, 0)
+        _ScanSequence.__init__(self, length, randomize, seed)
+        self.center = center
+        self.step = step
+
+    def _values(self, indices):
+        # The points are center, center - step, center + step,
+        # center - 2*step, ...
+        i = (indices + 1)//2
+        sign = numpy.where(indices % 2, -1, 1)
+        return self.center + sign*i*self.step
+
+
+class _LazyScanObject(ScanObject):
+    # Scan object whose points are given by the _ScanSequence in the
+    # ``points`` attribute.
+    _sequence = None
+
+    @property
+    def sequence(self):
+        """List of the points of the scan."""
+        if self._sequence is None:
+            self._sequence = self.points[:].tolist()
+        return self._sequence
+
+    @sequence.setter
+    def sequence(self, sequence):
+        self._sequence = sequence
+
+    def __iter__(self):
+        if self._sequence is None:
+            return iter(self.points)
+        return iter(self._sequence)
+
+
 class NoScan(ScanObject):
     """A scan object that yields a single value for a specified number
     of repetitions."""
@@ -64,7 +183,7 @@ class NoScan(ScanObject):
                 "repetitions": self.repetitions}
 
 
-class RangeScan(ScanObject):
+class RangeScan(_LazyScanObject):
     """A scan object that yields a fixed number of evenly spaced values in a
     range. If ``randomize`` is True the points are randomly ordered."""
     def __init__(self, start, stop, npoints, randomize=False, seed=None):
@@ -74,20 +193,7 @@ class RangeScan(ScanObject):
         self.randomize = randomize
         self.seed = seed
 
-        if npoints == 0:
-            self.sequence = []
-        if npoints == 1:
-            self.sequence = [self.start]
-        else:
-            dx = (stop - start)/(npoints - 1)
-            self.sequence = [i*dx + start for i in range(npoints)]
-
-        if randomize:
-            rng = random.Random(seed)
-            random.shuffle(self.sequence, rng.random)
-
-    def __iter__(self):
-        return iter(self.sequence)
+        self.points = _RangeSequence(start, stop, npoints, randomize, seed)
 
     def __len__(self):
         return self.npoints
@@ -100,7 +206,7 @@ class RangeScan(ScanObject):
                 "seed": self.seed}
 
 
-class CenterScan(ScanObject):
+class CenterScan(_LazyScanObject):
     """A scan object that yields evenly spaced values within a span around a
     center. If ``step`` is finite, then ``center`` is always included.
     Values outside ``span`` around center are never included.
@@ -112,22 +218,10 @@ class CenterScan(ScanObject):
         self.randomize = randomize
         self.seed = seed
 
-        if step == 0.:
-            self.sequence = []
-        else:
-            n = 1 + int(span/(2.*step))
-            self.sequence = [center + sign*i*step
-                             for i in range(n) for sign in [-1, 1]][1:]
-
-        if randomize:
-            rng = random.Random(seed)
-            random.shuffle(self.sequence, rng.random)
-
-    def __iter__(self):
-        return iter(self.sequence)
+        self.points = _CenterSequence(center, span, step, randomize, seed)
 
     def __len__(self):
-        return len(self.sequence)
+        return len(self.points)
 
     def describe(self):
         return {"ty": "CenterScan",
@@ -255,6 +349,13 @@ class MultiScanManager:
     Íteration produces scan points that have attributes that correspond
     to the names of the scan objects, and have the last value yielded by
     that scan object.
+
+    The scan points can also be accessed by index. Indexing with a slice
+    returns a single scan point whose attributes are numpy arrays, which
+    is suitable for processing the scan in blocks (see :meth:`chunks`)::
+
+        for block in msm.chunks(1000):
+            self.run_block(block.a, block.b)
     """
     def __init__(self, *args):
         self.names = [a[0] for a in args]
@@ -274,6 +375,7 @@ class MultiScanManager:
                     ">")
 
         self.scan_point_cls = ScanPoint
+        self._materialized = dict()
 
     def _gen(self):
         for values in product(*self.scan_objects):
@@ -282,3 +384,50 @@ class MultiScanManager:
 
     def __iter__(self):
         return self._gen()
+
+    def __len__(self):
+        return reduce(mul, (len(s) for s in self.scan_objects), 1)
+
+    def _take(self, n, indices):
+        scan_object = self.scan_objects[n]
+        if (isinstance(scan_object, _LazyScanObject)
+                and scan_object._sequence is None):
+            return scan_object.points.take(indices)
+        if isinstance(scan_object, NoScan):
+            return numpy.full(len(indices), scan_object.value)
+        if n not in self._materialized:
+            self._materialized[n] = numpy.array(list(scan_object))
+        return self._materialized[n][indices]
+
+    def _indices(self, indices):
+        # The last scan object varies the fastest.
+        stride = 1
+        result = []
+        for scan_object in reversed(self.scan_objects):
+            length = len(scan_object)
+            result.append((indices//stride) % length)
+            stride *= length
+        return reversed(result)
+
+    def __getitem__(self, key):
+        length = len(self)
+        if isinstance(key, slice):
+            indices = numpy.arange(*key.indices(length))
+        else:
+            if key < 0:
+                key += length
+            if not 0 <= key < length:
+                raise IndexError("scan point index out of range")
+            indices = numpy.array([key])
+        d = {name: self._take(n, dimension_indices)
+             for n, (name, dimension_indices)
+             in enumerate(zip(self.names, self._indices(indices)))}
+        if not isinstance(key, slice):
+            d = {name: value[0].item() for name, value in d.items()}
+        return self.scan_point_cls(**d)
+
+    def chunks(self, size):
+        """Iterates over the scan in blocks of at most ``size`` points,
+        yielding scan points whose attributes are numpy arrays."""
+        for start in range(0, len(self), size):
+            yield self[start:start + size]
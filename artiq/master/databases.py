@@ -1,12 +1,23 @@
 import asyncio
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import uuid
 
-from artiq.tools import file_import
+from artiq import __version__ as artiq_version
+from artiq.appdirs import user_cache_dir
+from artiq.tools import file_import, array_delta
 
 from sipyco.sync_struct import Notifier, process_mod, update_from_dict
 from sipyco import pyon
 from sipyco.asyncio_tools import TaskObject
 
 
+logger = logging.getLogger(__name__)
+
+
 def device_db_from_file(filename):
     mod = file_import(filename)
 
@@ -16,13 +27,172 @@ def device_db_from_file(filename):
     return mod.__dict__["device_db"]
 
 
+def _source_info(path):
+    st = os.stat(path)
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return [st.st_mtime_ns, st.st_size, digest]
+
+
+def _sources_unchanged(sources):
+    """Checks that none of the files a device database was evaluated from
+    has changed. The modification time and size are compared first, and the
+    contents are only hashed when they differ (e.g. the file was touched
+    or copied)."""
+    for path, (mtime_ns, size, digest) in sources.items():
+        try:
+            st = os.stat(path)
+            if st.st_mtime_ns == mtime_ns and st.st_size == size:
+                continue
+            if _source_info(path)[2] != digest:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def _module_file(module):
+    filename = getattr(module, "__file__", None)
+    if (isinstance(filename, str) and filename.endswith(".py")
+            and os.path.isfile(filename)):
+        return os.path.abspath(filename)
+    return None
+
+
+def _evaluate_device_db(filename, extra_sources=()):
+    """Evaluates a device database file and returns it together with the
+    information (modification time, size and hash) about the files it was
+    evaluated from: the file itself, the modules it imported, and the
+    modules of its directory that were already imported."""
+    filename = os.path.abspath(filename)
+    directory = os.path.dirname(filename)
+    modules_before = set(sys.modules.keys())
+    device_db = device_db_from_file(filename)
+
+    paths = {filename}
+    paths.update(p for p in extra_sources if os.path.isfile(p))
+    for name, module in list(sys.modules.items()):
+        path = _module_file(module)
+        if path is None:
+            continue
+        if (name not in modules_before
+                or os.path.dirname(path) == directory):
+            paths.add(path)
+    sources = dict()
+    for path in paths:
+        try:
+            sources[path] = _source_info(path)
+        except OSError:
+            pass
+    return device_db, sources
+
+
+class DeviceDBCache:
+    """Cache of evaluated device databases, shared by all processes of the
+    user.
+
+    Each entry holds the device database in PYON form, with the modification
+    time, size and SHA-256 hash of every file it was evaluated from. An entry
+    is used only if none of those files has changed, which saves executing
+    large device database files again each time a tool starts or the master
+    rescans.
+
+    The device database must only depend on the contents of its source
+    files (e.g. not on environment variables or data files) for the cache
+    to be correct. Loading with ``refresh`` set evaluates the file again and
+    replaces the entry.
+    """
+    version = 1
+
+    def __init__(self, directory=None):
+        if directory is None:
+            major = artiq_version.split(".")[0]
+            directory = os.path.join(
+                user_cache_dir("artiq", "m-labs", major), "device_db")
+        self.directory = directory
+
+    def _entry_file(self, filename):
+        key = hashlib.sha256(os.path.abspath(filename).encode()).hexdigest()
+        return os.path.join(self.directory, key + ".pyon")
+
+    def _read_entry(self, filename):
+        try:
+            entry = pyon.load_file(self._entry_file(filename))
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.debug("failed to read device database cache entry",
+                         exc_info=True)
+            return None
+        if (not isinstance(entry, dict)
+                or entry.get("version") != self.version
+                or entry.get("filename") != os.path.abspath(filename)):
+            return None
+        return entry
+
+    def _write_entry(self, filename, device_db, sources):
+        entry = {
+            "version": self.version,
+            "filename": os.path.abspath(filename),
+            "sources": sources,
+            "device_db": device_db
+        }
+        try:
+            encoded = pyon.encode(entry)
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmpname = tempfile.mkstemp(dir=self.directory,
+                                           suffix=".tmp")
+            try:
+                with open(fd, "w") as f:
+                    f.write(encoded)
+                os.replace(tmpname, self._entry_file(filename))
+            except:
+                os.unlink(tmpname)
+                raise
+        except Exception:
+            logger.debug("failed to write device database cache entry",
+                         exc_info=True)
+
+    def load(self, filename, refresh=False):
+        """Returns the device database of ``filename`` and the information
+        about its source files, from the cache if it is up to date and
+        ``refresh`` is not set, or by evaluating the file (and updating the
+        cache) otherwise."""
+        entry = self._read_entry(filename)
+        if (not refresh and entry is not None
+                and _sources_unchanged(entry["sources"])):
+            logger.debug("using cached device database for %s", filename)
+            return entry["device_db"], entry["sources"]
+        # Modules imported by a previous evaluation in this process are not
+        # imported again, so keep them as sources.
+        extra_sources = () if entry is None else entry["sources"].keys()
+        device_db, sources = _evaluate_device_db(filename, extra_sources)
+        self._write_entry(filename, device_db, sources)
+        return device_db, sources
+
+
 class DeviceDB:
-    def __init__(self, backing_file):
+    """Device database loaded from ``backing_file``.
+
+    If ``use_cache`` is set, the evaluated device database is shared with
+    other processes through a :class:`DeviceDBCache`. :meth:`scan` always
+    evaluates the file again, and refreshes the cache entry.
+    """
+    def __init__(self, backing_file, use_cache=False, cache_dir=None):
         self.backing_file = backing_file
-        self.data = Notifier(device_db_from_file(self.backing_file))
+        self.cache = DeviceDBCache(cache_dir) if use_cache else None
+        device_db, self.sources = self._load()
+        self.data = Notifier(device_db)
+
+    def _load(self, refresh=False):
+        if self.cache is None:
+            return _evaluate_device_db(self.backing_file)
+        else:
+            return self.cache.load(self.backing_file, refresh)
 
     def scan(self):
-        update_from_dict(self.data, device_db_from_file(self.backing_file))
+        device_db, self.sources = self._load(refresh=True)
+        update_from_dict(self.data, device_db)
 
     def get_device_db(self):
         return self.data.raw_view
@@ -36,15 +206,35 @@ class DeviceDB:
 
 
 class DatasetDB(TaskObject):
-    def __init__(self, persist_file, autosave_period=30):
+    """Dataset database of the master.
+
+    Each modification of a dataset increments a version counter of its key,
+    which is sent with the mod to subscribers (``version`` field) so that
+    they can detect missed mods (see
+    :class:`artiq.tools.DatasetVersionChecker`) and resynchronize. Versions are ``(epoch, counter)`` tuples, where the epoch
+    identifies the instance of the database, as counters start again after
+    the master restarts or a dataset is deleted.
+
+    When a dataset is set to a NumPy array of the same shape and type as
+    its previous value, and differing from it in at most
+    ``delta_max_fraction`` of its rows, only the changed rows are sent to
+    subscribers, as mods setting slices of the array. Arrays smaller than
+    ``delta_min_size`` bytes are always sent whole.
+    """
+    def __init__(self, persist_file, autosave_period=30,
+                 delta_min_size=4096, delta_max_fraction=0.5):
         self.persist_file = persist_file
         self.autosave_period = autosave_period
+        self.delta_min_size = delta_min_size
+        self.delta_max_fraction = delta_max_fraction
 
         try:
             file_data = pyon.load_file(self.persist_file)
         except FileNotFoundError:
             file_data = dict()
         self.data = Notifier({k: (True, v) for k, v in file_data.items()})
+        self.epoch = uuid.uuid4().hex
+        self.versions = dict()
 
     def save(self):
         data = {k: v[1] for k, v in self.data.raw_view.items() if v[0]}
@@ -61,8 +251,51 @@ class DatasetDB(TaskObject):
     def get(self, key):
         return self.data.raw_view[key][1]
 
+    def get_versioned(self, key):
+        """Returns the version and the ``(persist, value)`` tuple of the
+        dataset ``key``."""
+        return (self.epoch, self.versions.get(key, 0)), self.data.raw_view[key]
+
+    def _publish(self, key, mod):
+        version = self.versions.get(key, 0) + 1
+        if mod["action"] == "delitem" and not mod["path"]:
+            self.versions.pop(key, None)
+        else:
+            self.versions[key] = version
+        if self.data.publish is not None:
+            self.data.publish(dict(mod, version=(self.epoch, version)))
+
+    def _delta_mods(self, key, value):
+        old = self.data.raw_view.get(key)
+        if old is None or old[0] != value[0]:
+            return None
+        new = value[1]
+        if getattr(new, "nbytes", 0) < self.delta_min_size:
+            return None
+        ranges = array_delta(old[1], new, self.delta_max_fraction)
+        if ranges is None:
+            return None
+        return [{"action": "setitem", "path": [key, 1],
+                 "key": slice(start, stop), "value": new[start:stop]}
+                for start, stop in ranges]
+
     def update(self, mod):
-        process_mod(self.data, mod)
+        if mod["path"]:
+            key = mod["path"][0]
+        elif mod["action"] in {"setitem", "delitem"}:
+            key = mod["key"]
+        else:
+            process_mod(self.data, mod)
+            return
+        if mod["action"] == "setitem" and not mod["path"]:
+            delta_mods = self._delta_mods(key, mod["value"])
+            if delta_mods is not None:
+                self.data.raw_view[key] = mod["value"]
+                for delta_mod in delta_mods:
+                    self._publish(key, delta_mod)
+                return
+        process_mod(self.data.raw_view, mod)
+        self._publish(key, mod)
 
     # convenience functions (update() can be used instead)
     def set(self, key, value, persist=None):
@@ -71,8 +304,9 @@ class DatasetDB(TaskObject):
                 persist = self.data.raw_view[key][0]
             else:
                 persist = False
-        self.data[key] = (persist, value)
+        self.update({"action": "setitem", "path": [], "key": key,
+                     "value": (persist, value)})
 
     def delete(self, key):
-        del self.data[key]
+        self.update({"action": "delitem", "path": [], "key": key})
     #
@@ -4,6 +4,7 @@ import tempfile
 import shutil
 import time
 import logging
+from collections import OrderedDict
 
 from sipyco.sync_struct import Notifier, update_from_dict
 
@@ -102,6 +103,7 @@ class ExperimentDB:
     def close(self):
         # The object cannot be used anymore after calling this method.
         self.repo_backend.release_rev(self.cur_rev)
+        self.repo_backend.close()
 
     async def scan_repository(self, new_cur_rev=None):
         if self._scanning:
@@ -174,38 +176,143 @@ class FilesystemBackend:
     def release_rev(self, rev):
         pass
 
+    def close(self):
+        pass
+
 
 class _GitCheckout:
-    def __init__(self, git, rev):
-        self.path = tempfile.mkdtemp()
+    def __init__(self, git, rev, root, base=None, diff=None):
+        self.path = tempfile.mkdtemp(dir=root)
         commit = git.get(rev)
-        git.checkout_tree(commit, directory=self.path)
+        self.tree_id = commit.tree.id
         self.message = commit.message.strip()
         self.ref_count = 1
-        logger.info("checked out revision %s into %s", rev, self.path)
+        if base is None:
+            git.checkout_tree(commit, directory=self.path)
+            self.entries = dict(self._walk(git, commit.tree))
+            logger.info("checked out revision %s into %s", rev, self.path)
+        else:
+            self.entries = dict(base.entries)
+            linked = self._checkout_from(git, base, diff)
+            logger.info("checked out revision %s into %s "
+                        "(%d files reused from %s)",
+                        rev, self.path, linked, base.path)
+
+    @staticmethod
+    def _walk(git, tree, prefix=""):
+        # Yields (path, (blob id, file mode)) for all entries of the tree,
+        # with paths separated by "/" as in diffs.
+        for entry in tree:
+            path = prefix + entry.name
+            if entry.type_str == "tree":
+                yield from _GitCheckout._walk(git, git.get(entry.id),
+                                              path + "/")
+            else:
+                yield path, (entry.id, entry.filemode)
+
+    def _checkout_from(self, git, base, diff):
+        # Applies the deltas of ``diff``, from the tree of ``base`` to the
+        # tree of this checkout, to the entries of ``base``. Files that the
+        # diff does not touch are hard-linked. Experiments must not modify
+        # files in the repository.
+        changed = set()
+        for delta in diff.deltas:
+            changed.add(delta.old_file.path)
+            changed.add(delta.new_file.path)
+            self.entries.pop(delta.old_file.path, None)
+            if delta.status_char() != "D":
+                self.entries[delta.new_file.path] = (delta.new_file.id,
+                                                     delta.new_file.mode)
+
+        directories = set()
+        linked = 0
+        for path, (oid, filemode) in self.entries.items():
+            dest = os.path.join(self.path, path)
+            directory = os.path.dirname(dest)
+            if directory not in directories:
+                os.makedirs(directory, exist_ok=True)
+                directories.add(directory)
+            if (path not in changed
+                    and filemode not in (_GIT_FILEMODE_LINK,
+                                         _GIT_FILEMODE_COMMIT)):
+                try:
+                    os.link(os.path.join(base.path, path), dest)
+                    linked += 1
+                    continue
+                except OSError:
+                    pass
+            self._write_entry(git, dest, oid, filemode)
+        return linked
+
+    @staticmethod
+    def _write_entry(git, dest, oid, filemode):
+        if filemode == _GIT_FILEMODE_COMMIT:
+            os.mkdir(dest)
+        elif filemode == _GIT_FILEMODE_LINK:
+            os.symlink(git.get(oid).data, dest)
+        else:
+            with open(dest, "wb") as f:
+                f.write(git.get(oid).data)
+            os.chmod(dest, filemode & 0o777)
 
     def dispose(self):
         logger.info("disposing of checkout in folder %s", self.path)
         shutil.rmtree(self.path)
 
 
+_GIT_FILEMODE_LINK = 0o120000
+_GIT_FILEMODE_COMMIT = 0o160000
+
+
 class GitBackend:
-    def __init__(self, root):
+    """Provides checkouts of revisions of a git repository.
+
+    Checkouts that are no longer in use are kept in a cache of
+    ``cache_size`` entries, and new revisions are checked out by applying
+    the differences from the closest of the ``max_candidates`` most
+    recently used checkouts.
+    """
+    def __init__(self, root, cache_size=4, max_candidates=4):
         # lazy import - make dependency optional
         import pygit2
 
         self.git = pygit2.Repository(root)
+        self.cache_size = cache_size
+        self.max_candidates = max_candidates
+        self.cache_root = tempfile.mkdtemp(prefix="artiq_checkouts_")
         self.checkouts = dict()
+        # checkouts not in use, least recently used first
+        self.idle_checkouts = OrderedDict()
 
     def get_head_rev(self):
         return str(self.git.head.target)
 
+    def _closest_checkout(self, rev):
+        # Returns the checkout with the smallest diff to ``rev`` among the
+        # most recently used ones, and that diff.
+        tree = self.git.get(rev).tree
+        candidates = list(reversed(self.checkouts.values())) + \
+            list(reversed(self.idle_checkouts.values()))
+        best, best_diff = None, None
+        for co in candidates[:self.max_candidates]:
+            diff = self.git.diff(self.git.get(co.tree_id), tree)
+            if best is None or len(diff) < len(best_diff):
+                best, best_diff = co, diff
+                if not len(diff):
+                    break
+        return best, best_diff
+
     def request_rev(self, rev):
         if rev in self.checkouts:
             co = self.checkouts[rev]
             co.ref_count += 1
+        elif rev in self.idle_checkouts:
+            co = self.idle_checkouts.pop(rev)
+            co.ref_count = 1
+            self.checkouts[rev] = co
         else:
-            co = _GitCheckout(self.git, rev)
+            co = _GitCheckout(self.git, rev, self.cache_root,
+                              *self._closest_checkout(rev))
             self.checkouts[rev] = co
         return co.path, co.message
 
@@ -213,5 +320,15 @@ class GitBackend:
         co = self.checkouts[rev]
         co.ref_count -= 1
         if not co.ref_count:
-            co.dispose()
             del self.checkouts[rev]
+            self.idle_checkouts[rev] = co
+            while len(self.idle_checkouts) > self.cache_size:
+                _, co = self.idle_checkouts.popitem(last=False)
+                co.dispose()
+
+    def close(self):
+        for co in self.idle_checkouts.values():
+            co.dispose()
+        self.idle_checkouts.clear()
+        if not self.checkouts:
+            shutil.rmtree(self.cache_root, ignore_errors=True)
@@ -1,7 +1,193 @@
+import asyncio
 import logging
 import logging.handlers
+import os
+import struct
+import threading
 
 from sipyco.logging_tools import SourceFilter
+from sipyco.asyncio_tools import TaskObject
+
+
+# Structured log records sent by workers to the master through a dedicated
+# pipe: level, creation time, and lengths of the UTF-8 encoded logger name
+# and message, followed by the name and the message.
+_record_header = struct.Struct("<HdHI")
+
+
+def encode_log_record(level, created, name, message):
+    name = name.encode(errors="replace")
+    message = message.encode(errors="replace")
+    return (_record_header.pack(level, created, len(name), len(message)) +
+            name + message)
+
+
+class LogRecordDecoder:
+    """Decodes a stream of structured log records received in chunks of
+    arbitrary sizes."""
+    def __init__(self):
+        self._buffer = b""
+
+    def feed(self, data):
+        """Returns the list of ``(level, created, name, message)`` tuples of
+        the records completed by ``data``."""
+        buf = self._buffer + data if self._buffer else data
+        records = []
+        offset = 0
+        header_size = _record_header.size
+        while len(buf) - offset >= header_size:
+            level, created, name_len, message_len = \
+                _record_header.unpack_from(buf, offset)
+            start = offset + header_size
+            end = start + name_len + message_len
+            if end > len(buf):
+                break
+            name = buf[start:start+name_len].decode(errors="replace")
+            message = buf[start+name_len:end].decode(errors="replace")
+            records.append((level, created, name, message))
+            offset = end
+        self._buffer = buf[offset:]
+        return records
+
+
+def log_structured_record(level, created, name, message, source):
+    """Dispatches a structured log record received from ``source`` to the
+    handlers of the master, as :class:`sipyco.logging_tools.LogParser` does
+    for log lines."""
+    logger = logging.getLogger(name)
+    if logger.isEnabledFor(level):
+        record = logger.makeRecord(name, level, "(unknown file)", 0, message,
+                                   (), None, extra={"source": source})
+        record.created = created
+        logger.handle(record)
+
+
+class StructuredLogHandler(logging.Handler):
+    """Worker-side handler writing structured log records to the file
+    descriptor ``fd``.
+
+    Records are buffered, and written every ``interval`` seconds by a
+    background thread, when the buffer exceeds ``max_buffer`` bytes, or when
+    :meth:`flush` is called. The background thread can be stopped with
+    :meth:`stop_thread`."""
+    def __init__(self, fd, interval=0.05, max_buffer=65536):
+        logging.Handler.__init__(self)
+        self.setFormatter(logging.Formatter("%(message)s"))
+        self.fd = fd
+        self.interval = interval
+        self.max_buffer = max_buffer
+        self._buffer = bytearray()
+        self._buffer_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self.start_thread()
+
+    def start_thread(self):
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name="log-flush")
+        self._thread.start()
+
+    def stop_thread(self):
+        """Stops the background thread, and writes the buffered records.
+        Records are then only written when the buffer is full or
+        :meth:`flush` is called, until :meth:`start_thread` is called."""
+        self._closed.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def emit(self, record):
+        try:
+            data = encode_log_record(record.levelno, record.created,
+                                     record.name, self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        with self._buffer_lock:
+            self._buffer += data
+            full = len(self._buffer) >= self.max_buffer
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._write_lock:
+            with self._buffer_lock:
+                data = bytes(self._buffer)
+                self._buffer.clear()
+            view = memoryview(data)
+            while view:
+                try:
+                    written = os.write(self.fd, view)
+                except OSError:
+                    # master went away
+                    return
+                view = view[written:]
+
+    def _run(self):
+        while not self._closed.wait(self.interval):
+            if self._buffer:
+                self.flush()
+
+    def close(self):
+        if self._thread is not None:
+            self.stop_thread()
+        else:
+            self.flush()
+        logging.Handler.close(self)
+
+
+LEVELS = (logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR,
+          logging.CRITICAL)
+
+
+def log_batch_channel(level):
+    """Returns the name of the broadcast channel carrying batches of the log
+    messages at ``level`` or above. ``level`` must be one of :data:`LEVELS`;
+    the ``DEBUG`` channel carries all messages."""
+    return "log_batch:" + logging.getLevelName(level)
+
+
+class LogBatcher(TaskObject):
+    """Broadcasts log messages in batches.
+
+    Every ``interval`` seconds, the messages passed to :meth:`append` are
+    broadcast as a list on the channel returned by :func:`log_batch_channel`
+    for each level, containing only the messages at that level or above.
+    Subscribers thus do not receive the messages they would discard.
+
+    If ``legacy_channel`` is set, each message is also broadcast on the
+    ``log`` channel immediately, for older clients."""
+    def __init__(self, broadcaster, interval=0.1, legacy_channel=False):
+        self.broadcaster = broadcaster
+        self.interval = interval
+        self.legacy_channel = legacy_channel
+        self._batch = []
+
+    def append(self, msg):
+        if self.legacy_channel:
+            self.broadcaster.broadcast("log", msg)
+        self._batch.append(msg)
+
+    def flush(self):
+        batch = self._batch
+        if not batch:
+            return
+        self._batch = []
+        for level in LEVELS:
+            if level != LEVELS[0]:
+                batch = [msg for msg in batch if msg[0] >= level]
+                if not batch:
+                    return
+            self.broadcaster.broadcast(log_batch_channel(level), batch)
+
+    async def _do(self):
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                self.flush()
+        finally:
+            self.flush()
 
 
 class LogForwarder(logging.Handler):
@@ -30,6 +216,10 @@ def log_args(parser):
                        help="number of old log files to keep, or 0 to keep "
                             "all log files. '.<yyyy>-<mm>-<dd>' is added "
                             "to the base filename (default: %(default)d)")
+    group.add_argument("--log-legacy-channel", default=False,
+                       action="store_true",
+                       help="also broadcast each log message on the 'log' "
+                            "channel, for clients older than ARTIQ-7")
 
 
 def init_log(args):
@@ -0,0 +1,187 @@
+"""Publisher of sync_struct notifiers with server-side key filtering.
+
+Subscribers use the sync_struct protocol of :class:`sipyco.sync_struct.Publisher`
+and may append a filter to the notifier name (see :func:`filtered_name`) to
+receive only the top-level keys of the structure that they are interested
+in. The master then only encodes and sends the modifications of those keys,
+so that its work scales with the interest of the subscribers rather than
+with the total churn of the structure.
+"""
+
+import asyncio
+import logging
+from functools import partial
+
+from sipyco.asyncio_tools import AsyncioServer
+from sipyco import pyon
+
+
+logger = logging.getLogger(__name__)
+
+
+_protocol_banner = b"ARTIQ sync_struct\n"
+
+
+def filtered_name(notifier_name, keys=(), prefixes=()):
+    """Returns the notifier name to subscribe to in order to receive only
+    the top-level ``keys`` and the top-level keys starting with one of
+    ``prefixes`` of the notifier ``notifier_name``.
+
+    The returned name can be passed to :class:`sipyco.sync_struct.Subscriber`.
+    ``None`` in ``keys`` (e.g. an optional dataset that was not given) is
+    ignored.
+
+    Only :class:`Publisher` serves filtered names. Other publishers, such
+    as :class:`sipyco.sync_struct.Publisher`, close the connection without
+    sending the initial structure, and subscribers should then subscribe to
+    ``notifier_name`` instead.
+    """
+    spec = {"keys": sorted(k for k in keys if k is not None),
+            "prefixes": sorted(prefixes)}
+    return notifier_name + "?" + pyon.encode(spec)
+
+
+def _parse_name(name):
+    notifier_name, sep, spec = name.partition("?")
+    if not sep:
+        return notifier_name, None
+    spec = pyon.decode(spec)
+    return notifier_name, _KeyFilter(spec.get("keys", ()),
+                                     spec.get("prefixes", ()))
+
+
+class _KeyFilter:
+    def __init__(self, keys, prefixes):
+        self.keys = frozenset(keys)
+        self.prefixes = tuple(prefixes)
+
+    def match(self, key):
+        return (key in self.keys or
+                (isinstance(key, str) and key.startswith(self.prefixes)))
+
+
+def _mod_key(mod):
+    # Returns the top-level key modified by ``mod``, or None for mods that
+    # replace the whole structure.
+    if mod["path"]:
+        return mod["path"][0]
+    if mod["action"] in {"setitem", "delitem"}:
+        return mod["key"]
+    return None
+
+
+class _Recipients:
+    def __init__(self):
+        self.unfiltered = set()
+        self.by_key = dict()  # key -> set of queues
+        self.by_prefix = dict()  # queue -> _KeyFilter with prefixes
+
+    def add(self, queue, key_filter):
+        if key_filter is None:
+            self.unfiltered.add(queue)
+            return
+        for key in key_filter.keys:
+            self.by_key.setdefault(key, set()).add(queue)
+        if key_filter.prefixes:
+            self.by_prefix[queue] = key_filter
+
+    def remove(self, queue, key_filter):
+        if key_filter is None:
+            self.unfiltered.discard(queue)
+            return
+        for key in key_filter.keys:
+            queues = self.by_key[key]
+            queues.discard(queue)
+            if not queues:
+                del self.by_key[key]
+        self.by_prefix.pop(queue, None)
+
+    def interested(self, key):
+        if key is None:
+            queues = set(self.unfiltered)
+            queues.update(*self.by_key.values())
+            queues.update(self.by_prefix.keys())
+            return queues
+        queues = self.unfiltered
+        by_key = self.by_key.get(key)
+        if by_key:
+            queues = queues | by_key
+        if self.by_prefix:
+            matching = [queue for queue, key_filter in self.by_prefix.items()
+                        if isinstance(key, str)
+                        and key.startswith(key_filter.prefixes)]
+            if matching:
+                queues = queues.union(matching)
+        return queues
+
+
+class Publisher(AsyncioServer):
+    """Drop-in replacement of :class:`sipyco.sync_struct.Publisher` that
+    additionally serves filtered notifier names.
+
+    Filters apply to the top-level keys of dictionary notifiers. A
+    subscriber with a filter receives an initial structure containing only
+    the matching keys, then the modifications of those keys.
+
+    :param notifiers: A dictionary containing the notifiers to associate
+        with the :class:`sipyco.sync_struct.Notifier` instances.
+    """
+    def __init__(self, notifiers):
+        AsyncioServer.__init__(self)
+        self.notifiers = notifiers
+        self._recipients = {k: _Recipients() for k in notifiers.keys()}
+        self._notifier_names = {id(v): k for k, v in notifiers.items()}
+
+        for notifier in notifiers.values():
+            notifier.publish = partial(self.publish, notifier)
+
+    async def _handle_connection_cr(self, reader, writer):
+        try:
+            line = await reader.readline()
+            if line != _protocol_banner:
+                return
+
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                notifier_name, key_filter = _parse_name(line.decode()[:-1])
+                notifier = self.notifiers[notifier_name]
+            except:
+                logger.debug("invalid notifier name %r", line, exc_info=True)
+                return
+
+            struct = notifier.raw_view
+            if key_filter is not None:
+                struct = {k: v for k, v in struct.items()
+                          if key_filter.match(k)}
+            obj = {"action": "init", "struct": struct}
+            line = pyon.encode(obj) + "\n"
+            writer.write(line.encode())
+
+            queue = asyncio.Queue()
+            recipients = self._recipients[notifier_name]
+            recipients.add(queue, key_filter)
+            try:
+                while True:
+                    line = await queue.get()
+                    writer.write(line)
+                    # raise exception on connection error
+                    await writer.drain()
+            finally:
+                recipients.remove(queue, key_filter)
+        except (ConnectionError, TimeoutError):
+            # subscribers disconnecting are a normal occurrence
+            pass
+        finally:
+            writer.close()
+
+    def publish(self, notifier, mod):
+        notifier_name = self._notifier_names[id(notifier)]
+        queues = self._recipients[notifier_name].interested(_mod_key(mod))
+        if not queues:
+            return
+        line = pyon.encode(mod) + "\n"
+        line = line.encode()
+        for queue in queues:
+            queue.put_nowait(line)
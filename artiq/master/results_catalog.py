@@ -0,0 +1,326 @@
+"""Catalog of experiment results files.
+
+The catalog is a SQLite database indexing the metadata (RID, start time,
+expid, ...) and thumbnails of HDF5 results files, so that tools browsing
+large results trees do not need to open every file. Entries are keyed by
+path and validated against the size and modification time of the file, so
+that a stale entry is never returned.
+
+The master workers add each results file they write to the catalog at the
+root of the results directory. Other trees can be indexed with
+:meth:`ResultsCatalog.index_tree` or in the background with
+:class:`CatalogIndexer`.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import h5py
+
+from sipyco import pyon
+
+
+logger = logging.getLogger(__name__)
+
+
+CATALOG_NAME = "results_catalog.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    rid INTEGER,
+    start_time REAL,
+    run_time REAL,
+    artiq_version TEXT,
+    expid TEXT,
+    thumbnail BLOB
+)
+"""
+
+
+def _str(value):
+    if isinstance(value, bytes):
+        return value.decode()
+    return str(value)
+
+
+def read_metadata(f):
+    """Reads the catalog metadata from an open HDF5 results file.
+
+    Returns a dictionary with the keys ``rid``, ``start_time``,
+    ``run_time``, ``artiq_version``, ``expid`` (PYON-encoded) and
+    ``thumbnail`` (image file contents or ``None``)."""
+    metadata = {
+        "rid": int(f["rid"][()]),
+        "start_time": float(f["start_time"][()]),
+        "run_time": None,
+        "artiq_version": _str(f["artiq_version"][()]),
+        "expid": _str(f["expid"][()]),
+        "thumbnail": None,
+    }
+    if "run_time" in f:
+        metadata["run_time"] = float(f["run_time"][()])
+    try:
+        thumbnail = f["datasets/thumbnail"]
+    except KeyError:
+        pass
+    else:
+        metadata["thumbnail"] = bytes(thumbnail[()])
+    return metadata
+
+
+class ResultsCatalog:
+    """Catalog stored in the SQLite database ``filename``.
+
+    Paths of files located below the directory of the database are stored
+    relative to it, so that the catalog remains valid when the results tree
+    is moved or mounted elsewhere.
+
+    Instances can be shared between threads; each thread uses its own
+    database connection.
+    """
+    def __init__(self, filename, timeout=10.0):
+        self.filename = os.path.abspath(filename)
+        self.root = os.path.dirname(self.filename)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        with self._connection() as connection:
+            connection.execute(_SCHEMA)
+
+    def _connection(self):
+        try:
+            return self._local.connection
+        except AttributeError:
+            connection = sqlite3.connect(self.filename, timeout=self.timeout,
+                                         check_same_thread=False)
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+            return connection
+
+    def close(self):
+        """Closes the database connections of all threads."""
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def _key(self, filename):
+        filename = os.path.abspath(filename)
+        if filename.startswith(self.root + os.sep):
+            return os.path.relpath(filename, self.root)
+        return filename
+
+    def add(self, filename, metadata):
+        """Adds or replaces the entry of the file ``filename``.
+
+        ``metadata`` is as returned by :func:`read_metadata`, or ``None`` to
+        record that the file could not be read, so that it is not indexed
+        again until it changes.
+        """
+        st = os.stat(filename)
+        if metadata is None:
+            metadata = dict.fromkeys(("rid", "start_time", "run_time",
+                                      "artiq_version", "expid", "thumbnail"))
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO results VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key(filename), st.st_size, st.st_mtime_ns,
+                 metadata["rid"], metadata["start_time"],
+                 metadata["run_time"], metadata["artiq_version"],
+                 metadata["expid"], metadata["thumbnail"]))
+
+    def remove(self, filename):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM results WHERE path = ?",
+                               (self._key(filename), ))
+
+    def _valid_row(self, filename, columns):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+        return self._connection().execute(
+            "SELECT {} FROM results WHERE path = ? AND size = ? AND mtime = ?"
+            .format(columns),
+            (self._key(filename), st.st_size, st.st_mtime_ns)).fetchone()
+
+    def lookup(self, filename):
+        """Returns the metadata of the file ``filename``, without the
+        thumbnail, and with the expid decoded.
+
+        Returns ``None`` if the file is not in the catalog or has changed
+        since it was indexed. If the file could not be read when it was
+        indexed, all values are ``None``.
+        """
+        row = self._valid_row(
+            filename, "rid, start_time, run_time, artiq_version, expid, "
+                      "thumbnail IS NOT NULL")
+        if row is None:
+            return None
+        rid, start_time, run_time, artiq_version, expid, has_thumbnail = row
+        if expid is not None:
+            expid = pyon.decode(expid)
+        return {
+            "rid": rid,
+            "start_time": start_time,
+            "run_time": run_time,
+            "artiq_version": artiq_version,
+            "expid": expid,
+            "has_thumbnail": bool(has_thumbnail),
+        }
+
+    def thumbnail(self, filename):
+        """Returns the thumbnail of the file ``filename``, or ``None`` if
+        the file has no thumbnail, is not in the catalog or is stale."""
+        row = self._valid_row(filename, "thumbnail")
+        if row is None:
+            return None
+        return row[0]
+
+    def index(self, filename):
+        """Reads the file ``filename`` and adds it to the catalog, unless it
+        is already cataloged and unchanged.
+
+        Returns the same as :meth:`lookup`, or ``None`` if the file cannot
+        be opened (e.g. because it is being written).
+        """
+        entry = self.lookup(filename)
+        if entry is not None:
+            return entry
+        try:
+            f = h5py.File(filename, "r")
+        except OSError:  # e.g. file being written (see #470)
+            logger.debug("OSError when opening HDF5 file %s", filename,
+                         exc_info=True)
+            return None
+        try:
+            with f:
+                metadata = read_metadata(f)
+        except:
+            logger.warning("unable to read metadata from %s", filename,
+                           exc_info=True)
+            metadata = None
+        self.add(filename, metadata)
+        return self.lookup(filename)
+
+    def index_tree(self, root):
+        """Indexes all HDF5 files below the directory ``root``, and removes
+        the entries of files that no longer exist.
+
+        Returns the number of files that were (re)indexed."""
+        count = 0
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name.endswith(".h5"):
+                    filename = os.path.join(dirpath, name)
+                    if self.lookup(filename) is None:
+                        self.index(filename)
+                        count += 1
+        self.prune()
+        return count
+
+    def prune(self):
+        """Removes the entries of files that no longer exist."""
+        paths = [path for path, in self._connection().execute(
+            "SELECT path FROM results")]
+        missing = [(path, ) for path in paths
+                   if not os.path.exists(os.path.join(self.root, path))]
+        if missing:
+            with self._connection() as connection:
+                connection.executemany("DELETE FROM results WHERE path = ?",
+                                       missing)
+
+
+def find_catalog(directory):
+    """Returns the file name of the catalog maintained by the master in the
+    results directory ``directory``, or in its ``results`` subdirectory
+    (e.g. the working directory of the master), or ``None`` if there is
+    none."""
+    for results_dir in (directory, os.path.join(directory, "results")):
+        filename = os.path.join(results_dir, CATALOG_NAME)
+        if os.path.isfile(filename):
+            return filename
+    return None
+
+
+class CatalogIndexer:
+    """Indexes files and directories into a catalog in a background thread.
+
+    ``callback`` is called from the indexer thread with the file name and the
+    result of :meth:`ResultsCatalog.index` for each indexed file. Requests
+    are served most recent first, so that the files the user is currently
+    looking at are indexed before older requests.
+    """
+    def __init__(self, catalog, callback=None):
+        self.catalog = catalog
+        self.callback = callback
+        # pending requests, least recent first
+        self._requests = OrderedDict()
+        self._busy = False
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name="catalog-indexer")
+        self._thread.start()
+
+    def request(self, path):
+        """Queues the file ``path``, or the HDF5 files directly in the
+        directory ``path``, for indexing."""
+        with self._cond:
+            self._requests.pop(path, None)
+            self._requests[path] = None
+            self._cond.notify()
+
+    def join(self):
+        """Waits until all queued requests have been served."""
+        with self._cond:
+            self._cond.wait_for(lambda: not (self._requests or self._busy)
+                                or self._stopping)
+
+    def close(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._requests or self._stopping)
+                if self._stopping:
+                    return
+                path, _ = self._requests.popitem()
+                self._busy = True
+            try:
+                if os.path.isdir(path):
+                    filenames = sorted(
+                        os.path.join(path, name) for name in os.listdir(path)
+                        if name.endswith(".h5"))
+                    filenames = [filename for filename in filenames
+                                 if os.path.isfile(filename)]
+                else:
+                    filenames = [path]
+                for filename in filenames:
+                    with self._cond:
+                        if self._stopping:
+                            return
+                    entry = self.catalog.index(filename)
+                    if self.callback is not None:
+                        self.callback(filename, entry)
+            except:
+                logger.warning("failed to index %s", path, exc_info=True)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
@@ -0,0 +1,115 @@
+"""Writing of HDF5 results files.
+
+The worker writes the results file of a run with :func:`write_results_file`.
+With the ``--background-results`` option of the master, it instead passes the
+results to a new Python interpreter running this module (see
+:func:`start_results_writer`), so that the worker can exit and release its
+devices while the file is written. The writer is started afresh rather than
+forked from the worker, as the threads of the worker may hold locks (of HDF5,
+SQLite or logging) at the time of the fork.
+"""
+
+import logging
+import pickle
+import subprocess
+import sys
+import threading
+
+import h5py
+
+from sipyco import pyon
+from sipyco.logging_tools import multiline_log_config
+
+from artiq.master import results_catalog
+from artiq.master.worker_db import write_hdf5_datasets
+from artiq import __version__ as artiq_version
+
+
+logger = logging.getLogger(__name__)
+
+
+def write_results_file(filename, catalog_filename, results):
+    """Writes the results file ``filename`` and adds it to the results
+    catalog ``catalog_filename``.
+
+    ``results`` is a dictionary with the datasets (``local``, ``archive``
+    and ``hdf5_options``, as kept by
+    :class:`artiq.master.worker_db.DatasetManager`), the
+    ``compiler_profiles`` of the cores, the ``construction_times`` of the
+    devices as a list of ``(name, time)`` pairs, and the ``rid``,
+    ``start_time``, ``run_time`` and ``expid`` of the run.
+    """
+    with h5py.File(filename, "w") as f:
+        write_hdf5_datasets(f, results["local"], results["archive"],
+                            results["hdf5_options"])
+        if results["compiler_profiles"]:
+            group = f.create_group("compiler_profiles")
+            for i, profile in enumerate(results["compiler_profiles"]):
+                group[str(i)] = pyon.encode(profile)
+        if results["construction_times"]:
+            group = f.create_group("device_construction_times")
+            for name, construction_time in results["construction_times"]:
+                group[name] = construction_time
+        f["artiq_version"] = artiq_version
+        f["rid"] = results["rid"]
+        f["start_time"] = results["start_time"]
+        f["run_time"] = results["run_time"]
+        f["expid"] = pyon.encode(results["expid"])
+        metadata = results_catalog.read_metadata(f)
+    try:
+        catalog = results_catalog.ResultsCatalog(catalog_filename)
+        try:
+            catalog.add(filename, metadata)
+        finally:
+            catalog.close()
+    except:
+        logger.warning("failed to add %s to the results catalog",
+                       filename, exc_info=True)
+
+
+def _wait_results_writer(process, rid):
+    status = process.wait()
+    if status < 0:
+        logger.error("background writing of the results of RID %s "
+                     "was killed by signal %d", rid, -status)
+    elif status:
+        logger.error("background writing of the results of RID %s "
+                     "failed with status %d", rid, status)
+
+
+def start_results_writer(filename, catalog_filename, results,
+                         log_level=logging.WARNING):
+    """Starts a process running :func:`write_results_file` with the given
+    arguments, and returns without waiting for it.
+
+    The process logs its errors as text on the standard error, which it
+    shares with the caller. Its exit status is also reported as long as the
+    caller is running."""
+    data = pickle.dumps((filename, catalog_filename, results),
+                        pickle.HIGHEST_PROTOCOL)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "artiq.master.results_writer",
+         str(log_level)],
+        stdin=subprocess.PIPE)
+    try:
+        process.stdin.write(data)
+    finally:
+        process.stdin.close()
+    threading.Thread(target=_wait_results_writer,
+                     args=(process, results["rid"]),
+                     daemon=True, name="results-writer").start()
+
+
+def main():
+    multiline_log_config(level=int(sys.argv[1]))
+    filename, catalog_filename, results = pickle.load(sys.stdin.buffer)
+    try:
+        write_results_file(filename, catalog_filename, results)
+    except:
+        logger.error("failed to write results of RID %s in background",
+                     results["rid"], exc_info=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -58,7 +58,8 @@ class Run:
         self.due_date = due_date
         self.flush = flush
 
-        self.worker = Worker(pool.worker_handlers)
+        self.worker = Worker(pool.worker_handlers,
+                             background_results=pool.background_results)
         self.termination_requested = False
 
         self._status = RunStatus.pending
@@ -113,12 +114,14 @@ class Run:
 
 
 class RunPool:
-    def __init__(self, ridc, worker_handlers, notifier, experiment_db):
+    def __init__(self, ridc, worker_handlers, notifier, experiment_db,
+                 background_results=False):
         self.runs = dict()
         self.state_changed = Condition()
 
         self.ridc = ridc
         self.worker_handlers = worker_handlers
+        self.background_results = background_results
         self.notifier = notifier
         self.experiment_db = experiment_db
 
@@ -311,8 +314,10 @@ class AnalyzeStage(TaskObject):
 
 
 class Pipeline:
-    def __init__(self, ridc, deleter, worker_handlers, notifier, experiment_db):
-        self.pool = RunPool(ridc, worker_handlers, notifier, experiment_db)
+    def __init__(self, ridc, deleter, worker_handlers, notifier, experiment_db,
+                 background_results=False):
+        self.pool = RunPool(ridc, worker_handlers, notifier, experiment_db,
+                            background_results)
         self._prepare = PrepareStage(self.pool, deleter.delete)
         self._run = RunStage(self.pool, deleter.delete)
         self._analyze = AnalyzeStage(self.pool, deleter.delete)
@@ -383,12 +388,14 @@ class Deleter(TaskObject):
 
 
 class Scheduler:
-    def __init__(self, ridc, worker_handlers, experiment_db):
+    def __init__(self, ridc, worker_handlers, experiment_db,
+                 background_results=False):
         self.notifier = Notifier(dict())
 
         self._pipelines = dict()
         self._worker_handlers = worker_handlers
         self._experiment_db = experiment_db
+        self._background_results = background_results
         self._terminated = False
 
         self._ridc = ridc
@@ -423,7 +430,7 @@ class Scheduler:
             logger.debug("creating pipeline '%s'", pipeline_name)
             pipeline = Pipeline(self._ridc, self._deleter,
                                 self._worker_handlers, self.notifier,
-                                self._experiment_db)
+                                self._experiment_db, self._background_results)
             self._pipelines[pipeline_name] = pipeline
             pipeline.start()
         return pipeline.pool.submit(expid, priority, due_date, flush, pipeline_name)
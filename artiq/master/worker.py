@@ -10,6 +10,7 @@ from sipyco.logging_tools import LogParser
 from sipyco.packed_exceptions import current_exc_packed
 
 from artiq.tools import asyncio_wait_or_cancel
+from artiq.master.log import LogRecordDecoder, log_structured_record
 
 
 logger = logging.getLogger(__name__)
@@ -42,9 +43,11 @@ def log_worker_exception():
 
 
 class Worker:
-    def __init__(self, handlers=dict(), send_timeout=10.0):
+    def __init__(self, handlers=dict(), send_timeout=10.0,
+                 background_results=False):
         self.handlers = handlers
         self.send_timeout = send_timeout
+        self.background_results = background_results
 
         self.rid = None
         self.filename = None
@@ -86,11 +89,29 @@ class Worker:
             self.ipc = pipe_ipc.AsyncioParentComm()
             env = os.environ.copy()
             env["PYTHONUNBUFFERED"] = "1"
-            await self.ipc.create_subprocess(
-                sys.executable, "-m", "artiq.master.worker_impl",
-                self.ipc.get_address(), str(log_level),
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                env=env, start_new_session=True)
+            args = [sys.executable, "-m", "artiq.master.worker_impl",
+                    self.ipc.get_address(), str(log_level)]
+            kwargs = dict()
+            if os.name != "nt":
+                # Dedicated pipe for structured log records. On Windows,
+                # the worker formats log records on stderr instead.
+                log_read, log_write = os.pipe()
+                args.append(str(log_write))
+                kwargs["pass_fds"] = (log_write, )
+            try:
+                await self.ipc.create_subprocess(
+                    *args,
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                    env=env, start_new_session=True, **kwargs)
+            except:
+                if os.name != "nt":
+                    os.close(log_read)
+                raise
+            finally:
+                if os.name != "nt":
+                    os.close(log_write)
+            if os.name != "nt":
+                asyncio.ensure_future(self._log_task(log_read))
             asyncio.ensure_future(
                 LogParser(self._get_log_source).stream_task(
                     self.ipc.process.stdout))
@@ -100,6 +121,25 @@ class Worker:
         finally:
             self.io_lock.release()
 
+    async def _log_task(self, fd):
+        loop = asyncio.get_event_loop()
+        reader = asyncio.StreamReader()
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader),
+            os.fdopen(fd, "rb", 0))
+        decoder = LogRecordDecoder()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                source = self._get_log_source()
+                for level, created, name, message in decoder.feed(data):
+                    log_structured_record(level, created, name, message,
+                                          source)
+        finally:
+            transport.close()
+
     async def close(self, term_timeout=2.0):
         """Interrupts any I/O with the worker process and terminates the
         worker process.
@@ -239,6 +279,14 @@ class Worker:
             finally:
                 self.io_lock.release()
 
+    def _device_db(self):
+        # The worker receives the device database once with the build
+        # request instead of querying it for every device.
+        get_device_db = self.handlers.get("get_device_db")
+        if get_device_db is None:
+            return None
+        return get_device_db()
+
     async def _worker_action(self, obj, timeout=None):
         if timeout is not None:
             self.watchdogs[-1] = time.monotonic() + timeout
@@ -269,7 +317,9 @@ class Worker:
              "pipeline_name": pipeline_name,
              "wd": wd,
              "expid": expid,
-             "priority": priority},
+             "priority": priority,
+             "device_db": self._device_db(),
+             "background_results": self.background_results},
             timeout)
 
     async def prepare(self):
@@ -5,8 +5,13 @@ standalone command line tools).
 """
 
 from operator import setitem
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import importlib
 import logging
+import time
+
+import numpy as np
 
 from sipyco.sync_struct import Notifier
 from sipyco.pc_rpc import AutoTarget, Client, BestEffortClient
@@ -53,13 +58,81 @@ class DeviceError(Exception):
     pass
 
 
+class _BackgroundClient:
+    """Controller RPC client whose connection is established in a
+    background thread. Attribute accesses wait for the connection."""
+    def __init__(self, future):
+        self._future = future
+
+    def done(self):
+        """Returns ``True`` if the connection was established or failed."""
+        return self._future.done()
+
+    def resolve(self):
+        """Waits for the connection, and returns the connected client or
+        raises its :class:`DeviceError`."""
+        return self._future.result()
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __dir__(self):
+        return dir(self.resolve())
+
+    def __repr__(self):
+        return repr(self.resolve())
+
+    def __enter__(self):
+        return self.resolve().__enter__()
+
+    def __exit__(self, *exc_info):
+        return self.resolve().__exit__(*exc_info)
+
+    def close_rpc(self):
+        try:
+            client = self.resolve()
+        except DeviceError:
+            return
+        client.close_rpc()
+
+
+def _freeze(desc):
+    # Returns a hashable equivalent of a device description. Containers are
+    # tagged with their type, so that e.g. a dictionary and the list of its
+    # items have different keys.
+    if isinstance(desc, dict):
+        return (dict, tuple(sorted((k, _freeze(v)) for k, v in desc.items())))
+    elif isinstance(desc, (list, tuple)):
+        return (type(desc), tuple(_freeze(v) for v in desc))
+    else:
+        hash(desc)
+        return desc
+
+
 class DeviceManager:
     """Handles creation and destruction of local device drivers and controller
-    RPC clients."""
-    def __init__(self, ddb, virtual_devices=dict()):
+    RPC clients.
+
+    If ``connect_in_background`` is set, or for controllers whose device
+    database entry sets ``connect_in_background``, controller RPC clients
+    are connected in background threads, so that experiments using many
+    controllers do not wait for each connection in turn. The client returned
+    by :meth:`get` then blocks on first use until the connection is
+    established, and :meth:`wait_connections` raises connection errors.
+
+    The time taken to create each device, in seconds, is recorded in
+    :attr:`construction_times`, and written to the results file by the
+    worker."""
+    def __init__(self, ddb, virtual_devices=dict(),
+                 connect_in_background=False):
         self.ddb = ddb
         self.virtual_devices = virtual_devices
+        self.connect_in_background = connect_in_background
         self.active_devices = []
+        self.construction_times = OrderedDict()
+        self._devices_by_name = dict()
+        self._devices_by_desc = dict()
+        self._executor = None
 
     def get_device_db(self):
         """Returns the full contents of the device database."""
@@ -68,11 +141,26 @@ class DeviceManager:
     def get_desc(self, name):
         return self.ddb.get(name, resolve_alias=True)
 
+    def _create_device(self, name, desc):
+        t0 = time.monotonic()
+        try:
+            dev = _create_device(desc, self)
+        except Exception as e:
+            raise DeviceError("Failed to create device '{}'"
+                              .format(name)) from e
+        construction_time = time.monotonic() - t0
+        self.construction_times[name] = construction_time
+        logger.debug("created device '%s' in %.1f ms",
+                     name, construction_time*1e3)
+        return dev
+
     def get(self, name):
         """Get the device driver or controller client corresponding to a
         device database entry."""
         if name in self.virtual_devices:
             return self.virtual_devices[name]
+        if name in self._devices_by_name:
+            return self._devices_by_name[name]
 
         try:
             desc = self.get_desc(name)
@@ -80,30 +168,122 @@ class DeviceManager:
             raise DeviceError("Failed to get description of device '{}'"
                               .format(name)) from e
 
-        for existing_desc, existing_dev in self.active_devices:
-            if desc == existing_desc:
-                return existing_dev
-
         try:
-            dev = _create_device(desc, self)
-        except Exception as e:
-            raise DeviceError("Failed to create device '{}'"
-                              .format(name)) from e
+            key = _freeze(desc)
+        except TypeError:
+            # unhashable argument values; fall back to comparing descriptions
+            key = None
+            for existing_desc, existing_dev in self.active_devices:
+                if desc == existing_desc:
+                    self._devices_by_name[name] = existing_dev
+                    return existing_dev
+        else:
+            if key in self._devices_by_desc:
+                dev = self._devices_by_desc[key]
+                self._devices_by_name[name] = dev
+                return dev
+
+        if (desc["type"] in ("controller", "controller_aux_target")
+                and desc.get("connect_in_background",
+                             self.connect_in_background)):
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    thread_name_prefix="device_manager")
+            dev = _BackgroundClient(
+                self._executor.submit(self._create_device, name, desc))
+        else:
+            dev = self._create_device(name, desc)
         self.active_devices.append((desc, dev))
+        if key is not None:
+            self._devices_by_desc[key] = dev
+        self._devices_by_name[name] = dev
         return dev
 
+    def wait_connections(self):
+        """Waits for the controller connections established in the
+        background, and raises the :class:`DeviceError` of the first one
+        that failed."""
+        for _desc, dev in self.active_devices:
+            if type(dev) is _BackgroundClient:
+                dev.resolve()
+
+    def resolved_devices(self):
+        """Returns the active devices without waiting for connections:
+        controller clients connected in the background are returned once
+        connected, and are omitted while connecting or if they failed."""
+        devices = []
+        for _desc, dev in self.active_devices:
+            if type(dev) is _BackgroundClient:
+                if not dev.done():
+                    continue
+                try:
+                    dev = dev.resolve()
+                except DeviceError:
+                    continue
+            devices.append(dev)
+        return devices
+
     def close_devices(self):
         """Closes all active devices, in the opposite order as they were
         requested."""
         for _desc, dev in reversed(self.active_devices):
             try:
-                if isinstance(dev, (Client, BestEffortClient)):
+                if (type(dev) is _BackgroundClient
+                        or isinstance(dev, (Client, BestEffortClient))):
                     dev.close_rpc()
                 elif hasattr(dev, "close"):
                     dev.close()
             except Exception as e:
                 logger.warning("Exception %r when closing device %r", e, dev)
         self.active_devices.clear()
+        self._devices_by_name.clear()
+        self._devices_by_desc.clear()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+#: Predefined HDF5 storage profiles that can be passed as ``hdf5_options``
+#: to :meth:`artiq.language.environment.HasEnvironment.set_dataset`.
+HDF5_PROFILES = {
+    # good compression ratio, slow
+    "gzip": {"chunks": True, "shuffle": True,
+             "compression": "gzip", "compression_opts": 4},
+    # fast compression, always available with h5py
+    "lzf": {"chunks": True, "shuffle": True, "compression": "lzf"},
+}
+
+_hdf5_option_names = {"chunks", "compression", "compression_opts", "shuffle",
+                      "fletcher32", "scaleoffset", "dtype"}
+
+
+def resolve_hdf5_options(options):
+    """Returns the keyword arguments of :meth:`h5py.Group.create_dataset`
+    for the storage options ``options``.
+
+    ``options`` is either the name of a profile of :data:`HDF5_PROFILES`, or
+    a dictionary of ``create_dataset`` keyword arguments, optionally
+    containing a ``profile`` entry naming the profile that they update.
+    """
+    if isinstance(options, str):
+        options = {"profile": options}
+    options = dict(options)
+    profile = options.pop("profile", None)
+    if profile is not None:
+        try:
+            resolved = dict(HDF5_PROFILES[profile])
+        except KeyError:
+            raise ValueError("Unknown HDF5 storage profile '{}'"
+                             .format(profile)) from None
+        resolved.update(options)
+        options = resolved
+    unknown = set(options.keys()) - _hdf5_option_names
+    if unknown:
+        raise ValueError("Unsupported HDF5 storage options: {}".format(
+            ", ".join(sorted(unknown))))
+    if "dtype" in options:
+        options["dtype"] = np.dtype(options["dtype"])
+    return options
 
 
 class DatasetManager:
@@ -111,13 +291,17 @@ class DatasetManager:
         self._broadcaster = Notifier(dict())
         self.local = dict()
         self.archive = dict()
+        self.hdf5_options = dict()
 
         self.ddb = ddb
         self._broadcaster.publish = ddb.update
 
-    def set(self, key, value, broadcast=False, persist=False, archive=True):
+    def set(self, key, value, broadcast=False, persist=False, archive=True,
+            hdf5_options=None):
         if persist:
             broadcast = True
+        if hdf5_options is not None:
+            hdf5_options = resolve_hdf5_options(hdf5_options)
 
         if broadcast:
             self._broadcaster[key] = persist, value
@@ -129,6 +313,11 @@ class DatasetManager:
         elif key in self.local:
             del self.local[key]
 
+        if archive and hdf5_options:
+            self.hdf5_options[key] = hdf5_options
+        else:
+            self.hdf5_options.pop(key, None)
+
     def _get_mutation_target(self, key):
         target = self.local.get(key, None)
         if key in self._broadcaster.raw_view:
@@ -164,20 +353,35 @@ class DatasetManager:
         return data
 
     def write_hdf5(self, f):
-        datasets_group = f.create_group("datasets")
-        for k, v in self.local.items():
-            _write(datasets_group, k, v)
+        write_hdf5_datasets(f, self.local, self.archive, self.hdf5_options)
+
 
-        archive_group = f.create_group("archive")
-        for k, v in self.archive.items():
-            _write(archive_group, k, v)
+def write_hdf5_datasets(f, local, archive, hdf5_options):
+    """Writes the datasets ``local``, with the storage options
+    ``hdf5_options``, and the archived datasets ``archive`` into the HDF5
+    file ``f``, as :meth:`DatasetManager.write_hdf5` does."""
+    datasets_group = f.create_group("datasets")
+    for k, v in local.items():
+        _write(datasets_group, k, v, hdf5_options.get(k))
 
+    archive_group = f.create_group("archive")
+    for k, v in archive.items():
+        _write(archive_group, k, v)
 
-def _write(group, k, v):
+
+def _write(group, k, v, hdf5_options=None):
     # Add context to exception message when the user writes a dataset that is
     # not representable in HDF5.
     try:
-        group[k] = v
+        if hdf5_options:
+            if np.ndim(v) == 0:
+                # chunking and filters are only supported for arrays
+                hdf5_options = {name: option
+                                for name, option in hdf5_options.items()
+                                if name == "dtype"}
+            group.create_dataset(k, data=v, **hdf5_options)
+        else:
+            group[k] = v
     except TypeError as e:
         raise TypeError("Error writing dataset '{}' of type '{}': {}".format(
             k, type(v), e))
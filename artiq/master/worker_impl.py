@@ -16,8 +16,6 @@ from collections import OrderedDict
 import importlib.util
 import linecache
 
-import h5py
-
 from sipyco import pipe_ipc, pyon
 from sipyco.packed_exceptions import raise_packed_exc
 from sipyco.logging_tools import multiline_log_config
@@ -25,17 +23,19 @@ from sipyco.logging_tools import multiline_log_config
 import artiq
 from artiq import tools
 from artiq.master.worker_db import DeviceManager, DatasetManager, DummyDevice
+from artiq.master import results_catalog, results_writer
+from artiq.master.log import StructuredLogHandler
 from artiq.language.environment import (
     is_public_experiment, TraceArgumentManager, ProcessArgumentManager
 )
 from artiq.language.core import set_watchdog_factory, TerminationRequested
 from artiq.language.types import TBool
 from artiq.compiler import import_cache
-from artiq.coredevice.core import CompileError, host_only, _render_diagnostic
-from artiq import __version__ as artiq_version
+from artiq.coredevice.core import Core, CompileError, host_only, _render_diagnostic
 
 
 ipc = None
+log_handler = None
 
 
 def get_object():
@@ -44,6 +44,9 @@ def get_object():
 
 
 def put_object(obj):
+    if log_handler is not None:
+        # Log records sent before a reply must reach the master first.
+        log_handler.flush()
     ds = pyon.encode(obj)
     ipc.write((ds + "\n").encode())
 
@@ -66,8 +69,37 @@ def make_parent_action(action):
 
 
 class ParentDeviceDB:
-    get_device_db = make_parent_action("get_device_db")
-    get = make_parent_action("get_device")
+    """Device database of the master.
+
+    The master sends a copy of the device database with the build request,
+    so that devices are looked up locally. Otherwise (e.g. when examining
+    experiments), the device database is requested from the master when it
+    is first needed, and individual devices are requested on each lookup."""
+    _get_device_db = staticmethod(make_parent_action("get_device_db"))
+    _get = staticmethod(make_parent_action("get_device"))
+
+    def __init__(self):
+        self.data = None
+
+    def set_data(self, data):
+        self.data = data
+
+    def get_device_db(self):
+        if self.data is None:
+            self.data = self._get_device_db()
+        return self.data
+
+    def get(self, key, resolve_alias=False):
+        if self.data is None:
+            return self._get(key, resolve_alias)
+        desc = self.data[key]
+        if resolve_alias:
+            while isinstance(desc, str):
+                desc = self.data[desc]
+        return desc
+
+
+parent_device_db = ParentDeviceDB()
 
 
 class ParentDatasetDB:
@@ -168,7 +200,9 @@ register_experiment = make_parent_action("register_experiment")
 
 
 class ExamineDeviceMgr:
-    get_device_db = make_parent_action("get_device_db")
+    @staticmethod
+    def get_device_db():
+        return parent_device_db.get_device_db()
 
     @staticmethod
     def get(name):
@@ -238,6 +272,14 @@ def setup_diagnostics(experiment_file, repository_path):
         render_diagnostic
 
 
+def get_compiler_profiles(device_mgr):
+    profiles = []
+    for dev in device_mgr.resolved_devices():
+        if isinstance(dev, Core):
+            profiles += dev.compiler_profiles
+    return profiles
+
+
 def put_completed():
     put_object({"action": "completed"})
 
@@ -263,9 +305,18 @@ def put_exception_report():
 
 
 def main():
-    global ipc
-
-    multiline_log_config(level=int(sys.argv[2]))
+    global ipc, log_handler
+
+    log_level = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        # Structured log records on a dedicated pipe. Output on stdout and
+        # stderr (e.g. print()) is still parsed by the master.
+        log_handler = StructuredLogHandler(int(sys.argv[3]))
+        root_logger = logging.getLogger()
+        root_logger.setLevel(log_level)
+        root_logger.addHandler(log_handler)
+    else:
+        multiline_log_config(level=log_level)
     ipc = pipe_ipc.ChildComm(sys.argv[1])
 
     start_time = None
@@ -275,18 +326,33 @@ def main():
     exp = None
     exp_inst = None
     repository_path = None
+    catalog_filename = None
+
+    background_results = False
+
+    def write_results(background=False):
+        filename = os.path.abspath("{:09}-{}.h5".format(rid, exp.__name__))
+        results = {
+            "local": dataset_mgr.local,
+            "archive": dataset_mgr.archive,
+            "hdf5_options": dataset_mgr.hdf5_options,
+            "compiler_profiles": get_compiler_profiles(device_mgr),
+            # Devices may still be created by background connections.
+            "construction_times": list(
+                device_mgr.construction_times.items()),
+            "rid": rid,
+            "start_time": start_time,
+            "run_time": run_time,
+            "expid": expid
+        }
+        if background:
+            results_writer.start_results_writer(
+                filename, catalog_filename, results, log_level)
+        else:
+            results_writer.write_results_file(
+                filename, catalog_filename, results)
 
-    def write_results():
-        filename = "{:09}-{}.h5".format(rid, exp.__name__)
-        with h5py.File(filename, "w") as f:
-            dataset_mgr.write_hdf5(f)
-            f["artiq_version"] = artiq_version
-            f["rid"] = rid
-            f["start_time"] = start_time
-            f["run_time"] = run_time
-            f["expid"] = pyon.encode(expid)
-
-    device_mgr = DeviceManager(ParentDeviceDB,
+    device_mgr = DeviceManager(parent_device_db,
                                virtual_devices={"scheduler": Scheduler(),
                                                 "ccb": CCB()})
     dataset_mgr = DatasetManager(ParentDatasetDB)
@@ -299,8 +365,10 @@ def main():
             action = obj["action"]
             if action == "build":
                 start_time = time.time()
+                parent_device_db.set_data(obj.get("device_db"))
                 rid = obj["rid"]
                 expid = obj["expid"]
+                background_results = obj.get("background_results", False)
                 if "file" in expid:
                     if obj["wd"] is not None:
                         # Using repository
@@ -317,6 +385,8 @@ def main():
                 device_mgr.virtual_devices["scheduler"].set_run_info(
                     rid, obj["pipeline_name"], expid, obj["priority"])
                 start_local_time = time.localtime(start_time)
+                catalog_filename = os.path.abspath(os.path.join(
+                    "results", results_catalog.CATALOG_NAME))
                 dirname = os.path.join("results",
                                    time.strftime("%Y-%m-%d", start_local_time),
                                    time.strftime("%H", start_local_time))
@@ -327,6 +397,7 @@ def main():
                 put_completed()
             elif action == "prepare":
                 exp_inst.prepare()
+                device_mgr.wait_connections()
                 put_completed()
             elif action == "run":
                 run_time = time.time()
@@ -343,7 +414,7 @@ def main():
                     exp_inst.analyze()
                     put_completed()
                 finally:
-                    write_results()
+                    write_results(background_results)
             elif action == "examine":
                 examine(ExamineDeviceMgr, ExamineDatasetMgr, obj["file"])
                 put_completed()
@@ -0,0 +1,1326 @@
+"""
+Software emulator of the core device, speaking the session protocol of
+:mod:`artiq.coredevice.comm_kernel`.
+
+:class:`CoreEmulator` accepts connections from :class:`CommKernel` and
+implements system information, kernel loading (including the kernel library
+cache), kernel execution, RPCs, kernel exceptions and the upload of DMA
+traces (which are stored, but cannot be played back). It makes it possible to
+measure RPC throughput, compile-to-run latency and other host-side costs
+without a core device.
+
+Kernels are executed by an executor. :class:`NativeExecutor` runs kernels
+compiled for :class:`artiq.compiler.targets.NativeTarget` (e.g. with
+``Core(target="native")``) in the host process with the LLVM JIT, and
+provides the RPC and RTIO syscalls. RTIO writes go to an
+:class:`artiq.sim.rtio.SED` model, whose event log records every event.
+
+Native kernels cannot catch exceptions, as they are not unwound: kernels
+with ``try`` statements, or ``with`` statements using context managers, fail
+to load, and an exception raised in a native kernel terminates it.
+"""
+
+import ctypes
+import logging
+import queue
+import socket
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy
+
+from artiq import __version__ as software_version
+from artiq.coredevice.comm_kernel import Request, Reply
+from artiq.coredevice.exceptions import RTIOUnderflow
+from artiq.sim.rtio import SED
+
+
+__all__ = ["KernelError", "KernelContext", "NativeExecutor", "CoreEmulator"]
+
+
+logger = logging.getLogger(__name__)
+
+
+_int32 = struct.Struct("<l")
+_uint32 = struct.Struct("<L")
+_int64 = struct.Struct("<q")
+_float64 = struct.Struct("<d")
+_header = struct.Struct("<LB")
+
+# numpy dtypes of the RPC values that are transferred in bulk in lists and
+# arrays
+_bulk_dtypes = {
+    "b": numpy.dtype("?"),
+    "i": numpy.dtype("<i4"),
+    "I": numpy.dtype("<i8"),
+    "f": numpy.dtype("<f8"),
+}
+
+# Identifiers of the builtin exceptions, see
+# EmbeddingMap.preallocate_runtime_exception_names
+EXCEPTION_RUNTIME_ERROR = 0
+EXCEPTION_RTIO_UNDERFLOW = 1
+
+# Strings in exceptions with this length are keys of the host string table.
+_STRING_KEY_LENGTH = 0xffffffff
+
+
+class KernelError(Exception):
+    """Raised to terminate a kernel with a core device exception.
+
+    :param exceptions: list of exception records, innermost first. Each
+        record is a dictionary with the keys ``id``, ``message``, ``params``,
+        ``file``, ``line``, ``column`` and ``function``. Strings are either
+        ``str`` or keys of the host string table (``int``).
+    """
+    def __init__(self, exceptions):
+        Exception.__init__(self, exceptions[0]["message"])
+        self.exceptions = exceptions
+
+
+def _exception(exn_id, message, params=(0, 0, 0), function="<emulator>"):
+    return {
+        "id": exn_id,
+        "message": message,
+        "params": list(params),
+        "file": "<emulator>",
+        "line": 0,
+        "column": 0,
+        "function": function,
+    }
+
+
+#
+# RPC tags, see rpc_proto.rs and compiler/ir.py:rpc_tag
+#
+
+def _parse_tag(tag_bytes, pos):
+    c = chr(tag_bytes[pos])
+    pos += 1
+    if c == "t":
+        arity = tag_bytes[pos]
+        pos += 1
+        elements = []
+        for _ in range(arity):
+            element, pos = _parse_tag(tag_bytes, pos)
+            elements.append(element)
+        return (c, tuple(elements)), pos
+    elif c in "lrk":
+        element, pos = _parse_tag(tag_bytes, pos)
+        return (c, element), pos
+    elif c == "a":
+        num_dims = tag_bytes[pos]
+        element, pos = _parse_tag(tag_bytes, pos + 1)
+        return (c, num_dims, element), pos
+    elif c in "nbiIfsBAO":
+        return (c,), pos
+    else:
+        raise ValueError("Unknown RPC value tag: {}".format(repr(c)))
+
+
+_tag_cache = dict()
+
+
+def _parse_tags(tag_bytes):
+    tag_bytes = bytes(tag_bytes)
+    try:
+        return _tag_cache[tag_bytes]
+    except KeyError:
+        pass
+    tags = []
+    pos = 0
+    while pos < len(tag_bytes):
+        tag, pos = _parse_tag(tag_bytes, pos)
+        tags.append(tag)
+    _tag_cache[tag_bytes] = tags
+    return tags
+
+
+def _split_tag(tag_bytes):
+    """Returns the parsed argument tags and the return tag bytes of a RPC."""
+    arg_tags, _, return_tags = bytes(tag_bytes).partition(b":")
+    return _parse_tags(arg_tags), return_tags
+
+
+def _pack_value(out, tag, value):
+    # Serializes a Python value, as send_value in rpc_proto.rs does for
+    # values in the kernel memory.
+    c = tag[0]
+    out.append(ord(c))
+    if c == "n":
+        pass
+    elif c == "b":
+        out.append(1 if value else 0)
+    elif c == "i":
+        out += _int32.pack(value)
+    elif c == "I":
+        out += _int64.pack(value)
+    elif c == "f":
+        out += _float64.pack(value)
+    elif c in "sBA":
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        out += _uint32.pack(len(value))
+        out += value
+    elif c == "t":
+        out.append(len(tag[1]))
+        for element, element_value in zip(tag[1], value):
+            _pack_value(out, element, element_value)
+    elif c == "l":
+        element = tag[1]
+        out += _uint32.pack(len(value))
+        out.append(ord(element[0]))
+        dtype = _bulk_dtypes.get(element[0])
+        if dtype is not None:
+            out += numpy.asarray(value, dtype).tobytes()
+        else:
+            for element_value in value:
+                _pack_value(out, element, element_value)
+    elif c == "a":
+        _, num_dims, element = tag
+        value = numpy.asarray(value)
+        out.append(num_dims)
+        for length in value.shape:
+            out += _uint32.pack(length)
+        out.append(ord(element[0]))
+        dtype = _bulk_dtypes.get(element[0])
+        if dtype is not None:
+            out += value.astype(dtype).tobytes()
+        else:
+            for element_value in value.reshape((-1,)):
+                _pack_value(out, element, element_value)
+    elif c == "r":
+        for element_value in value:
+            _pack_value(out, tag[1], element_value)
+    elif c == "k":
+        name, value = value
+        name = name.encode("utf-8")
+        out += _uint32.pack(len(name))
+        out += name
+        _pack_value(out, tag[1], value)
+    elif c == "O":
+        out += _uint32.pack(value)
+
+
+def _pack_rpc(is_async, service, arg_tags, args, return_tags):
+    message = bytearray()
+    message.append(1 if is_async else 0)
+    message += _uint32.pack(service)
+    for tag, arg in zip(arg_tags, args):
+        _pack_value(message, tag, arg)
+    message.append(0)
+    message += _uint32.pack(len(return_tags))
+    message += return_tags
+    return message
+
+
+class KernelContext:
+    """Interface between a running kernel and the emulator.
+
+    Executors call the methods of this object from the kernel thread. RTIO
+    errors and RPC exceptions are raised as :class:`KernelError`.
+
+    :var sed: the :class:`artiq.sim.rtio.SED` model receiving RTIO writes.
+    """
+    def __init__(self, sed):
+        self.sed = sed
+        self._to_session = queue.Queue()
+        self._to_kernel = queue.Queue()
+
+    # Kernel interface
+
+    def rtio_init(self):
+        self.sed.reset_lanes()
+
+    def rtio_get_counter(self):
+        return self.sed.counter
+
+    def rtio_output(self, timestamp, target, data):
+        channel = target >> 8
+        try:
+            self.sed.write(timestamp, channel, target & 0xff, data)
+        except RTIOUnderflow:
+            raise KernelError([_exception(
+                EXCEPTION_RTIO_UNDERFLOW,
+                "RTIO underflow at {0} mu, channel {1}, slack {2} mu",
+                (timestamp, channel, timestamp - self.sed.counter),
+                "rtio_output")])
+
+    def rtio_output_wide(self, timestamp, target, data):
+        channel = target >> 8
+        try:
+            self.sed.write_wide(timestamp, channel, target & 0xff, data)
+        except RTIOUnderflow:
+            raise KernelError([_exception(
+                EXCEPTION_RTIO_UNDERFLOW,
+                "RTIO underflow at {0} mu, channel {1}, slack {2} mu",
+                (timestamp, channel, timestamp - self.sed.counter),
+                "rtio_output_wide")])
+
+    def rpc(self, service, tag, args, is_async=False):
+        """Calls a RPC with Python values and returns its result.
+
+        :param tag: the RPC tag, e.g. ``b"iI:n"``, as generated by the
+            compiler.
+        """
+        arg_tags, return_tags = _split_tag(tag)
+        self.send_rpc(_pack_rpc(is_async, service, arg_tags, args,
+                                return_tags), is_async)
+        if not is_async:
+            return self.receive_rpc_reply()[1]
+
+    def send_rpc(self, message, is_async):
+        """Sends a serialized RPC request, i.e. the payload of a
+        ``RPCRequest`` message."""
+        self._to_session.put(("rpc", message, is_async))
+
+    def receive_rpc_reply(self):
+        """Waits for the reply to the last RPC request.
+
+        :returns: the parsed return tag and the returned value.
+        """
+        kind, value = self._to_kernel.get()
+        if kind == "exception":
+            raise KernelError([value])
+        return value
+
+    # Session interface
+
+    def run(self, kernel):
+        try:
+            kernel.run(self)
+        except KernelError as error:
+            self._to_session.put(("exception", error.exceptions))
+        except Exception as error:
+            logger.error("kernel failed", exc_info=True)
+            self._to_session.put(("exception", [_exception(
+                EXCEPTION_RUNTIME_ERROR, str(error))]))
+        else:
+            self._to_session.put(("finished",))
+
+
+#
+# Native kernels
+#
+# Values in the kernel memory use the layout of NativeTarget on a 64-bit
+# little-endian host: CSlice is {i8*, i32} (16 bytes), lists are pointers to
+# {elt*, i32}.
+#
+
+_POINTER_SIZE = 8
+
+
+def _align(address, alignment):
+    return address + (-address) % alignment
+
+
+def _tag_alignment(tag):
+    c = tag[0]
+    if c in "nb":
+        return 1
+    elif c == "i":
+        return 4
+    elif c in "IfsBAlaOk":
+        return 8
+    elif c == "t":
+        return max((_tag_alignment(element) for element in tag[1]), default=1)
+    elif c == "r":
+        return _tag_alignment(tag[1])
+
+
+def _tag_size(tag):
+    c = tag[0]
+    if c == "n":
+        return 0
+    elif c == "b":
+        return 1
+    elif c == "i":
+        return 4
+    elif c in "If":
+        return 8
+    elif c in "sBA":
+        return 16
+    elif c == "l":
+        return _POINTER_SIZE
+    elif c == "t":
+        size = 0
+        for element in tag[1]:
+            size = _align(size, _tag_alignment(element)) + _tag_size(element)
+        return _align(size, _tag_alignment(tag))
+    elif c == "a":
+        return _align(_POINTER_SIZE + 4*tag[1], _POINTER_SIZE)
+    elif c == "r":
+        return 3*_tag_size(tag[1])
+
+
+def _read_slice(address):
+    pointer = ctypes.c_void_p.from_address(address).value
+    length = ctypes.c_uint32.from_address(address + _POINTER_SIZE).value
+    return pointer, length
+
+
+def _read_exception_string(address):
+    pointer, length = _read_slice(address)
+    if length == _STRING_KEY_LENGTH:
+        return pointer
+    return ctypes.string_at(pointer, length).decode("utf-8")
+
+
+def _pack_native(out, tag, address):
+    # Serializes the value at address, like send_value in rpc_proto.rs.
+    # Returns the address following the value.
+    c = tag[0]
+    out.append(ord(c))
+    if c == "n":
+        return address
+    elif c == "b":
+        out.append(ctypes.c_uint8.from_address(address).value)
+        return address + 1
+    elif c == "i":
+        address = _align(address, 4)
+        out += ctypes.string_at(address, 4)
+        return address + 4
+    elif c in "If":
+        address = _align(address, 8)
+        out += ctypes.string_at(address, 8)
+        return address + 8
+    elif c in "sBA":
+        address = _align(address, 8)
+        pointer, length = _read_slice(address)
+        out += _uint32.pack(length)
+        if length:
+            out += ctypes.string_at(pointer, length)
+        return address + 16
+    elif c == "t":
+        out.append(len(tag[1]))
+        for element in tag[1]:
+            address = _pack_native(out, element, address)
+        return address
+    elif c == "l":
+        address = _align(address, _POINTER_SIZE)
+        pointer = ctypes.c_void_p.from_address(address).value
+        elements, length = _read_slice(pointer)
+        _pack_native_elements(out, tag[1], elements, length)
+        return address + _POINTER_SIZE
+    elif c == "a":
+        _, num_dims, element = tag
+        out.append(num_dims)
+        address = _align(address, _POINTER_SIZE)
+        elements = ctypes.c_void_p.from_address(address).value
+        address += _POINTER_SIZE
+        shape = ctypes.string_at(address, 4*num_dims)
+        address += 4*num_dims
+        length = 1
+        for (dimension,) in struct.iter_unpack("<L", shape):
+            length *= dimension
+        out += shape
+        out.append(ord(element[0]))
+        _pack_native_elements(out, element, elements, length, False)
+        return address
+    elif c == "r":
+        for _ in range(3):
+            address = _pack_native(out, tag[1], address)
+        return address
+    elif c == "k":
+        address = _align(address, 8)
+        pointer, length = _read_slice(address)
+        out += _uint32.pack(length)
+        out += ctypes.string_at(pointer, length)
+        return _pack_native(out, tag[1], address + 16)
+    elif c == "O":
+        address = _align(address, _POINTER_SIZE)
+        pointer = ctypes.c_void_p.from_address(address).value
+        out += ctypes.string_at(pointer, 4)
+        return address + _POINTER_SIZE
+
+
+def _pack_native_elements(out, element, address, length, with_length=True):
+    if with_length:
+        out += _uint32.pack(length)
+        out.append(ord(element[0]))
+    dtype = _bulk_dtypes.get(element[0])
+    if dtype is not None:
+        if length:
+            out += ctypes.string_at(address, dtype.itemsize*length)
+    else:
+        for _ in range(length):
+            address = _pack_native(out, element, address)
+
+
+def _store_native(tag, value, address):
+    # Stores a value received from the host at address, like recv_value in
+    # rpc_proto.rs. This is a generator that yields the number of bytes to
+    # allocate for variable-length data, and receives the address of the
+    # allocated memory. Returns the address following the value.
+    c = tag[0]
+    if c == "n":
+        return address
+    elif c == "b":
+        ctypes.c_uint8.from_address(address).value = 1 if value else 0
+        return address + 1
+    elif c == "i":
+        address = _align(address, 4)
+        ctypes.c_int32.from_address(address).value = value
+        return address + 4
+    elif c == "I":
+        address = _align(address, 8)
+        ctypes.c_int64.from_address(address).value = value
+        return address + 8
+    elif c == "f":
+        address = _align(address, 8)
+        ctypes.c_double.from_address(address).value = value
+        return address + 8
+    elif c in "sBA":
+        address = _align(address, 8)
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        pointer = yield len(value) + 1
+        ctypes.memmove(pointer, bytes(value), len(value))
+        ctypes.c_void_p.from_address(address).value = pointer
+        ctypes.c_uint32.from_address(address + _POINTER_SIZE).value = \
+            len(value)
+        return address + 16
+    elif c == "t":
+        address = _align(address, _tag_alignment(tag))
+        for element, element_value in zip(tag[1], value):
+            address = yield from _store_native(element, element_value, address)
+        return address
+    elif c == "l":
+        address = _align(address, _POINTER_SIZE)
+        element = tag[1]
+        length = len(value)
+        # Allocations are only aligned to 4 bytes, see
+        # LLVMIRGenerator._build_rpc.
+        memory = yield 16 + _tag_size(element)*length + 8
+        header = _align(memory, 8)
+        elements = _align(header + 16, _tag_alignment(element))
+        ctypes.c_void_p.from_address(header).value = elements
+        ctypes.c_uint32.from_address(header + _POINTER_SIZE).value = length
+        ctypes.c_void_p.from_address(address).value = header
+        yield from _store_native_elements(element, value, elements)
+        return address + _POINTER_SIZE
+    elif c == "a":
+        _, num_dims, element = tag
+        address = _align(address, _POINTER_SIZE)
+        value = numpy.asarray(value)
+        memory = yield _tag_size(element)*value.size + 8
+        elements = _align(memory, _tag_alignment(element))
+        ctypes.c_void_p.from_address(address).value = elements
+        address += _POINTER_SIZE
+        for dimension in value.shape:
+            ctypes.c_uint32.from_address(address).value = dimension
+            address += 4
+        yield from _store_native_elements(element, value.reshape((-1,)),
+                                          elements)
+        return address
+    elif c == "r":
+        address = _align(address, _tag_alignment(tag))
+        for element_value in value:
+            address = yield from _store_native(tag[1], element_value, address)
+        return address
+    else:
+        raise ValueError("Unexpected RPC return tag: {}".format(repr(c)))
+
+
+def _store_native_elements(element, value, address):
+    dtype = _bulk_dtypes.get(element[0])
+    if dtype is not None:
+        data = numpy.asarray(value, dtype).tobytes()
+        ctypes.memmove(address, data, len(data))
+    else:
+        for element_value in value:
+            address = yield from _store_native(element, element_value,
+                                               address)
+
+
+def _elf_sections(library):
+    """Returns the sections of a 64-bit little-endian ELF relocatable object
+    as ``(name, type, offset, size, link, entsize)`` tuples."""
+    if library[:4] != b"\x7fELF" or library[4] != 2 or library[5] != 1:
+        raise ValueError("Not a 64-bit little-endian ELF object; "
+                         "the kernel must be compiled for the native target")
+    (shoff,) = struct.unpack_from("<Q", library, 0x28)
+    shentsize, shnum, shstrndx = struct.unpack_from("<HHH", library, 0x3a)
+    headers = [struct.unpack_from("<LLQQQQLLQQ", library, shoff + i*shentsize)
+               for i in range(shnum)]
+    names = headers[shstrndx][4]
+    sections = []
+    for name, sh_type, _, _, offset, size, link, _, _, entsize in headers:
+        start = names + name
+        name = library[start:library.index(b"\x00", start)].decode()
+        sections.append((name, sh_type, offset, size, link, entsize))
+    return sections
+
+
+def _undefined_symbols(library):
+    """Returns the names of the undefined symbols of a 64-bit little-endian
+    ELF relocatable object."""
+    sections = _elf_sections(library)
+    symbols = []
+    for _, sh_type, offset, size, link, entsize in sections:
+        if sh_type != 2:  # SHT_SYMTAB
+            continue
+        strtab = sections[link][2]
+        for entry in range(offset + entsize, offset + size, entsize):
+            name, _, _, shndx = struct.unpack_from("<LBBH", library, entry)
+            if shndx == 0 and name:  # SHN_UNDEF
+                start = strtab + name
+                symbols.append(
+                    library[start:library.index(b"\x00", start)].decode())
+    return symbols
+
+
+def _read_uleb128(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def _has_landing_pads(library):
+    """Returns whether a function of a 64-bit little-endian ELF relocatable
+    object has a landing pad, i.e. catches exceptions (``try`` and ``with``
+    statements).
+
+    The call site tables of the language-specific data areas emitted by LLVM
+    are parsed; every function has one, even without landing pads."""
+    for name, _, offset, size, _, _ in _elf_sections(library):
+        if name != ".gcc_except_table":
+            continue
+        data = library[offset:offset + size]
+        pos = 0
+        while pos < len(data):
+            if data[pos] != 0xff:  # LPStart
+                # Alignment padding between the areas, or an encoding LLVM
+                # does not emit.
+                if data[pos] == 0:
+                    pos += 1
+                    continue
+                return True
+            ttype_encoding = data[pos + 1]
+            pos += 2
+            end = None
+            if ttype_encoding != 0xff:
+                ttype_offset, pos = _read_uleb128(data, pos)
+                end = pos + ttype_offset
+            call_site_encoding = data[pos]
+            table_length, pos = _read_uleb128(data, pos + 1)
+            table_end = pos + table_length
+            while pos < table_end:
+                if call_site_encoding == 0x01:  # DW_EH_PE_uleb128
+                    _, pos = _read_uleb128(data, pos)
+                    _, pos = _read_uleb128(data, pos)
+                    landing_pad, pos = _read_uleb128(data, pos)
+                elif call_site_encoding == 0x03:  # DW_EH_PE_udata4
+                    _, _, landing_pad = struct.unpack_from("<LLL", data, pos)
+                    pos += 12
+                else:
+                    return True
+                _, pos = _read_uleb128(data, pos)
+                if landing_pad:
+                    return True
+            # Without landing pads, there are no actions nor types.
+            pos = table_end if end is None else end
+    return False
+
+
+# The JIT resolves symbols process-wide, so the syscalls and `now` are shared
+# by all native kernels, which run one at a time.
+_native_lock = threading.Lock()
+_native_kernel = None
+_native_now = (ctypes.c_uint32*2)()
+_native_syscalls = None
+
+# A native kernel terminated by an exception cannot be unwound. Kernels are
+# called by a trampoline that calls setjmp, and syscalls through stubs that
+# call the Python callbacks; when a callback has terminated the kernel (and
+# set _native_abort), its stub returns to the trampoline with longjmp. This
+# only skips the frames of the kernel, not those of the Python interpreter,
+# as the callback has returned.
+_native_abort = ctypes.c_uint8()
+_native_jmp_buf = (ctypes.c_uint64*64)()
+_native_run = None
+_native_stubs = None
+
+
+def _syscall(restype, *argtypes):
+    def wrap(function):
+        default = None if restype is None else restype().value
+
+        def wrapper(*args):
+            kernel = _native_kernel
+            try:
+                return function(kernel, *args)
+            except KernelError as error:
+                kernel.terminate(error.exceptions)
+            except Exception as error:
+                logger.error("syscall %s failed", function.__name__,
+                             exc_info=True)
+                kernel.terminate([_exception(EXCEPTION_RUNTIME_ERROR,
+                                             str(error), (),
+                                             function.__name__)])
+            # The kernel was terminated: the stub ignores this value and
+            # returns to the trampoline.
+            return default
+        wrapper.__name__ = function.__name__
+        wrapper.prototype = ctypes.CFUNCTYPE(restype, *argtypes)
+        return wrapper
+    return wrap
+
+
+@_syscall(None)
+def rtio_init(kernel):
+    kernel.context.rtio_init()
+
+
+@_syscall(ctypes.c_bool, ctypes.c_int32)
+def rtio_get_destination_status(kernel, linkno):
+    return True
+
+
+@_syscall(ctypes.c_int64)
+def rtio_get_counter(kernel):
+    return kernel.context.rtio_get_counter()
+
+
+@_syscall(None, ctypes.c_int32, ctypes.c_int32)
+def rtio_output(kernel, target, data):
+    kernel.context.rtio_output(kernel.now(), target, data)
+
+
+@_syscall(None, ctypes.c_int32, ctypes.c_void_p)
+def rtio_output_wide(kernel, target, data):
+    elements, length = _read_slice(data)
+    words = numpy.frombuffer(ctypes.string_at(elements, 4*length), "<i4")
+    kernel.context.rtio_output_wide(kernel.now(), target, words.tolist())
+
+
+@_syscall(ctypes.c_int64, ctypes.c_int64, ctypes.c_int32)
+def rtio_input_timestamp(kernel, timeout_mu, channel):
+    # RTIO inputs are not modeled: every input channel times out.
+    return -1
+
+
+@_syscall(ctypes.c_int32, ctypes.c_int32)
+def rtio_input_data(kernel, channel):
+    raise KernelError([_exception(EXCEPTION_RUNTIME_ERROR,
+                                  "RTIO input is not emulated", (),
+                                  "rtio_input_data")])
+
+
+@_syscall(None, ctypes.c_uint32, ctypes.c_void_p, ctypes.c_void_p)
+def rpc_send(kernel, service, tag, data):
+    kernel.send_rpc(False, service, tag, data)
+
+
+@_syscall(None, ctypes.c_uint32, ctypes.c_void_p, ctypes.c_void_p)
+def rpc_send_async(kernel, service, tag, data):
+    kernel.send_rpc(True, service, tag, data)
+
+
+@_syscall(ctypes.c_int32, ctypes.c_void_p)
+def rpc_recv(kernel, slot):
+    return kernel.receive_rpc(slot)
+
+
+@_syscall(None, ctypes.c_void_p)
+def __artiq_raise(kernel, exception):
+    raise KernelError([{
+        "id": ctypes.c_uint32.from_address(exception).value,
+        "file": _read_exception_string(exception + 8),
+        "line": ctypes.c_uint32.from_address(exception + 24).value,
+        "column": ctypes.c_uint32.from_address(exception + 28).value,
+        "function": _read_exception_string(exception + 32),
+        "message": _read_exception_string(exception + 48),
+        "params": list(struct.unpack("<3q",
+                                     ctypes.string_at(exception + 64, 24))),
+    }])
+
+
+@_syscall(None)
+def __artiq_resume(kernel):
+    raise RuntimeError("exception resumption is not supported")
+
+
+@_syscall(None)
+def __artiq_end_catch(kernel):
+    pass
+
+
+@_syscall(ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_uint64,
+          ctypes.c_void_p, ctypes.c_void_p)
+def __artiq_personality(kernel, version, actions, exception_class,
+                        exception, context):
+    return 8  # _URC_CONTINUE_UNWIND
+
+
+def _native_type(ir, ctype):
+    if ctype is None:
+        return ir.VoidType()
+    if ctype is ctypes.c_bool:
+        return ir.IntType(1)
+    if ctype is ctypes.c_void_p:
+        return ir.IntType(8).as_pointer()
+    return ir.IntType(8*ctypes.sizeof(ctype))
+
+
+def _compile_native_stubs(llvm, callbacks):
+    # Returns the engine holding the trampoline and the syscall stubs
+    # (see _native_abort).
+    from llvmlite import ir
+
+    address = lambda obj, ty: \
+        ir.Constant(ir.IntType(64), ctypes.addressof(obj)).inttoptr(ty)
+    i8p = ir.IntType(8).as_pointer()
+    i32 = ir.IntType(32)
+    module = ir.Module("native_stubs")
+    module.triple = llvm.get_default_triple()
+    setjmp = ir.Function(module, ir.FunctionType(i32, [i8p]), "_setjmp")
+    setjmp.attributes.add("returns_twice")
+    longjmp = ir.Function(module, ir.FunctionType(ir.VoidType(), [i8p, i32]),
+                          "longjmp")
+    longjmp.attributes.add("noreturn")
+    jmp_buf = address(_native_jmp_buf, i8p)
+    abort = address(_native_abort, i8p)
+
+    entry_type = ir.FunctionType(ir.VoidType(), [])
+    run = ir.Function(module, ir.FunctionType(i32, [entry_type.as_pointer()]),
+                      "run")
+    builder = ir.IRBuilder(run.append_basic_block())
+    call_block = run.append_basic_block()
+    abort_block = run.append_basic_block()
+    builder.cbranch(builder.icmp_signed(
+        "==", builder.call(setjmp, [jmp_buf]), i32(0)),
+        call_block, abort_block)
+    builder.position_at_end(call_block)
+    builder.call(run.args[0], [])
+    builder.ret(i32(0))
+    builder.position_at_end(abort_block)
+    builder.ret(i32(1))
+
+    for name, callback in callbacks.items():
+        prototype = type(callback)
+        function_type = ir.FunctionType(
+            _native_type(ir, prototype._restype_),
+            [_native_type(ir, ctype) for ctype in prototype._argtypes_])
+        stub = ir.Function(module, function_type, "stub." + name)
+        builder = ir.IRBuilder(stub.append_basic_block())
+        abort_block = stub.append_basic_block()
+        return_block = stub.append_basic_block()
+        target = builder.inttoptr(
+            ir.IntType(64)(ctypes.cast(callback, ctypes.c_void_p).value),
+            function_type.as_pointer())
+        result = builder.call(target, stub.args)
+        builder.cbranch(builder.icmp_unsigned(
+            "!=", builder.load(abort), ir.IntType(8)(0)),
+            abort_block, return_block)
+        builder.position_at_end(abort_block)
+        builder.call(longjmp, [jmp_buf, i32(1)])
+        builder.unreachable()
+        builder.position_at_end(return_block)
+        if prototype._restype_ is None:
+            builder.ret_void()
+        else:
+            builder.ret(result)
+
+    target_machine = llvm.Target.from_default_triple().create_target_machine()
+    engine = llvm.create_mcjit_compiler(llvm.parse_assembly(str(module)),
+                                        target_machine)
+    engine.finalize_object()
+    return engine
+
+
+def _register_syscalls():
+    global _native_syscalls, _native_stubs, _native_run
+    if _native_syscalls is not None:
+        return
+    from llvmlite import binding as llvm
+
+    llvm.initialize_native_target()
+    llvm.initialize_native_asmprinter()
+    callbacks = OrderedDict()
+    for syscall in (rtio_init, rtio_get_destination_status, rtio_get_counter,
+                    rtio_output, rtio_output_wide, rtio_input_timestamp,
+                    rtio_input_data, rpc_send, rpc_send_async, rpc_recv,
+                    __artiq_raise, __artiq_resume, __artiq_end_catch,
+                    __artiq_personality):
+        # Keep a reference to the callback, which must outlive the JIT.
+        callbacks[syscall.__name__] = syscall.prototype(syscall)
+    _native_stubs = _compile_native_stubs(llvm, callbacks)
+    for name in callbacks:
+        llvm.add_symbol(name,
+                        _native_stubs.get_function_address("stub." + name))
+    _native_run = ctypes.CFUNCTYPE(ctypes.c_int32, ctypes.c_void_p)(
+        _native_stubs.get_function_address("run"))
+    llvm.add_symbol("now", ctypes.addressof(_native_now))
+    syscalls = dict(callbacks)
+    syscalls["now"] = _native_now
+    _native_syscalls = syscalls
+
+
+class _NativeKernel:
+    def __init__(self, engine, entry, typeinfo):
+        self.engine = engine
+        self.entry = entry
+        self.typeinfo = typeinfo
+        self.context = None
+        self._recv = None
+        self._error = None
+
+    def now(self):
+        value = (_native_now[0] << 32) | _native_now[1]
+        return value - (1 << 64) if value >= (1 << 63) else value
+
+    def send_rpc(self, is_async, service, tag, data):
+        pointer, length = _read_slice(tag)
+        arg_tags, return_tags = _split_tag(ctypes.string_at(pointer, length))
+        message = bytearray()
+        message.append(1 if is_async else 0)
+        message += _uint32.pack(service)
+        for index, arg_tag in enumerate(arg_tags):
+            address = ctypes.c_void_p.from_address(
+                data + index*_POINTER_SIZE).value
+            _pack_native(message, arg_tag, address)
+        message.append(0)
+        message += _uint32.pack(len(return_tags))
+        message += return_tags
+        self.context.send_rpc(message, is_async)
+
+    def receive_rpc(self, slot):
+        if self._recv is None:
+            tag, value = self.context.receive_rpc_reply()
+            self._recv = _store_native(tag, value, slot)
+            request = None
+        else:
+            request = slot
+        try:
+            return self._recv.send(request)
+        except StopIteration:
+            self._recv = None
+            return 0
+
+    def attribute_writeback(self):
+        # See attribute_writeback in ksupport/lib.rs.
+        if not self.typeinfo:
+            return
+        read_pointer = lambda address: \
+            ctypes.c_void_p.from_address(address).value
+        types = self.typeinfo
+        while read_pointer(types):
+            type_info = read_pointer(types)
+            types += _POINTER_SIZE
+            objects = read_pointer(type_info + _POINTER_SIZE)
+            while read_pointer(objects):
+                obj = ctypes.c_void_p(read_pointer(objects))
+                objects += _POINTER_SIZE
+                attributes = read_pointer(type_info)
+                while read_pointer(attributes):
+                    attribute = read_pointer(attributes)
+                    attributes += _POINTER_SIZE
+                    if _read_slice(attribute + 8)[1] == 0:
+                        continue
+                    offset = ctypes.c_int32.from_address(attribute).value
+                    args = (ctypes.c_void_p*3)(
+                        ctypes.addressof(obj), attribute + 24,
+                        obj.value + offset)
+                    self.send_rpc(True, 0, attribute + 8,
+                                  ctypes.addressof(args))
+
+    def terminate(self, exceptions):
+        # Called by a syscall; its stub then returns to the trampoline in
+        # run().
+        self._error = KernelError(exceptions)
+        _native_abort.value = 1
+
+    def run(self, context):
+        global _native_kernel
+        with _native_lock:
+            self.context = context
+            self._recv = None
+            self._error = None
+            _native_abort.value = 0
+            _native_kernel = self
+            try:
+                if _native_run(self.entry):
+                    raise self._error
+                self.attribute_writeback()
+            finally:
+                _native_kernel = None
+
+
+class NativeExecutor:
+    """Runs kernels compiled for
+    :class:`artiq.compiler.targets.NativeTarget`.
+
+    Kernel libraries are relocatable objects; they are loaded with the
+    LLVM MCJIT and linked against the emulated syscalls (RPC, RTIO output
+    and input, and exception raising) and the C library of the host.
+    """
+    def __init__(self):
+        from llvmlite import binding as llvm
+
+        _register_syscalls()
+        self.llvm = llvm
+        self.target = llvm.Target.from_default_triple()
+
+    def load(self, library):
+        llvm = self.llvm
+        library = bytes(library)
+        undefined = _undefined_symbols(library)
+
+        # The engine owns its target machine, and frees it when it is closed.
+        engine = llvm.create_mcjit_compiler(
+            llvm.parse_assembly(""), self.target.create_target_machine())
+        unresolved = [name for name in undefined
+                      if name not in _native_syscalls
+                      and llvm.address_of_symbol(name) is None]
+        if unresolved:
+            raise ValueError("Kernel uses unsupported symbols: {}".format(
+                ", ".join(sorted(unresolved))))
+        if _has_landing_pads(library):
+            raise ValueError("Kernel catches exceptions (try or with "
+                             "statement), which native kernels cannot do")
+        engine.add_object_file(llvm.ObjectFileRef.from_data(library))
+        engine.finalize_object()
+
+        entry = engine.get_function_address("__modinit__")
+        if not entry:
+            raise ValueError("Kernel has no __modinit__ function")
+        typeinfo = engine.get_global_value_address("typeinfo")
+        return _NativeKernel(engine, entry, typeinfo)
+
+
+#
+# Session
+#
+
+class _Session:
+    def __init__(self, emulator, sock):
+        self.emulator = emulator
+        self.socket = sock
+        self.read_buffer = bytearray()
+        self.write_buffer = bytearray()
+        self.kernel = None
+
+    def _read(self, length):
+        while len(self.read_buffer) < length:
+            data = self.socket.recv(65536)
+            if not data:
+                raise ConnectionResetError("Host closed the connection")
+            self.read_buffer += data
+        result = self.read_buffer[:length]
+        del self.read_buffer[:length]
+        return result
+
+    def _read_header(self):
+        sync_count = 0
+        while sync_count < 4:
+            if self._read(1)[0] == 0x5a:
+                sync_count += 1
+            else:
+                sync_count = 0
+        return Request(self._read(1)[0])
+
+    def _read_int32(self):
+        return _int32.unpack(self._read(4))[0]
+
+    def _read_bytes(self):
+        return bytes(self._read(_uint32.unpack(self._read(4))[0]))
+
+    def _read_value(self, tag):
+        c = tag[0]
+        if c == "n":
+            return None
+        elif c == "b":
+            return bool(self._read(1)[0])
+        elif c == "i":
+            return self._read_int32()
+        elif c == "I":
+            return _int64.unpack(self._read(8))[0]
+        elif c == "f":
+            return _float64.unpack(self._read(8))[0]
+        elif c == "s":
+            return self._read_bytes().decode("utf-8")
+        elif c == "B":
+            return self._read_bytes()
+        elif c == "A":
+            return bytearray(self._read_bytes())
+        elif c == "t":
+            return tuple(self._read_value(element) for element in tag[1])
+        elif c == "l":
+            return self._read_elements(tag[1], self._read_int32())
+        elif c == "a":
+            _, num_dims, element = tag
+            shape = [self._read_int32() for _ in range(num_dims)]
+            elements = self._read_elements(element, int(numpy.prod(shape)))
+            return numpy.array(elements).reshape(shape)
+        elif c == "r":
+            return tuple(self._read_value(tag[1]) for _ in range(3))
+        else:
+            raise IOError("Unexpected RPC return tag: {}".format(repr(c)))
+
+    def _read_elements(self, element, length):
+        dtype = _bulk_dtypes.get(element[0])
+        if dtype is not None:
+            return numpy.frombuffer(self._read(dtype.itemsize*length), dtype)
+        return [self._read_value(element) for _ in range(length)]
+
+    def _write(self, data):
+        self.write_buffer += data
+        if len(self.write_buffer) > 4096:
+            self._flush()
+
+    def _flush(self):
+        self.socket.sendall(self.write_buffer)
+        self.write_buffer.clear()
+
+    def _write_header(self, ty):
+        self._write(_header.pack(0x5a5a5a5a, ty.value))
+
+    def _write_int32(self, value):
+        self._write(_int32.pack(value))
+
+    def _write_string(self, value):
+        value = value.encode("utf-8")
+        self._write(_uint32.pack(len(value)))
+        self._write(value)
+
+    def _write_exception_string(self, value):
+        if isinstance(value, str):
+            self._write_string(value)
+        else:
+            self._write(_uint32.pack(_STRING_KEY_LENGTH))
+            self._write(_uint32.pack(value))
+
+    def serve(self):
+        if self._read(14) != b"ARTIQ coredev\n":
+            raise IOError("Incorrect magic")
+        self.socket.sendall(b"e")
+        while True:
+            ty = self._read_header()
+            logger.debug("received request: %r", ty)
+            if ty == Request.SystemInfo:
+                self._write_header(Reply.SystemInfo)
+                self._write(b"AROR")
+                self._write_string(
+                    "{};emulator;kernel_cache;dma_upload".format(
+                        software_version))
+                self._write(b"\x01")
+            elif ty == Request.LoadKernel:
+                self._load(self._read_bytes())
+            elif ty == Request.LoadKernelCaching:
+                digest = self._read_bytes()
+                self._load(self._read_bytes(), digest)
+            elif ty == Request.LoadCachedKernel:
+                digest = self._read_bytes()
+                library = self.emulator.cached_kernel(digest)
+                if library is None:
+                    self.kernel = None
+                    self._write_header(Reply.KernelNotCached)
+                else:
+                    self._load(library)
+            elif ty == Request.CacheKernel:
+                digest = self._read_bytes()
+                self.emulator.cache_kernel(digest, self._read_bytes())
+            elif ty == Request.DMAUpload:
+                name = self._read_bytes().decode("utf-8")
+                duration = _int64.unpack(self._read(8))[0]
+                self.emulator.dma_traces[name] = (self._read_bytes(), duration)
+            elif ty == Request.RunKernel:
+                if self.kernel is None:
+                    self._write_header(Reply.KernelStartupFailed)
+                else:
+                    self._run(self.kernel)
+                    self.kernel = None
+            else:
+                raise IOError("Unexpected request: {}".format(ty))
+            self._flush()
+
+    def _load(self, library, digest=None):
+        try:
+            self.kernel = self.emulator.executor.load(library)
+        except Exception as error:
+            logger.debug("kernel load failed", exc_info=True)
+            self.kernel = None
+            self._write_header(Reply.LoadFailed)
+            self._write_string(str(error))
+            return
+        if digest is not None:
+            self.emulator.cache_kernel(digest, library)
+        self._write_header(Reply.LoadCompleted)
+
+    def _run(self, kernel):
+        emulator = self.emulator
+        sed = emulator.sed
+        errors_before = (sed.collisions, sed.sequence_errors)
+        context = KernelContext(sed)
+        threading.Thread(target=context.run, args=(kernel,),
+                         daemon=True).start()
+        emulator.kernels_run += 1
+        while True:
+            message = context._to_session.get()
+            if message[0] == "rpc":
+                _, payload, is_async = message
+                emulator.rpc_count += 1
+                self._write_header(Reply.RPCRequest)
+                self._write(payload)
+                if not is_async:
+                    self._flush()
+                    try:
+                        self._serve_rpc_reply(context)
+                    except:
+                        # Terminate the kernel, which waits for the reply.
+                        context._to_kernel.put(("exception", _exception(
+                            EXCEPTION_RUNTIME_ERROR, "session aborted")))
+                        raise
+            else:
+                break
+
+        # Busy errors cannot occur, as there are no RTIO PHYs.
+        async_errors = 0
+        if sed.collisions != errors_before[0]:
+            async_errors |= 1 << 0
+        if sed.sequence_errors != errors_before[1]:
+            async_errors |= 1 << 2
+
+        if message[0] == "finished":
+            self._write_header(Reply.KernelFinished)
+        else:
+            exceptions = message[1]
+            self._write_header(Reply.KernelException)
+            self._write_int32(len(exceptions))
+            for exception in exceptions:
+                self._write_int32(exception["id"])
+                self._write_exception_string(exception["message"])
+                for param in exception["params"]:
+                    self._write(_int64.pack(param))
+                self._write_exception_string(exception["file"])
+                self._write_int32(exception["line"])
+                self._write_int32(exception["column"])
+                self._write_exception_string(exception["function"])
+            # Stack pointers and backtraces are not available.
+            for exception in exceptions:
+                self._write(bytes(12))
+            self._write_int32(0)
+        self._write(bytes([async_errors]))
+        emulator.kernel_finished()
+
+    def _serve_rpc_reply(self, context):
+        while True:
+            ty = self._read_header()
+            if ty == Request.CacheKernel:
+                digest = self._read_bytes()
+                self.emulator.cache_kernel(digest, self._read_bytes())
+            elif ty == Request.RPCReply:
+                (tag,) = _parse_tags(self._read_bytes())
+                context._to_kernel.put(("reply", (tag, self._read_value(tag))))
+                return
+            elif ty == Request.RPCException:
+                name, message = self._read_int32(), self._read_int32()
+                params = [_int64.unpack(self._read(8))[0] for _ in range(3)]
+                filename = self._read_int32()
+                line, column = self._read_int32(), self._read_int32()
+                function = self._read_int32()
+                context._to_kernel.put(("exception", {
+                    "id": name, "message": message, "params": params,
+                    "file": filename, "line": line, "column": column,
+                    "function": function
+                }))
+                return
+            else:
+                raise IOError("Unexpected request during RPC: {}".format(ty))
+
+
+class CoreEmulator:
+    """TCP server emulating a core device.
+
+    Connections are served one at a time, as by the runtime.
+
+    :param executor: object with a ``load(library)`` method that returns a
+        kernel, i.e. an object with a ``run(context)`` method taking a
+        :class:`KernelContext`. Raising an exception in ``load`` results in a
+        load failure. Defaults to a :class:`NativeExecutor`.
+    :param sed: the :class:`artiq.sim.rtio.SED` model receiving the RTIO
+        writes of all kernels. By default, a model where each write advances
+        the RTIO counter by ``write_cost`` machine units.
+    :param kernel_cache_size: number of kernel libraries kept in the cache.
+    :param on_kernel_finished: called with the emulator after each kernel
+        has finished or raised an exception.
+    """
+    def __init__(self, executor=None, host="127.0.0.1", port=1381, sed=None,
+                 write_cost=0, kernel_cache_size=4, on_kernel_finished=None):
+        if executor is None:
+            executor = NativeExecutor()
+        if sed is None:
+            sed = SED(write_cost=write_cost)
+        self.executor = executor
+        self.host = host
+        self.port = port
+        self.sed = sed
+        self.kernel_cache_size = kernel_cache_size
+        self.on_kernel_finished = on_kernel_finished
+
+        self.kernel_cache = OrderedDict()
+        # DMA traces uploaded by the host: name -> (trace, duration)
+        self.dma_traces = dict()
+        self.kernels_run = 0
+        self.rpc_count = 0
+
+    def cached_kernel(self, digest):
+        library = self.kernel_cache.get(digest)
+        if library is not None:
+            self.kernel_cache.move_to_end(digest)
+        return library
+
+    def cache_kernel(self, digest, library):
+        self.kernel_cache[digest] = library
+        self.kernel_cache.move_to_end(digest)
+        while len(self.kernel_cache) > self.kernel_cache_size:
+            self.kernel_cache.popitem(last=False)
+
+    def kernel_finished(self):
+        if self.on_kernel_finished is not None:
+            self.on_kernel_finished(self)
+
+    def start(self):
+        """Starts listening and serving connections in a thread. If the port
+        is 0, :attr:`port` is set to the port chosen by the system."""
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((self.host, self.port))
+        self.server_socket.listen(1)
+        self.port = self.server_socket.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve_forever,
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Shutting down the socket wakes up the thread waiting in accept().
+        try:
+            self.server_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server_socket.close()
+        self.thread.join()
+
+    def _serve_forever(self):
+        while True:
+            try:
+                sock, address = self.server_socket.accept()
+            except OSError:
+                return
+            logger.info("new connection from %s", address)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            try:
+                _Session(self, sock).serve()
+            except ConnectionError:
+                logger.info("connection closed")
+            except Exception:
+                logger.error("session aborted", exc_info=True)
+            finally:
+                sock.close()
@@ -1,8 +1,8 @@
 from random import Random
 import numpy
 
-from artiq.language.core import delay, at_mu, kernel
-from artiq.sim import time
+from artiq.language.core import delay, delay_mu, at_mu, now_mu, kernel
+from artiq.sim import time, rtio
 
 
 class Core:
@@ -105,3 +105,207 @@ class VoltageOutput:
     @kernel
     def set(self, value):
         time.manager.event(("set_voltage", self.name, value))
+
+
+class RTIOCore(Core):
+    """Simulated core device that models the RTIO output path.
+
+    The RTIO writes of the ``TTLOut``, ``TTLInOut`` and ``TTLClockGen``
+    simulated drivers go through an event-level model of the SED (see
+    :class:`artiq.sim.rtio.SED`), whose event log is available as
+    :attr:`sed`. The other keyword arguments are passed to the SED model.
+
+    :param print_timeline: print the timeline when the outermost kernel
+        returns, like :class:`Core`.
+    """
+    def __init__(self, dmgr, ref_period=1e-9, ref_multiplier=8,
+                 print_timeline=True, **kwargs):
+        self.core = self
+        self.ref_period = ref_period
+        self.ref_multiplier = ref_multiplier
+        self.coarse_ref_period = ref_period*ref_multiplier
+        self.print_timeline = print_timeline
+        self._level = 0
+
+        kwargs.setdefault("fine_ts_width", ref_multiplier.bit_length() - 1)
+        self.manager = rtio.Manager(ref_period, **kwargs)
+        self.sed = self.manager.sed
+        rtio.install(self.manager)
+
+    def run(self, k_function, k_args, k_kwargs):
+        self._level += 1
+        try:
+            r = k_function.artiq_embedded.function(*k_args, **k_kwargs)
+        finally:
+            self._level -= 1
+        if self._level == 0 and self.print_timeline:
+            print(self.manager.format_timeline())
+            self.manager.timeline.clear()
+        return r
+
+    @kernel
+    def get_rtio_counter_mu(self):
+        return self.manager.get_rtio_counter_mu()
+
+    @kernel
+    def wait_until_mu(self, cursor_mu):
+        self.sed.counter = max(self.sed.counter, cursor_mu)
+
+    @kernel
+    def reset(self):
+        self.sed.reset_lanes()
+        at_mu(self.sed.counter + 125000)
+
+    @kernel
+    def break_realtime(self):
+        min_now = self.sed.counter + 125000
+        if now_mu() < min_now:
+            at_mu(min_now)
+
+
+def rtio_output(target, data):
+    time.manager.rtio_output(target, data)
+
+
+class TTLOut:
+    """Simulated :class:`artiq.coredevice.ttl.TTLOut`. Requires
+    :class:`RTIOCore`."""
+    def __init__(self, dmgr, channel, core_device="core"):
+        self.core = dmgr.get(core_device)
+        self.channel = channel
+        self.target_o = channel << 8
+
+    @kernel
+    def output(self):
+        pass
+
+    @kernel
+    def set_o(self, o):
+        rtio_output(self.target_o, 1 if o else 0)
+
+    @kernel
+    def on(self):
+        self.set_o(True)
+
+    @kernel
+    def off(self):
+        self.set_o(False)
+
+    @kernel
+    def pulse_mu(self, duration):
+        self.on()
+        delay_mu(duration)
+        self.off()
+
+    @kernel
+    def pulse(self, duration):
+        self.on()
+        delay(duration)
+        self.off()
+
+
+class TTLInOut(TTLOut):
+    """Simulated :class:`artiq.coredevice.ttl.TTLInOut`. Requires
+    :class:`RTIOCore`.
+
+    The output and gating writes are simulated. No input events are ever
+    registered: :meth:`count` returns 0 and :meth:`timestamp_mu` returns -1.
+    """
+    def __init__(self, dmgr, channel, gate_latency_mu=None,
+                 core_device="core"):
+        TTLOut.__init__(self, dmgr, channel, core_device)
+        if gate_latency_mu is None:
+            gate_latency_mu = 13*self.core.ref_multiplier
+        self.gate_latency_mu = gate_latency_mu
+
+        self.target_oe     = (channel << 8) + 1
+        self.target_sens   = (channel << 8) + 2
+        self.target_sample = (channel << 8) + 3
+
+    @kernel
+    def set_oe(self, oe):
+        rtio_output(self.target_oe, 1 if oe else 0)
+
+    @kernel
+    def output(self):
+        self.set_oe(True)
+
+    @kernel
+    def input(self):
+        self.set_oe(False)
+
+    @kernel
+    def _set_sensitivity(self, value):
+        rtio_output(self.target_sens, value)
+
+    @kernel
+    def _gate_mu(self, sensitivity, duration):
+        self._set_sensitivity(sensitivity)
+        delay_mu(duration)
+        self._set_sensitivity(0)
+        return now_mu()
+
+    @kernel
+    def gate_rising_mu(self, duration):
+        return self._gate_mu(1, duration)
+
+    @kernel
+    def gate_falling_mu(self, duration):
+        return self._gate_mu(2, duration)
+
+    @kernel
+    def gate_both_mu(self, duration):
+        return self._gate_mu(3, duration)
+
+    @kernel
+    def gate_rising(self, duration):
+        return self._gate_mu(1, self.core.seconds_to_mu(duration))
+
+    @kernel
+    def gate_falling(self, duration):
+        return self._gate_mu(2, self.core.seconds_to_mu(duration))
+
+    @kernel
+    def gate_both(self, duration):
+        return self._gate_mu(3, self.core.seconds_to_mu(duration))
+
+    @kernel
+    def count(self, up_to_timestamp_mu):
+        return 0
+
+    @kernel
+    def timestamp_mu(self, up_to_timestamp_mu):
+        return -1
+
+    @kernel
+    def sample_input(self):
+        rtio_output(self.target_sample, 0)
+
+
+class TTLClockGen:
+    """Simulated :class:`artiq.coredevice.ttl.TTLClockGen`. Requires
+    :class:`RTIOCore`."""
+    def __init__(self, dmgr, channel, acc_width=24, core_device="core"):
+        self.core = dmgr.get(core_device)
+        self.channel = channel
+        self.target = channel << 8
+
+        self.acc_width = numpy.int64(acc_width)
+
+    def frequency_to_ftw(self, frequency):
+        return round(2**self.acc_width*frequency*self.core.coarse_ref_period)
+
+    def ftw_to_frequency(self, ftw):
+        return ftw/self.core.coarse_ref_period/2**self.acc_width
+
+    @kernel
+    def set_mu(self, frequency):
+        rtio_output(self.target, frequency)
+
+    @kernel
+    def set(self, frequency):
+        self.set_mu(self.frequency_to_ftw(frequency))
+
+    @kernel
+    def stop(self):
+        self.set_mu(0)
@@ -0,0 +1,290 @@
+"""
+Host-side model of the RTIO output path.
+
+:class:`SED` models the scalable event dispatcher (see
+:mod:`artiq.gateware.rtio.sed`) at the event level: lane selection, lane FIFOs
+with limited depth, the CPU stalling on a full lane, underflow and sequence
+errors, and replacements and collisions in the output network. Every write is
+recorded in a compact numpy log.
+
+:class:`Manager` is a time manager for :mod:`artiq.language.core` that keeps
+the timeline in machine units and sends RTIO writes of the simulated drivers
+(:mod:`artiq.sim.devices`) to a :class:`SED` instance.
+"""
+
+from collections import deque
+
+import numpy
+
+from artiq.language.core import set_time_manager
+from artiq.coredevice.exceptions import RTIOUnderflow
+from artiq.sim import time
+
+
+__all__ = ["event_dtype", "EVENT_UNDERFLOW", "EVENT_SEQUENCE_ERROR",
+           "EVENT_COLLISION", "EVENT_REPLACED", "SED", "Manager", "install"]
+
+
+event_dtype = numpy.dtype([
+    ("timestamp", numpy.int64),  # requested timestamp, in machine units
+    ("submitted", numpy.int64),  # RTIO counter when the CPU wrote the event
+    ("channel", numpy.int32),
+    ("address", numpy.int32),
+    ("data", numpy.int64),
+    ("lane", numpy.int16),
+    ("flags", numpy.uint8),
+])
+
+# Values of the ``flags`` field of the event log. An event with a non-zero
+# flag never reached its output PHY.
+EVENT_UNDERFLOW = 1
+EVENT_SEQUENCE_ERROR = 2
+EVENT_COLLISION = 4
+EVENT_REPLACED = 8
+
+
+class SED:
+    """Event-level model of the scalable event dispatcher.
+
+    :param lane_count: number of lanes (FIFOs).
+    :param fifo_depth: depth of each lane FIFO.
+    :param enable_spread: switch to the next lane after the current lane has
+        been full, as in the gateware.
+    :param fine_ts_width: number of fine timestamp bits, i.e. log2 of the
+        RTIO clock multiplier.
+    :param compensation: dictionary mapping channel numbers to their latency
+        compensation, in coarse RTIO cycles.
+    :param replace_channels: channels that support event replacement (e.g.
+        TTL outputs). Simultaneous events on other channels collide.
+    :param write_cost: number of machine units by which the RTIO counter
+        advances for each event written by the CPU.
+    :param underflow_margin: number of coarse RTIO cycles an event must be
+        ahead of the RTIO counter to avoid an underflow.
+    :param raise_underflow: raise :class:`RTIOUnderflow` when an event
+        underflows, as the runtime does. Otherwise, the event is only flagged
+        in the log.
+    """
+    def __init__(self, lane_count=8, fifo_depth=128, enable_spread=True,
+                 fine_ts_width=3, compensation=None, replace_channels=None,
+                 write_cost=0, underflow_margin=0, raise_underflow=True):
+        self.lane_count = lane_count
+        self.fifo_depth = fifo_depth
+        self.enable_spread = enable_spread
+        self.fine_ts_width = fine_ts_width
+        self.compensation = dict() if compensation is None else compensation
+        self.replace_channels = (frozenset() if replace_channels is None
+                                 else frozenset(replace_channels))
+        self.write_cost = write_cost
+        self.underflow_margin = underflow_margin
+        self.raise_underflow = raise_underflow
+
+        self.reset()
+
+    def reset(self):
+        """Clears the lanes, the error counters, the event log and sets the
+        RTIO counter to 0."""
+        self.counter = 0
+        self.stall_time = 0
+        self.underflows = 0
+        self.sequence_errors = 0
+        self.collisions = 0
+        self.replacements = 0
+        # Events are kept as tuples and converted to a numpy array on demand,
+        # which is much cheaper than writing into the array for every event.
+        self._records = []
+        self._flags = dict()
+        self._log = None
+        self.wide_data = dict()
+        self.reset_lanes()
+
+    def reset_lanes(self):
+        """Discards the events that are still in the lanes, as ``rtio_init``
+        does. The RTIO counter and the event log are kept."""
+        # Each lane holds (coarse timestamp, log index) pairs.
+        self._lanes = [deque() for _ in range(self.lane_count)]
+        self._lane_last = [-1]*self.lane_count
+        self._current_lane = 0
+        self._last_coarse = -1
+        self._force_lane_b = False
+        # (channel, coarse timestamp) -> log index of the event that
+        # currently wins the output network
+        self._pending = dict()
+
+    def _append(self, timestamp, channel, address, data, lane, flags):
+        index = len(self._records)
+        self._records.append((timestamp, self.counter, channel, address,
+                              data, lane, 0))
+        if flags:
+            self._flags[index] = flags
+        return index
+
+    def _drain(self):
+        # Events leave their lane when the coarse RTIO counter reaches
+        # their coarse timestamp.
+        now_coarse = self.counter >> self.fine_ts_width
+        pending = self._pending
+        records = self._records
+        for lane in self._lanes:
+            while lane and lane[0][0] <= now_coarse:
+                coarse, index = lane.popleft()
+                key = (records[index][2], coarse)
+                if pending.get(key) == index:
+                    del pending[key]
+
+    def _wait_writable(self, lane):
+        # The CPU polls the wait status bit until the lane has space.
+        head_coarse = self._lanes[lane][0][0]
+        drained_at = head_coarse << self.fine_ts_width
+        if drained_at > self.counter:
+            self.stall_time += drained_at - self.counter
+            self.counter = drained_at
+        self._drain()
+
+    def write(self, timestamp, channel, address, data):
+        """Submits an event, as ``rtio_output`` would.
+
+        :returns: the index of the event in the log.
+        """
+        self.counter += self.write_cost
+
+        coarse = (timestamp >> self.fine_ts_width) + \
+            self.compensation.get(channel, 0)
+        if (coarse - self.underflow_margin) <= \
+                (self.counter >> self.fine_ts_width):
+            self._drain()
+            self.underflows += 1
+            index = self._append(timestamp, channel, address, data, -1,
+                                 EVENT_UNDERFLOW)
+            if self.raise_underflow:
+                raise RTIOUnderflow(
+                    "RTIO underflow at {} mu, channel {}".format(
+                        timestamp, channel))
+            return index
+
+        lane = self._current_lane
+        if self._force_lane_b or coarse <= self._last_coarse:
+            lane = (lane + 1) % self.lane_count
+        self._force_lane_b = False
+        if coarse <= self._lane_last[lane]:
+            self.sequence_errors += 1
+            return self._append(timestamp, channel, address, data, lane,
+                                EVENT_SEQUENCE_ERROR)
+
+        index = self._append(timestamp, channel, address, data, lane, 0)
+        self._current_lane = lane
+        self._last_coarse = coarse
+        self._lane_last[lane] = coarse
+        self._lanes[lane].append((coarse, index))
+        self._output_network(index, channel, coarse)
+
+        if len(self._lanes[lane]) >= self.fifo_depth:
+            self._drain()
+            if len(self._lanes[lane]) >= self.fifo_depth:
+                self._wait_writable(lane)
+                if self.enable_spread:
+                    self._force_lane_b = True
+        return index
+
+    def write_wide(self, timestamp, channel, address, data):
+        """Submits an event with a payload of several 32-bit words, as
+        ``rtio_output_wide`` would. The payload is kept in
+        :attr:`wide_data`, indexed by the position of the event in the log."""
+        index = self.write(timestamp, channel, address,
+                           data[0] if data else 0)
+        self.wide_data[index] = list(data)
+        return index
+
+    def _output_network(self, index, channel, coarse):
+        key = (channel, coarse)
+        other = self._pending.get(key)
+        self._pending[key] = index
+        if other is None:
+            return
+
+        # The event with the highest sequence number (the last written)
+        # wins. Only its data may differ from the replaced event.
+        winner, loser = self._records[index], self._records[other]
+        self.replacements += 1
+        self._flags[other] = self._flags.get(other, 0) | EVENT_REPLACED
+        if (channel not in self.replace_channels
+                or winner[0] != loser[0] or winner[3] != loser[3]):
+            self.collisions += 1
+            self._flags[index] = self._flags.get(index, 0) | EVENT_COLLISION
+
+    def events(self):
+        """Returns the event log as a numpy structured array with dtype
+        :data:`event_dtype`, in submission order."""
+        if self._log is None or len(self._log) != len(self._records):
+            self._log = numpy.array(self._records, event_dtype)
+        self._log["flags"] = 0
+        for index, flags in self._flags.items():
+            self._log["flags"][index] = flags
+        return self._log
+
+    def output_events(self):
+        """Returns the events that reached the output PHYs, sorted by
+        timestamp."""
+        events = self.events()
+        events = events[events["flags"] == 0]
+        return events[numpy.argsort(events["timestamp"], kind="stable")]
+
+
+class Manager(time.Manager):
+    """Time manager driving a :class:`SED` model.
+
+    The timeline is kept in machine units. Delays expressed in seconds are
+    converted with ``ref_period``, as on the core device.
+    """
+    def __init__(self, ref_period=1e-9, **kwargs):
+        time.Manager.__init__(self)
+        self.ref_period = ref_period
+        self.sed = SED(**kwargs)
+
+    def exit(self):
+        # Block durations are accumulated in machine units.
+        old_context = self.stack.pop()
+        self.take_time_mu(old_context.block_duration)
+
+    def take_time(self, duration):
+        self.take_time_mu(numpy.int64(duration//self.ref_period))
+
+    def set_time_mu(self, t):
+        # Unlike the plain timeline, going back in time is allowed and is
+        # handled by the SED lanes.
+        self.take_time_mu(t - self.get_time_mu())
+
+    def get_rtio_counter_mu(self):
+        return self.sed.counter
+
+    def rtio_output(self, target, data):
+        self.sed.write(int(self.get_time_mu()), target >> 8, target & 0xff,
+                       data)
+
+    def rtio_output_wide(self, target, data):
+        self.sed.write_wide(int(self.get_time_mu()), target >> 8,
+                            target & 0xff, data)
+
+    def format_timeline(self):
+        r = ""
+        prev_time = 0
+        entries = list(self.timeline)
+        for event in self.sed.events():
+            description = ("rtio", event["channel"], event["address"],
+                           event["data"])
+            if event["flags"]:
+                description += ("flags={}".format(event["flags"]),)
+            entries.append((event["timestamp"], description))
+        for t, description in sorted(entries, key=lambda e: e[0]):
+            r += "@{} (+{}) ".format(t, t-prev_time)
+            for item in description:
+                r += "{:16}".format(str(item))
+            r += "\n"
+            prev_time = t
+        return r
+
+
+def install(manager):
+    """Makes ``manager`` the time manager used by kernels running in the
+    Python interpreter and by the simulated devices."""
+    time.manager = manager
+    set_time_manager(manager)
@@ -1,5 +1,7 @@
 import unittest
+from artiq.compiler import ir
 from artiq.compiler.analyses.domination import DominatorTree, PostDominatorTree
+from artiq.compiler.testbench.perf_cfg import make_function
 
 class MockBasicBlock:
     def __init__(self, name):
@@ -164,3 +166,30 @@ class TestPostDominatorTree(unittest.TestCase):
         self.assertEqual({
             'A': 'D', 'B': 'D', 'C': 'D', 'D': None, 'E': None, 'F': None
         }, idom(func, domtree))
+
+class TestLargeFunction(unittest.TestCase):
+    def test_unrolled(self):
+        # Deep enough to overflow the stack with a recursive traversal.
+        func = make_function(2000)
+        entry, tail = func.basic_blocks[0], func.basic_blocks[-1]
+
+        domtree = DominatorTree(func)
+        self.assertEqual(domtree.immediate_dominator(func.basic_blocks[3]), entry)
+        self.assertEqual(len(list(domtree.dominators(tail))), 2001)
+
+        postdom_tree = PostDominatorTree(func)
+        self.assertEqual(postdom_tree.immediate_dominator(entry), func.basic_blocks[3])
+
+    def test_predecessors_invalidated(self):
+        func = make_function(1)
+        entry, if_true, if_false, tail = func.basic_blocks
+        self.assertEqual(set(tail.predecessors()), {if_true, if_false})
+
+        if_true.terminator().set_target(if_false)
+        self.assertEqual(tail.predecessors(), [if_false])
+        self.assertEqual(set(if_false.predecessors()), {entry, if_true})
+
+        if_true.terminator().erase()
+        self.assertEqual(if_false.predecessors(), [entry])
+        if_true.append(ir.Branch(tail))
+        self.assertEqual(set(tail.predecessors()), {if_true, if_false})
@@ -0,0 +1,53 @@
+import unittest
+
+from pythonparser import ast
+
+from artiq.compiler.profiler import PassProfiler, NullProfiler, typedtree_size
+
+
+class PassProfilerTest(unittest.TestCase):
+    def test_measure(self):
+        profiler = PassProfiler("kernel", track_allocations=True)
+        size = [10]
+        with profiler.measure("Grow", "artiq", size=lambda: size[0]):
+            data = [0]*10000
+            size[0] = 15
+        with profiler.measure("Lower", "llvm", size=lambda: size[0],
+                              output_size=lambda: 3):
+            pass
+        with profiler.measure("Link", "link"):
+            pass
+
+        report = profiler.report()
+        self.assertEqual(report["kernel"], "kernel")
+        self.assertEqual([p["name"] for p in report["passes"]],
+                         ["Grow", "Lower", "Link"])
+        grow, lower, link = report["passes"]
+        self.assertEqual((grow["size_before"], grow["size_after"]), (10, 15))
+        self.assertEqual((lower["size_before"], lower["size_after"]), (15, 3))
+        self.assertEqual((link["size_before"], link["size_after"]),
+                         (None, None))
+        self.assertGreaterEqual(grow["alloc_peak"], 10000*8)
+        self.assertAlmostEqual(report["total_time"],
+                               sum(p["time"] for p in report["passes"]))
+        self.assertIn("Grow", profiler.format_report())
+
+    def test_failed_pass(self):
+        profiler = PassProfiler("kernel", track_allocations=False)
+        with self.assertRaises(ValueError):
+            with profiler.measure("Fail", "frontend", size=lambda: 1):
+                raise ValueError
+        record, = profiler.report()["passes"]
+        self.assertEqual(record["size_before"], 1)
+        self.assertIsNone(record["size_after"])
+        self.assertNotIn("alloc_peak", record)
+
+    def test_null_profiler(self):
+        with NullProfiler().measure("Pass", "artiq", size=lambda: 1) as record:
+            pass
+        self.assertEqual(record, {})
+
+    def test_typedtree_size(self):
+        tree = ast.Module(body=[ast.Pass(), ast.Pass()])
+        self.assertEqual(typedtree_size(tree), 3)
+        self.assertEqual(typedtree_size([tree, ast.Pass()]), 4)
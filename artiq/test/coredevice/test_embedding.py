@@ -554,3 +554,52 @@ class NumpyQuotingTest(ExperimentCase):
     def test_issue_1871(self):
         """Ensure numpy.array() does not break NumPy math functions"""
         self.create(_NumpyQuoting).run()
+
+
+class _DeviceManager:
+    def __init__(self, core):
+        self.core = core
+
+    def get(self, name):
+        return self.core
+
+
+class _Chain:
+    def __init__(self, core):
+        self.core = core
+        self.x = 1.0
+
+    @kernel
+    def first(self):
+        return self.second()
+
+    @kernel
+    def second(self):
+        return self.third()
+
+    @kernel
+    def third(self):
+        return self.x
+
+
+class StitcherTest(unittest.TestCase):
+    def test_fixpoint(self):
+        """Ensure inference iterates until types discovered in later
+        iterations have propagated back to the entry point"""
+        from artiq.compiler import builtins
+        from artiq.compiler.embedding import Stitcher
+        from artiq.coredevice.core import Core
+
+        core = Core(None, None, 1e-9)
+        core.dmgr = _DeviceManager(core)
+        stitcher = Stitcher(core=core, dmgr=core.dmgr)
+        stitcher.stitch_call(_Chain(core).first, (), {})
+        stitcher.finalize()
+
+        self.assertGreater(stitcher.inference_iterations, 2)
+        return_types = [node.signature_type.find().ret
+                        for node in stitcher.typedtree.body
+                        if hasattr(node, "signature_type")]
+        self.assertEqual(len(return_types), 3)
+        for typ in return_types:
+            self.assertTrue(builtins.is_float(typ))
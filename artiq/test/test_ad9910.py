@@ -0,0 +1,66 @@
+import unittest
+
+import numpy as np
+from numpy import int32
+
+from artiq.coredevice.ad9910 import AD9910
+
+
+class _Core:
+    ref_period = 1e-9
+
+
+class _CPLD:
+    refclk = 125e6
+    clk_div = 0
+    core = _Core()
+    bus = None
+
+
+class _DeviceManager:
+    def get(self, name):
+        return _CPLD()
+
+
+class RAMConversionCase(unittest.TestCase):
+    def setUp(self):
+        self.dds = AD9910(_DeviceManager(), 3, "cpld", pll_n=32)
+        rng = np.random.default_rng(0)
+        n = 1024
+        self.frequency = rng.uniform(0, self.dds.sysclk/2*.999, n)
+        self.turns = rng.uniform(-3, 3, n)
+        self.amplitude = rng.uniform(0, 1, n)
+        # round half to even
+        self.frequency[:2] = np.array([.5, 1.5])/self.dds.ftw_per_hz
+        self.turns[:2] = np.array([.5, 2.5])/0x10000
+        self.amplitude[:2] = [.5/0x3fff, 1.]
+
+    def check(self, name, *values):
+        # compare with the portable implementation, as compiled in kernels
+        portable = getattr(AD9910, name).artiq_embedded.function
+        ram_portable = [int32(0)]*len(values[0])
+        portable(self.dds, *[list(v) for v in values], ram_portable)
+        for i in range(2):
+            ram = [int32(0)]*len(values[0])
+            getattr(self.dds, name)(*values, ram)
+            self.assertEqual(ram, ram_portable)
+            self.assertIsInstance(ram[0], int32)
+
+    def test_conversions(self):
+        self.check("frequency_to_ram", self.frequency)
+        self.check("turns_to_ram", self.turns)
+        self.check("amplitude_to_ram", self.amplitude)
+        self.check("turns_amplitude_to_ram", self.turns, self.amplitude)
+        self.assertEqual(len(self.dds.ram_cache), 4)
+
+    def test_array(self):
+        ram = np.zeros(16, dtype=int32)
+        self.dds.amplitude_to_ram(self.amplitude, ram)
+        self.assertEqual(list(ram), [self.dds.amplitude_to_asf(a) << 18
+                                     for a in self.amplitude[:16]])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.dds.amplitude_to_ram([1.1], [int32(0)])
+        with self.assertRaises(OverflowError):
+            self.dds.frequency_to_ram([self.dds.sysclk*.6], [int32(0)])
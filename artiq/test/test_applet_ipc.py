@@ -0,0 +1,88 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+
+from sipyco import pyon
+
+from artiq.gui.applet_ipc import AppletIPCServer
+from artiq.gui.lazy_datasets import LazyDataset
+
+
+class DatasetsSubscriber:
+    def __init__(self):
+        self.notify_cbs = []
+        self.model = None
+
+
+class AppletIPCServerCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "results.h5")
+        with h5py.File(self.filename, "w") as f:
+            f["datasets/x"] = np.arange(1000)
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        self.written = []
+        self.ipc = AppletIPCServer(DatasetsSubscriber())
+        self.ipc.write = self.written.append
+        self.ipc.datasets = {"x", "y", "z"}
+
+    def tearDown(self):
+        self.loop.close()
+        self.tmpdir.cleanup()
+
+    def lazy(self, filename):
+        return LazyDataset(filename, "datasets/x", (1000,), np.dtype(int))
+
+    def mods(self):
+        return [pyon.decode(line.decode())["mod"] for line in self.written]
+
+    async def flush(self):
+        while self.ipc._pending_mods is not None:
+            await asyncio.sleep(0.01)
+
+    def test_plain(self):
+        self.ipc._on_mod({"action": "init",
+                          "struct": {"x": (True, 1), "w": (True, 2)}})
+        self.ipc._on_mod({"action": "setitem", "path": [], "key": "w",
+                          "value": (True, 3)})
+        self.ipc._on_mod({"action": "setitem", "path": [], "key": "y",
+                          "value": (True, 4)})
+        # Mods without lazy values are written immediately.
+        self.assertEqual(self.mods(), [
+            {"action": "init", "struct": {"x": (True, 1)}},
+            {"action": "setitem", "path": [], "key": "y", "value": (True, 4)}
+        ])
+
+    def test_lazy(self):
+        missing = os.path.join(self.tmpdir.name, "missing.h5")
+
+        async def test():
+            self.ipc._on_mod({"action": "init", "struct": {
+                "x": (True, self.lazy(self.filename)),
+                "y": (True, self.lazy(missing))}})
+            self.ipc._on_mod({"action": "setitem", "path": [], "key": "z",
+                              "value": (True, 1)})
+            self.ipc._on_mod({"action": "setitem", "path": [], "key": "y",
+                              "value": (False, self.lazy(missing))})
+            self.assertEqual(self.written, [])
+            await self.flush()
+
+        with self.assertLogs("artiq.gui.applet_ipc", "WARNING") as logs:
+            self.loop.run_until_complete(test())
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn("'y'", logs.output[0])
+
+        # Mods are written in order, and values that cannot be loaded are
+        # replaced with None.
+        init, setitem_z, setitem_y = self.mods()
+        self.assertEqual(init["action"], "init")
+        self.assertEqual(init["struct"]["x"][1].tolist(), list(range(1000)))
+        self.assertEqual(init["struct"]["y"], (True, None))
+        self.assertEqual(setitem_z["value"], (True, 1))
+        self.assertEqual(setitem_y["value"], (False, None))
@@ -0,0 +1,200 @@
+import socket
+import struct
+import threading
+import unittest
+
+from artiq.coredevice.comm_kernel import CommKernel, LoadError
+
+
+class FakeCoreDevice:
+    """Loopback server answering the kernel loading requests of the core
+    device session protocol, with a kernel library cache like the runtime's
+    if ``kernel_cache`` is set."""
+    def __init__(self, kernel_cache=True, fail_load=False):
+        self.kernel_cache = kernel_cache
+        self.fail_load = fail_load
+        self.cache = dict()
+        self.loaded = []
+        self.runs = 0
+        self.kernel_loaded = False
+        self.received_bytes = 0
+
+        self.listener = socket.socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(1)
+        self.port = self.listener.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.listener.close()
+        self.thread.join()
+
+    def _read(self, length):
+        data = b""
+        while len(data) < length:
+            chunk = self.connection.recv(length - len(data))
+            if not chunk:
+                raise ConnectionResetError
+            data += chunk
+        self.received_bytes += len(data)
+        return data
+
+    def _read_bytes(self):
+        length, = struct.unpack("<l", self._read(4))
+        return self._read(length)
+
+    def _reply(self, ty, payload=b""):
+        self.connection.sendall(b"\x5a"*4 + bytes([ty]) + payload)
+
+    def _load(self, library):
+        if self.fail_load:
+            message = b"invalid library"
+            self._reply(6, struct.pack("<l", len(message)) + message)
+        else:
+            self.loaded.append(bytes(library))
+            self.kernel_loaded = True
+            self._reply(5)
+
+    def _run(self):
+        if self.kernel_loaded:
+            self.runs += 1
+            self.kernel_loaded = False
+            self._reply(7, b"\x00")
+        else:
+            self._reply(8)
+
+    def _serve(self):
+        self.connection, _ = self.listener.accept()
+        with self.connection:
+            assert self._read(14) == b"ARTIQ coredev\n"
+            self.connection.sendall(b"e")
+            try:
+                while True:
+                    assert self._read(4) == b"\x5a"*4
+                    ty = self._read(1)[0]
+                    if ty == 3:
+                        ident = b"7.0.test;fake"
+                        if self.kernel_cache:
+                            ident += b";kernel_cache"
+                        self._reply(2, b"AROR" + struct.pack("<l", len(ident))
+                                    + ident + b"\x01")
+                    elif ty == 5:
+                        self._load(self._read_bytes())
+                    elif ty == 6:
+                        self._run()
+                    elif ty == 9:
+                        library = self.cache.get(self._read_bytes())
+                        if library is None:
+                            self._reply(16)
+                        else:
+                            self._load(library)
+                    elif ty == 10:
+                        digest = self._read_bytes()
+                        library = self._read_bytes()
+                        self._load(library)
+                        if not self.fail_load:
+                            self.cache[digest] = library
+                    elif ty == 11:
+                        digest = self._read_bytes()
+                        self.cache[digest] = self._read_bytes()
+                    else:
+                        raise ValueError(ty)
+            except ConnectionResetError:
+                pass
+
+
+class KernelLoadCase(unittest.TestCase):
+    def connect(self, **kwargs):
+        device = FakeCoreDevice(**kwargs)
+        comm = CommKernel("127.0.0.1", device.port)
+        comm.check_system_info()
+        self.addCleanup(device.close)
+        self.addCleanup(comm.close)
+        return device, comm
+
+    def test_cached(self):
+        device, comm = self.connect()
+        self.assertTrue(comm.kernel_cache)
+        library = bytes(range(256))*64
+        for _ in range(3):
+            comm.load(library)
+        other = b"other library"
+        comm.load(other)
+        comm.close()
+        device.thread.join()
+        self.assertEqual(device.loaded, [library]*3 + [other])
+        self.assertEqual(comm.kernel_cache_hits, 2)
+        self.assertEqual(comm.kernel_upload_bytes, len(library) + len(other))
+        self.assertLess(device.received_bytes, 2*len(library))
+
+    def test_evicted(self):
+        device, comm = self.connect()
+        library = b"kernel library"
+        comm.load(library)
+        device.cache.clear()
+        comm.load(library)
+        comm.load(library)
+        comm.close()
+        device.thread.join()
+        self.assertEqual(device.loaded, [library]*3)
+        self.assertEqual(comm.kernel_cache_hits, 1)
+        self.assertEqual(comm.kernel_upload_bytes, 2*len(library))
+
+    def test_old_runtime(self):
+        device, comm = self.connect(kernel_cache=False)
+        self.assertFalse(comm.kernel_cache)
+        library = b"kernel library"
+        comm.load(library)
+        comm.load(library)
+        comm.close()
+        device.thread.join()
+        self.assertEqual(device.loaded, [library]*2)
+        self.assertEqual(comm.kernel_upload_bytes, 2*len(library))
+
+    def test_load_failed(self):
+        device, comm = self.connect(fail_load=True)
+        with self.assertRaisesRegex(LoadError, "invalid library"):
+            comm.load(b"kernel library")
+        self.assertEqual(comm.cached_kernels, set())
+
+    def run_kernel(self, comm, library, prefetch=None):
+        comm.load_and_run(library, prefetch)
+        comm.serve(None, None, None)
+
+    def test_pipelined(self):
+        device, comm = self.connect()
+        library = b"kernel library"
+        for _ in range(3):
+            self.run_kernel(comm, library)
+        device.cache.clear()
+        self.run_kernel(comm, library)
+        self.assertEqual(device.runs, 4)
+        self.assertEqual(comm.kernel_cache_hits, 2)
+        self.assertEqual(comm.kernel_upload_bytes, 2*len(library))
+
+    def test_pipelined_old_runtime(self):
+        device, comm = self.connect(kernel_cache=False)
+        self.run_kernel(comm, b"kernel library", prefetch=b"next")
+        self.run_kernel(comm, b"kernel library")
+        self.assertEqual(device.runs, 2)
+        self.assertEqual(device.cache, dict())
+
+    def test_pipelined_load_failed(self):
+        device, comm = self.connect(fail_load=True)
+        for _ in range(2):
+            with self.assertRaisesRegex(LoadError, "invalid library"):
+                self.run_kernel(comm, b"kernel library")
+        self.assertEqual(device.runs, 0)
+
+    def test_prefetch(self):
+        device, comm = self.connect()
+        first, second = b"first library", b"second library"
+        self.run_kernel(comm, first, prefetch=second)
+        self.run_kernel(comm, second, prefetch=second)
+        self.run_kernel(comm, first, prefetch=second)
+        comm.close()
+        device.thread.join()
+        self.assertEqual(device.loaded, [first, second, first])
+        self.assertEqual(comm.kernel_cache_hits, 2)
+        self.assertEqual(comm.kernel_upload_bytes, len(first) + len(second))
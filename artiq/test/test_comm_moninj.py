@@ -0,0 +1,32 @@
+import unittest
+import struct
+
+from artiq.coredevice.comm_moninj import parse_packets
+
+
+class ParsePacketsCase(unittest.TestCase):
+    def test_split(self):
+        received = []
+        packet_types = {
+            0: (struct.Struct("<lbq"), lambda *args: received.append(args)),
+            1: (struct.Struct("<lbb"), lambda *args: received.append(args))
+        }
+        data = (struct.pack("<blbq", 0, 1, 2, 3) +
+                struct.pack("<blbb", 1, 4, 5, 6) +
+                struct.pack("<blbq", 0, 7, 8, 9))
+        self.assertEqual(parse_packets(data, packet_types), len(data))
+        self.assertEqual(received, [(1, 2, 3), (4, 5, 6), (7, 8, 9)])
+
+        received.clear()
+        buffer = bytearray(data[:20])
+        consumed = parse_packets(buffer, packet_types)
+        self.assertEqual(consumed, 14)
+        self.assertEqual(received, [(1, 2, 3)])
+        del buffer[:consumed]
+        buffer += data[20:]
+        self.assertEqual(parse_packets(buffer, packet_types), len(buffer))
+        self.assertEqual(received, [(1, 2, 3), (4, 5, 6), (7, 8, 9)])
+
+    def test_unknown_type(self):
+        with self.assertRaises(ValueError):
+            parse_packets(b"\x05", {})
@@ -0,0 +1,127 @@
+import copy
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from sipyco.sync_struct import process_mod
+
+from artiq.master.databases import DatasetDB
+from artiq.tools import DatasetVersionChecker, array_delta
+
+
+class ArrayDeltaCase(unittest.TestCase):
+    def test_delta(self):
+        old = np.zeros(1000)
+        new = old.copy()
+        self.assertEqual(array_delta(old, new), [])
+        new[10] = 1
+        new[500:510] = 2
+        self.assertEqual(array_delta(old, new), [(10, 11), (500, 510)])
+        # Close ranges are merged.
+        new[13] = 1
+        self.assertEqual(array_delta(old, new), [(10, 14), (500, 510)])
+        # Raw bytes are compared.
+        new[:] = 0
+        new[0] = -0.
+        new[1] = np.nan
+        old[1] = np.nan
+        self.assertEqual(array_delta(old, new), [(0, 1)])
+
+    def test_rows(self):
+        old = np.zeros((100, 10), dtype=np.int32)
+        new = old.copy()
+        new[20, 3] = 1
+        self.assertEqual(array_delta(old, new), [(20, 21)])
+
+    def test_unsupported(self):
+        a = np.zeros(10)
+        self.assertIsNone(array_delta(a, np.zeros(11)))
+        self.assertIsNone(array_delta(a, np.zeros(10, dtype=np.int64)))
+        self.assertIsNone(array_delta(a, list(a)))
+        self.assertIsNone(array_delta(np.array(1.), np.array(2.)))
+        self.assertIsNone(array_delta(a, np.ones(10)))
+        self.assertEqual(array_delta(a, np.ones(10), max_fraction=1.),
+                         [(0, 10)])
+
+
+class DatasetDBCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.ddb = DatasetDB(os.path.join(self.tmpdir.name, "db.pyon"))
+        self.mods = []
+        self.ddb.data.publish = self.mods.append
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_delta(self):
+        subscriber = dict()
+        value = np.arange(10000.)
+        self.ddb.set("x", value.copy())
+        value[100:110] = -1
+        self.ddb.set("x", value.copy())
+        self.ddb.set("x", value.copy())
+        value[:] = 0
+        self.ddb.set("x", value.copy())
+        epoch = self.ddb.epoch
+        self.assertEqual([mod["version"] for mod in self.mods],
+                         [(epoch, 1), (epoch, 2), (epoch, 3)])
+        self.assertEqual(self.mods[1]["path"], ["x", 1])
+        self.assertEqual(self.mods[1]["key"], slice(100, 110))
+        self.assertEqual(len(self.mods[1]["value"]), 10)
+        for mod in self.mods:
+            process_mod(subscriber, copy.deepcopy(mod))
+        np.testing.assert_equal(subscriber["x"][1], value)
+        version, (persist, stored) = self.ddb.get_versioned("x")
+        self.assertEqual(version, (epoch, 3))
+        np.testing.assert_equal(stored, value)
+
+    def test_versions(self):
+        self.ddb.set("a", 1)
+        self.ddb.set("b", [1], persist=True)
+        self.ddb.update({"action": "append", "path": ["b", 1], "x": 2})
+        self.ddb.delete("a")
+        self.ddb.set("a", 2)
+        self.assertEqual([(mod["action"], mod["version"][1])
+                          for mod in self.mods],
+                         [("setitem", 1), ("setitem", 1), ("append", 2),
+                          ("delitem", 2), ("setitem", 1)])
+        self.assertEqual(self.ddb.get_versioned("b"),
+                         ((self.ddb.epoch, 2), (True, [1, 2])))
+        # Versions of another instance (e.g. after a restart) are distinct.
+        other = DatasetDB(os.path.join(self.tmpdir.name, "db.pyon"))
+        self.assertNotEqual(other.epoch, self.ddb.epoch)
+        # Small arrays are sent whole.
+        self.ddb.set("c", np.zeros(4))
+        self.ddb.set("c", np.ones(4))
+        self.assertEqual(self.mods[-1]["path"], [])
+
+    def test_version_checker(self):
+        checker = DatasetVersionChecker()
+        self.assertTrue(checker.check({"action": "init", "struct": {}}))
+        self.ddb.set("a", 1)
+        self.ddb.set("a", 2)
+        self.ddb.set("b", 1)
+        self.ddb.set("a", 3)
+        self.ddb.delete("a")
+        self.ddb.set("a", 4)
+        for mod in self.mods:
+            self.assertTrue(checker.check(mod))
+
+        self.ddb.set("a", 5)
+        self.ddb.set("a", 6)
+        self.ddb.set("b", 2)
+        self.assertFalse(checker.check(self.mods[-2]))
+        self.assertTrue(checker.check(self.mods[-1]))
+        # Mods of other instances are not consecutive.
+        other = DatasetDB(os.path.join(self.tmpdir.name, "db.pyon"))
+        other.data.publish = self.mods.append
+        other.set("b", 3)
+        self.assertFalse(checker.check(self.mods[-1]))
+        # Versions are only known after the first mod of each key.
+        self.assertTrue(checker.check({"action": "init", "struct": {}}))
+        self.assertTrue(checker.check(self.mods[-2]))
+        self.assertTrue(checker.check({"action": "setitem", "path": [],
+                                       "key": "c", "value": (False, 0)}))
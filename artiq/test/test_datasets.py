@@ -3,6 +3,9 @@
 import copy
 import unittest
 
+import h5py
+import numpy as np
+
 from sipyco.sync_struct import process_mod
 
 from artiq.experiment import EnvExperiment
@@ -103,3 +106,32 @@ class ExperimentDatasetCase(unittest.TestCase):
         with self.assertRaises(KeyError):
             self.exp.append(KEY, 0)
 
+    def test_hdf5_options(self):
+        data = np.arange(10000, dtype=np.float64)
+        self.exp.set(KEY, data, hdf5_options="gzip")
+        self.exp.set("narrow", data, hdf5_options={"profile": "lzf",
+                                                   "dtype": "float32"})
+        self.exp.set("chunked", data, hdf5_options={"chunks": (100, )})
+        self.exp.set("scalar", 1.5, hdf5_options="gzip")
+        self.exp.set("plain", data)
+        with self.assertRaises(ValueError):
+            self.exp.set("invalid", data, hdf5_options="unknown")
+        with self.assertRaises(ValueError):
+            self.exp.set("invalid", data, hdf5_options={"maxshape": None})
+
+        with h5py.File("test.h5", "w", "core", backing_store=False) as f:
+            self.dataset_mgr.write_hdf5(f)
+            datasets = f["datasets"]
+            self.assertEqual(datasets[KEY].compression, "gzip")
+            self.assertTrue(datasets[KEY].shuffle)
+            self.assertEqual(datasets["narrow"].compression, "lzf")
+            self.assertEqual(datasets["narrow"].dtype, np.float32)
+            self.assertEqual(datasets["chunked"].chunks, (100, ))
+            self.assertIsNone(datasets["plain"].compression)
+            self.assertEqual(datasets["scalar"][()], 1.5)
+            for key in KEY, "narrow", "chunked", "plain":
+                np.testing.assert_equal(datasets[key][()], data)
+
+        # Options are dropped when the dataset is set again.
+        self.exp.set(KEY, data)
+        self.assertNotIn(KEY, self.dataset_mgr.hdf5_options)
@@ -3,9 +3,12 @@
 import os
 import unittest
 import tempfile
+from concurrent.futures import Future
 from pathlib import Path
 
-from artiq.master.databases import DeviceDB
+from artiq.master.databases import DeviceDB, DeviceDBCache
+from artiq.master.worker_db import (DeviceManager, DeviceError, DummyDevice,
+                                    _BackgroundClient, _freeze)
 from artiq.tools import file_import
 
 
@@ -116,3 +119,167 @@ device_db["core_log"] = {
         raw = file_import(self.ddb_file.name).device_db
 
         self.assertEqual(ddb, raw)
+
+
+COUNTING_DDB_FILE = """
+with open(__file__ + ".count", "a") as f:
+    f.write("x")
+""" + DUMMY_DDB_FILE
+
+
+class TestDeviceDBCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmpdir.name, "cache")
+        self.ddb_file = os.path.join(self.tmpdir.name, "device_db.py")
+        with open(self.ddb_file, "w") as f:
+            f.write(COUNTING_DDB_FILE)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def evaluations(self):
+        with open(self.ddb_file + ".count") as f:
+            return len(f.read())
+
+    def cached_ddb(self):
+        return DeviceDB(self.ddb_file, use_cache=True,
+                        cache_dir=self.cache_dir)
+
+    def test_reuse(self):
+        ddb = self.cached_ddb()
+        self.assertEqual(self.evaluations(), 1)
+        other = self.cached_ddb()
+        self.assertEqual(self.evaluations(), 1)
+        self.assertEqual(other.get_device_db(), ddb.get_device_db())
+        self.assertEqual(other.get("core_alias", resolve_alias=True),
+                         ddb.get("core"))
+
+        DeviceDB(self.ddb_file)
+        self.assertEqual(self.evaluations(), 2)
+
+    def test_invalidation(self):
+        ddb = self.cached_ddb()
+        with open(self.ddb_file, "a") as f:
+            f.write("device_db[\"extra\"] = \"core\"\n")
+        ddb.scan()
+        self.assertEqual(self.evaluations(), 2)
+        self.assertEqual(ddb.get("extra"), "core")
+        other = self.cached_ddb()
+        self.assertEqual(self.evaluations(), 2)
+        self.assertEqual(other.get("extra"), "core")
+
+        # Same contents with a new modification time: the hash matches.
+        os.utime(self.ddb_file, ns=(0, 0))
+        self.cached_ddb()
+        self.assertEqual(self.evaluations(), 2)
+
+    def test_scan(self):
+        # Explicit scans evaluate the file again, even if its sources are
+        # unchanged, since it may depend on other data.
+        data_file = os.path.join(self.tmpdir.name, "data")
+        with open(data_file, "w") as f:
+            f.write("1")
+        with open(self.ddb_file, "a") as f:
+            f.write("device_db[\"data\"] = open({!r}).read()\n"
+                    .format(data_file))
+        for ddb in DeviceDB(self.ddb_file), self.cached_ddb():
+            with open(data_file, "w") as f:
+                f.write("2")
+            ddb.scan()
+            self.assertEqual(ddb.get("data"), "2")
+            with open(data_file, "w") as f:
+                f.write("1")
+        ddb.scan()
+        self.assertEqual(self.cached_ddb().get("data"), "1")
+
+    def test_imported_sources(self):
+        sibling = os.path.join(self.tmpdir.name, "ddb_cache_sibling.py")
+        with open(sibling, "w") as f:
+            f.write(DUMMY_DDB_FILE)
+        main = os.path.join(self.tmpdir.name, "ddb_cache_main.py")
+        with open(main, "w") as f:
+            f.write("from ddb_cache_sibling import device_db\n")
+        _, sources = DeviceDBCache(self.cache_dir).load(main)
+        self.assertIn(os.path.abspath(sibling), sources)
+        self.assertIn(os.path.abspath(main), sources)
+
+
+DUMMY_DEVICES_DDB_FILE = """
+device_db = {
+    "dummy": {"type": "dummy"},
+    "dummy_alias": "dummy",
+    "other_dummy": {"type": "dummy"},
+    "unreachable": {
+        "type": "controller",
+        "host": "::1",
+        "port": 1,
+    },
+}
+"""
+
+
+class TestDeviceManager(unittest.TestCase):
+    def setUp(self):
+        self.ddb_file = tempfile.NamedTemporaryFile(
+            mode="w+", suffix=".py", delete=False
+        )
+        print(DUMMY_DEVICES_DDB_FILE, file=self.ddb_file, flush=True)
+
+        self.device_mgr = DeviceManager(DeviceDB(self.ddb_file.name))
+
+    def tearDown(self):
+        self.device_mgr.close_devices()
+        self.ddb_file.close()
+        os.unlink(self.ddb_file.name)
+
+    def test_get(self):
+        dummy = self.device_mgr.get("dummy")
+        self.assertIsInstance(dummy, DummyDevice)
+        self.assertIs(self.device_mgr.get("dummy"), dummy)
+        self.assertIs(self.device_mgr.get("dummy_alias"), dummy)
+        # identical descriptions share the same instance
+        self.assertIs(self.device_mgr.get("other_dummy"), dummy)
+        self.assertEqual(len(self.device_mgr.active_devices), 1)
+        self.assertIn("dummy", self.device_mgr.construction_times)
+
+    def test_connection(self):
+        with self.assertRaisesRegex(DeviceError, "unreachable"):
+            self.device_mgr.get("unreachable")
+
+    def test_background_connection(self):
+        self.device_mgr.connect_in_background = True
+        controller = self.device_mgr.get("unreachable")
+        with self.assertRaisesRegex(DeviceError, "unreachable"):
+            self.device_mgr.wait_connections()
+        with self.assertRaisesRegex(DeviceError, "unreachable"):
+            controller.ping()
+
+    def test_background_client(self):
+        future = Future()
+        future.set_result(DummyDevice())
+        client = _BackgroundClient(future)
+        self.assertTrue(client.done())
+        self.assertIsInstance(client.resolve(), DummyDevice)
+        self.assertIn("DummyDevice", repr(client))
+
+    def test_resolved_devices(self):
+        self.device_mgr.connect_in_background = True
+        dummy = self.device_mgr.get("dummy")
+        future = Future()
+        self.device_mgr.active_devices.append((None, _BackgroundClient(future)))
+        # Connecting clients are skipped without waiting.
+        self.assertEqual(self.device_mgr.resolved_devices(), [dummy])
+        client = DummyDevice()
+        future.set_result(client)
+        self.assertEqual(self.device_mgr.resolved_devices(), [dummy, client])
+        self.device_mgr.get("unreachable")
+        with self.assertRaises(DeviceError):
+            self.device_mgr.wait_connections()
+        self.assertEqual(self.device_mgr.resolved_devices(), [dummy, client])
+
+    def test_freeze(self):
+        self.assertNotEqual(_freeze({"a": 1}), _freeze([("a", 1)]))
+        self.assertNotEqual(_freeze([1, 2]), _freeze((1, 2)))
+        self.assertEqual(_freeze({"a": [1], "b": 2}),
+                         _freeze({"b": 2, "a": [1]}))
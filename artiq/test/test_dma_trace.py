@@ -0,0 +1,97 @@
+import struct
+import unittest
+
+import numpy
+
+from artiq.coredevice.comm_kernel import CommKernel
+from artiq.coredevice.dma import encode_trace, decode_trace
+from artiq.sim.comm_kernel import CoreEmulator
+
+
+def record_output(timestamp, target, words):
+    # Reference encoder, following dma_record_output_prepare in
+    # ksupport/lib.rs.
+    length = 13 + 4*len(words)
+    return (bytes([length]) + struct.pack("<l", target)[1:]
+            + struct.pack("<q", timestamp) + bytes([target & 0xff])
+            + b"".join(struct.pack("<l", word) for word in words))
+
+
+class TraceCase(unittest.TestCase):
+    def test_encode(self):
+        timestamp = [0, 8, 1000, 1000]
+        channel = [1, 2, 0x123456, 1]
+        address = [0, 1, 255, 0]
+        data = [1, -1, 0x7fffffff, 0]
+        expected = b"".join(
+            record_output(t, (c << 8) | a, [d])
+            for t, c, a, d in zip(timestamp, channel, address, data))
+        self.assertEqual(encode_trace(timestamp, channel, address, data),
+                         expected)
+        # Unsigned data words are accepted.
+        self.assertEqual(encode_trace([0], [1], 0, [0xffffffff]),
+                         record_output(0, 0x100, [-1]))
+
+    def test_wide(self):
+        data = numpy.arange(12).reshape(4, 3)
+        trace = encode_trace(numpy.arange(4)*8, 5, 0, data)
+        expected = b"".join(record_output(8*i, 0x500, list(data[i]))
+                            for i in range(4))
+        self.assertEqual(trace, expected)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            encode_trace([0], [1 << 24], 0, [0])
+        with self.assertRaises(ValueError):
+            encode_trace([0], [1], 256, [0])
+        with self.assertRaises(ValueError):
+            encode_trace([0], [1], 0, [1 << 32])
+        with self.assertRaises(ValueError):
+            encode_trace([0], [1], 0, numpy.zeros((1, 17)))
+        with self.assertRaises(ValueError):
+            decode_trace(b"\x05\x00\x00\x00\x00")
+
+    def test_roundtrip(self):
+        rng = numpy.random.default_rng(0)
+        count = 10000
+        timestamp = numpy.cumsum(rng.integers(0, 100, count))
+        channel = rng.integers(0, 1 << 24, count)
+        address = rng.integers(0, 256, count)
+        data = rng.integers(-2**31, 2**31, count)
+        trace = encode_trace(timestamp, channel, address, data)
+        # The runtime appends a terminating record.
+        for events in decode_trace(trace), decode_trace(trace + b"\x00"):
+            self.assertEqual(events["timestamp"].tolist(), timestamp.tolist())
+            self.assertEqual(events["channel"].tolist(), channel.tolist())
+            self.assertEqual(events["address"].tolist(), address.tolist())
+            self.assertTrue((events["words"] == 1).all())
+            self.assertEqual(events["data"][:, 0].tolist(), data.tolist())
+
+    def test_decode_mixed(self):
+        trace = (record_output(0, 0x100, [1]) +
+                 record_output(8, 0x201, [2, 3, 4]) +
+                 record_output(16, 0x100, [0]) + b"\x00")
+        events = decode_trace(trace)
+        self.assertEqual(events["timestamp"].tolist(), [0, 8, 16])
+        self.assertEqual(events["channel"].tolist(), [1, 2, 1])
+        self.assertEqual(events["address"].tolist(), [0, 1, 0])
+        self.assertEqual(events["words"].tolist(), [1, 3, 1])
+        self.assertEqual(events["data"][1, :4].tolist(), [2, 3, 4, 0])
+
+
+class UploadCase(unittest.TestCase):
+    def test_upload(self):
+        emulator = CoreEmulator(executor=object(), port=0)
+        emulator.start()
+        try:
+            comm = CommKernel("127.0.0.1", emulator.port)
+            comm.check_system_info()
+            trace = encode_trace(numpy.arange(100)*8, 3, 0,
+                                 numpy.arange(100) & 1)
+            comm.dma_upload("pulses", trace, 800)
+            # The upload has no reply; wait for the emulator to process it.
+            comm.check_system_info()
+            comm.close()
+        finally:
+            emulator.stop()
+        self.assertEqual(emulator.dma_traces["pulses"], (trace, 800))
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+
+from artiq.master.experiments import GitBackend
+
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
+
+@unittest.skipIf(pygit2 is None, "pygit2 is not installed")
+class GitBackendCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+        self.repo = pygit2.init_repository(self.root)
+        self.signature = pygit2.Signature("test", "test@example.com")
+
+    def tearDown(self):
+        self.backend.close()
+        self.tmpdir.cleanup()
+
+    def commit(self, message, files, removed=()):
+        for path, data in files.items():
+            filename = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with open(filename, "w") as f:
+                f.write(data)
+        index = self.repo.index
+        for path in removed:
+            os.remove(os.path.join(self.root, path))
+            index.remove(path)
+        index.add_all()
+        index.write()
+        tree = index.write_tree()
+        parents = [] if self.repo.head_is_unborn else [self.repo.head.target]
+        return str(self.repo.create_commit(
+            "HEAD", self.signature, self.signature, message, tree, parents))
+
+    def read(self, path, filename):
+        with open(os.path.join(path, filename)) as f:
+            return f.read()
+
+    def test_checkouts(self):
+        rev1 = self.commit("first", {"common.py": "common",
+                                     "exp.py": "v1",
+                                     "lib/old.py": "old"})
+        rev2 = self.commit("second", {"exp.py": "v2", "lib/new.py": "new"},
+                           removed=["lib/old.py"])
+        self.backend = GitBackend(self.root, cache_size=1)
+
+        path1, message = self.backend.request_rev(rev1)
+        self.assertEqual(message, "first")
+        self.assertEqual(self.read(path1, "exp.py"), "v1")
+        self.backend.release_rev(rev1)
+        # Idle checkouts are reused.
+        self.assertEqual(self.backend.request_rev(rev1)[0], path1)
+
+        # New revisions are derived from the closest checkout.
+        path2, message = self.backend.request_rev(rev2)
+        self.assertEqual(message, "second")
+        self.assertNotEqual(path2, path1)
+        self.assertEqual(self.read(path2, "exp.py"), "v2")
+        self.assertEqual(self.read(path2, "lib/new.py"), "new")
+        self.assertFalse(os.path.exists(os.path.join(path2, "lib", "old.py")))
+        self.assertEqual(self.read(path1, "exp.py"), "v1")
+        self.assertTrue(os.path.exists(os.path.join(path1, "lib", "old.py")))
+        self.assertEqual(os.stat(os.path.join(path1, "common.py")).st_ino,
+                         os.stat(os.path.join(path2, "common.py")).st_ino)
+        self.assertNotEqual(os.stat(os.path.join(path1, "exp.py")).st_ino,
+                            os.stat(os.path.join(path2, "exp.py")).st_ino)
+
+        # The least recently used idle checkout is evicted.
+        self.backend.release_rev(rev1)
+        self.assertTrue(os.path.isdir(path1))
+        self.backend.release_rev(rev2)
+        self.assertFalse(os.path.exists(path1))
+        self.assertEqual(self.backend.request_rev(rev2)[0], path2)
+        self.backend.release_rev(rev2)
+
+        # Checkouts derived from a derived checkout are complete.
+        path1, _ = self.backend.request_rev(rev1)
+        self.assertEqual(sorted(os.listdir(path1)),
+                         ["common.py", "exp.py", "lib"])
+        self.assertEqual(self.read(path1, "exp.py"), "v1")
+        self.assertEqual(self.read(path1, "lib/old.py"), "old")
+        self.assertFalse(os.path.exists(os.path.join(path1, "lib", "new.py")))
+        self.backend.release_rev(rev1)
+
+    def test_close(self):
+        rev = self.commit("first", {"exp.py": "v1"})
+        self.backend = GitBackend(self.root)
+        path, _ = self.backend.request_rev(rev)
+        self.backend.release_rev(rev)
+        self.backend.close()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(self.backend.cache_root))
@@ -0,0 +1,62 @@
+import random
+import re
+import unittest
+
+from artiq.gui.fuzzy_index import FuzzyIndex
+
+
+def regex_search(choices, query):
+    # Ranking of the regex scan that FuzzyIndex replaces.
+    suggestions = []
+    pattern = re.compile(".*?".join(map(re.escape, query)),
+                         flags=re.IGNORECASE)
+    for label, weight in choices:
+        matches = []
+        pos = 0
+        while True:
+            r = pattern.search(label, pos=pos)
+            if not r:
+                break
+            start, stop = r.span()
+            matches.append((stop - start - weight, start, label))
+            pos = start + 1
+        if matches:
+            suggestions.append(min(matches))
+    return [x for _, _, x in sorted(suggestions)]
+
+
+class FuzzyIndexCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        labels = {"".join(rng.choice("abcAB_./")
+                          for _ in range(rng.randrange(1, 20)))
+                  for _ in range(2000)}
+        self.choices = sorted(((label, rng.choice([0, 0, 1, 5]))
+                               for label in labels),
+                              key=lambda a: (a[1], a[0]))
+        self.index = FuzzyIndex(self.choices)
+
+    def check(self, query, limit=10):
+        expected = regex_search(self.choices, query)
+        labels, num_matches = self.index.search(query, limit)
+        self.assertEqual(num_matches, len(expected), query)
+        self.assertEqual(labels, expected[:limit], query)
+
+    def test_queries(self):
+        rng = random.Random(1)
+        for _ in range(100):
+            query = "".join(rng.choice("abcAB_./x")
+                            for _ in range(rng.randrange(1, 6)))
+            self.check(query, rng.choice([2, 10, 100]))
+
+    def test_narrow_widen(self):
+        # The index reuses the matches of the previous query.
+        for query in ["a", "ab", "abc", "aBc.", "ab", "b", "b_", "a_b",
+                      "c", "cc", "cca", "a"]:
+            self.check(query)
+
+    def test_weights(self):
+        index = FuzzyIndex([("a_b", 0), ("ab", 0), ("xa_b", 2)])
+        self.assertEqual(index.search("AB", 10), (["xa_b", "ab", "a_b"], 3))
+        self.assertEqual(index.search("ab", 1), (["xa_b"], 3))
+        self.assertEqual(index.search("abx", 10), ([], 0))
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+
+from artiq.gui.lazy_datasets import (
+    DatasetCache, LazyDataset, list_datasets, resolve)
+
+
+class LazyDatasetsCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "results.h5")
+        self.image = np.arange(100*64*64, dtype=np.uint16).reshape(100, 64, 64)
+        with h5py.File(self.filename, "w") as f:
+            f["archive/a"] = 1.5
+            f["archive/b"] = np.arange(10)
+            f["datasets/b"] = np.arange(5)
+            f["datasets/images"] = self.image
+            f["datasets/group/x"] = 42
+        self.cache = DatasetCache(max_bytes=2*self.image.nbytes)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def list(self):
+        with h5py.File(self.filename, "r") as f:
+            with self.assertLogs("artiq.gui.lazy_datasets", "WARNING"):
+                return list_datasets(f, self.cache)
+
+    def test_list(self):
+        rd = self.list()
+        self.assertEqual(set(rd.keys()), {"a", "b", "images", "group/x"})
+        self.assertEqual(rd["a"], (True, 1.5))
+        self.assertEqual(rd["group/x"], (True, 42))
+        self.assertEqual(rd["b"][1].tolist(), list(range(5)))
+        images = rd["images"][1]
+        self.assertIsInstance(images, LazyDataset)
+        self.assertEqual(images.shape, (100, 64, 64))
+        self.assertEqual(images.dtype, np.uint16)
+        self.assertEqual(images.nbytes, self.image.nbytes)
+        self.assertEqual(self.cache.nbytes, 0)
+
+    def test_load(self):
+        images = self.list()["images"][1]
+        np.testing.assert_equal(images[3, :2], self.image[3, :2])
+        self.assertEqual(self.cache.nbytes, 0)
+        np.testing.assert_equal(resolve(images), self.image)
+        self.assertEqual(self.cache.nbytes, self.image.nbytes)
+        # Selecting the file again uses the cached value.
+        images = self.list()["images"][1]
+        os.rename(self.filename, self.filename + ".moved")
+        np.testing.assert_equal(images.load(), self.image)
+        np.testing.assert_equal(images[5], self.image[5])
+
+    def test_cache(self):
+        cache = DatasetCache(max_bytes=130)
+        cache.put("a", np.zeros(10))
+        cache.put("b", np.zeros(5))
+        cache.get("a")
+        cache.put("c", np.zeros(5))
+        self.assertEqual(cache.nbytes, 120)
+        with self.assertRaises(KeyError):
+            cache.get("b")
+        cache.put("d", np.zeros(20))
+        self.assertEqual(cache.nbytes, 120)
+        with self.assertRaises(KeyError):
+            cache.get("d")
@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+import unittest
+
+from artiq.master.log import (
+    LogRecordDecoder, StructuredLogHandler, LogBatcher,
+    encode_log_record, log_batch_channel)
+
+
+class FakeBroadcaster:
+    def __init__(self):
+        self.messages = []
+
+    def broadcast(self, channel, message):
+        self.messages.append((channel, message))
+
+
+class StructuredLogCase(unittest.TestCase):
+    def test_decoder(self):
+        records = [(logging.INFO, 1.5, "foo", "message"),
+                   (logging.ERROR, 2.5, "foo.bar", "multi\nline"),
+                   (logging.DEBUG, 3.5, "", ""),
+                   (25, 4.5, "unicode", "µs")]
+        data = b"".join(encode_log_record(*r) for r in records)
+        for chunk_size in 1, 7, len(data):
+            decoder = LogRecordDecoder()
+            decoded = []
+            for i in range(0, len(data), chunk_size):
+                decoded += decoder.feed(data[i:i+chunk_size])
+            self.assertEqual(decoded, records)
+
+    def test_handler(self):
+        r, w = os.pipe()
+        logger = logging.getLogger("artiq.test.structured")
+        logger.propagate = False
+        handler = StructuredLogHandler(w, interval=1000)
+        logger.addHandler(handler)
+        try:
+            logger.warning("value %d", 42)
+            try:
+                raise ValueError("failed")
+            except ValueError:
+                logger.error("exception", exc_info=True)
+            handler.flush()
+            records = LogRecordDecoder().feed(os.read(r, 65536))
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+            os.close(r)
+            os.close(w)
+        self.assertEqual([r[0] for r in records],
+                         [logging.WARNING, logging.ERROR])
+        self.assertEqual(records[0][2:], ("artiq.test.structured",
+                                          "value 42"))
+        self.assertIn("ValueError: failed", records[1][3])
+
+    def test_stop_thread(self):
+        r, w = os.pipe()
+        handler = StructuredLogHandler(w, interval=0.01)
+        try:
+            handler.emit(logging.makeLogRecord(
+                {"name": "artiq.test", "levelno": logging.INFO,
+                 "msg": "before"}))
+            handler.stop_thread()
+            self.assertNotIn("log-flush",
+                             [thread.name for thread in threading.enumerate()])
+            # Buffered records are written when the thread stops.
+            records = LogRecordDecoder().feed(os.read(r, 65536))
+            self.assertEqual([r[3] for r in records], ["before"])
+            handler.start_thread()
+            handler.emit(logging.makeLogRecord(
+                {"name": "artiq.test", "levelno": logging.INFO,
+                 "msg": "after"}))
+            records = LogRecordDecoder().feed(os.read(r, 65536))
+            self.assertEqual([r[3] for r in records], ["after"])
+        finally:
+            handler.close()
+            os.close(r)
+            os.close(w)
+
+
+class LogBatcherCase(unittest.TestCase):
+    def test_flush(self):
+        broadcaster = FakeBroadcaster()
+        batcher = LogBatcher(broadcaster)
+        messages = [(level, "worker", 0.0, "foo:message")
+                    for level in (logging.INFO, 5, logging.ERROR,
+                                  logging.WARNING)]
+        for msg in messages:
+            batcher.append(msg)
+        self.assertEqual(broadcaster.messages, [])
+        batcher.flush()
+        batches = dict(broadcaster.messages)
+        self.assertEqual(batches[log_batch_channel(logging.DEBUG)],
+                         messages)
+        self.assertEqual(batches[log_batch_channel(logging.INFO)],
+                         [messages[0], messages[2], messages[3]])
+        self.assertEqual(batches[log_batch_channel(logging.WARNING)],
+                         messages[2:])
+        self.assertEqual(batches[log_batch_channel(logging.ERROR)],
+                         [messages[2]])
+        self.assertNotIn(log_batch_channel(logging.CRITICAL), batches)
+        broadcaster.messages.clear()
+        batcher.flush()
+        self.assertEqual(broadcaster.messages, [])
+
+    def test_legacy_channel(self):
+        broadcaster = FakeBroadcaster()
+        batcher = LogBatcher(broadcaster, legacy_channel=True)
+        msg = (logging.INFO, "worker", 0.0, "foo:message")
+        batcher.append(msg)
+        self.assertEqual(broadcaster.messages, [("log", msg)])
+        broadcaster.messages.clear()
+        batcher.flush()
+        self.assertNotIn("log", dict(broadcaster.messages))
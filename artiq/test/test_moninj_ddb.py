@@ -0,0 +1,125 @@
+import unittest
+
+from artiq.dashboard.moninj_ddb import (
+    DescriptionTracker, WidgetDesc, setup_from_ddb)
+
+
+def ttl(channel, cls="TTLOut"):
+    return {"type": "local", "module": "artiq.coredevice.ttl",
+            "class": cls, "arguments": {"channel": channel}}
+
+
+def dds(channel, sysclk=3e9):
+    return {"type": "local", "module": "artiq.coredevice.ad9914",
+            "class": "AD9914",
+            "arguments": {"bus_channel": 10, "channel": channel,
+                          "sysclk": sysclk}}
+
+
+def spi(channel):
+    return {"type": "local", "module": "artiq.coredevice.spi2",
+            "class": "SPIMaster", "arguments": {"channel": channel}}
+
+
+def zotino(spi_device):
+    return {"type": "local", "module": "artiq.coredevice.zotino",
+            "class": "Zotino", "arguments": {"spi_device": spi_device}}
+
+
+class DescriptionTrackerCase(unittest.TestCase):
+    def setUp(self):
+        self.ddb = {
+            "core_moninj": {"type": "controller", "host": "::1",
+                            "port_proxy": 1383},
+            "ttl0": ttl(0),
+            "ttl1": ttl(1, "TTLInOut"),
+            "dds0": dds(0),
+            "spi_zotino": spi(5),
+            "spi_alias": "spi_zotino",
+            "zotino": zotino("spi_alias"),
+        }
+        self.tracker = DescriptionTracker()
+        self.removed, self.added = self.tracker.update(
+            self.ddb, {"action": "init", "struct": self.ddb})
+
+    def apply(self, mod):
+        if mod["action"] == "setitem":
+            target = self.ddb
+            for key in mod["path"]:
+                target = target[key]
+            target[mod["key"]] = mod["value"]
+        elif mod["action"] == "delitem":
+            del self.ddb[mod["key"]]
+        return self.tracker.update(self.ddb, mod)
+
+    def check_consistent(self):
+        _, _, dds_sysclk, description = setup_from_ddb(self.ddb)
+        self.assertEqual(self.tracker.description, description)
+        self.assertEqual(self.tracker.dds_sysclk, dds_sysclk)
+
+    def test_init(self):
+        self.assertEqual(self.removed, set())
+        self.assertEqual(len(self.added), 2 + 1 + 32)
+        self.assertIn(WidgetDesc("ttl0", None, "ttl", (0, True, "ttl0")),
+                      self.added)
+        self.assertIn(WidgetDesc(("zotino", 3), None, "dac",
+                                 (5, 3, "zotino")),
+                      self.added)
+        self.assertEqual((self.tracker.mi_addr, self.tracker.mi_port),
+                         ("::1", 1383))
+        self.assertEqual(self.tracker.dds_sysclk, 3e9)
+        self.check_consistent()
+
+    def test_add_remove(self):
+        removed, added = self.apply({"action": "setitem", "path": [],
+                                     "key": "ttl2", "value": ttl(2)})
+        self.assertEqual(removed, set())
+        self.assertEqual(added, {WidgetDesc("ttl2", None, "ttl",
+                                            (2, True, "ttl2"))})
+        removed, added = self.apply({"action": "delitem", "path": [],
+                                     "key": "ttl0"})
+        self.assertEqual(removed, {WidgetDesc("ttl0", None, "ttl",
+                                              (0, True, "ttl0"))})
+        self.assertEqual(added, set())
+        removed, added = self.apply({"action": "delitem", "path": [],
+                                     "key": "dds0"})
+        self.assertEqual(len(removed), 1)
+        self.assertIsNone(self.tracker.dds_sysclk)
+        removed, added = self.apply({"action": "delitem", "path": [],
+                                     "key": "core_moninj"})
+        self.assertEqual((removed, added), (set(), set()))
+        self.assertEqual((self.tracker.mi_addr, self.tracker.mi_port),
+                         (None, None))
+        self.check_consistent()
+
+    def test_update(self):
+        # Modifying an entry only replaces the widgets of that entry.
+        removed, added = self.apply({"action": "setitem",
+                                     "path": ["ttl1", "arguments"],
+                                     "key": "channel", "value": 7})
+        self.assertEqual(removed, {WidgetDesc("ttl1", None, "ttl",
+                                              (1, False, "ttl1"))})
+        self.assertEqual(added, {WidgetDesc("ttl1", None, "ttl",
+                                            (7, False, "ttl1"))})
+        # Unrelated modifications do not change any widget.
+        removed, added = self.apply({"action": "setitem", "path": ["ttl0"],
+                                     "key": "comment", "value": None})
+        self.assertEqual((removed, added), (set(), set()))
+        self.check_consistent()
+
+    def test_dependencies(self):
+        # Modifying the SPI bus of a DAC, through an alias, replaces
+        # the widgets of the DAC.
+        removed, added = self.apply({"action": "setitem",
+                                     "path": ["spi_zotino", "arguments"],
+                                     "key": "channel", "value": 6})
+        self.assertEqual(len(removed), 32)
+        self.assertEqual({desc.arguments[0] for desc in added}, {6})
+        removed, added = self.apply({"action": "setitem", "path": [],
+                                     "key": "spi_alias", "value": "spi2"})
+        self.assertEqual(len(removed), 32)
+        self.assertEqual(added, set())
+        removed, added = self.apply({"action": "setitem", "path": [],
+                                     "key": "spi2", "value": spi(8)})
+        self.assertEqual({desc.arguments[0] for desc in added}, {8})
+        self.check_consistent()
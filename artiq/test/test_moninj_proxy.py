@@ -0,0 +1,125 @@
+import asyncio
+import struct
+import unittest
+
+from artiq.frontend.aqctl_moninj_proxy import (
+    MonitorMux, ProxyConnection, ProxyControl)
+
+
+class FakeTransport:
+    def get_extra_info(self, name):
+        return ("::1", 12345)
+
+    def get_write_buffer_size(self):
+        return 0
+
+
+class FakeWriter:
+    """Writer that holds its data until :meth:`release` is called, to
+    simulate a slow client."""
+    def __init__(self):
+        self.transport = FakeTransport()
+        self.data = bytearray()
+        self.drained = asyncio.Event()
+        self.drained.set()
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        await self.drained.wait()
+
+
+class FakeCommMonInj:
+    def __init__(self):
+        self.monitored = set()
+
+    def monitor_probe(self, enable, channel, probe):
+        if enable:
+            self.monitored.add((channel, probe))
+        else:
+            self.monitored.discard((channel, probe))
+
+    def monitor_injection(self, enable, channel, overrd):
+        pass
+
+
+class FakeProxyServer:
+    def __init__(self, connections):
+        self.connections = connections
+
+
+def decode(data):
+    packets = []
+    offset = 0
+    while offset < len(data):
+        if data[offset] == 0:
+            packet = struct.unpack_from("<blbq", data, offset)
+            offset += 14
+        else:
+            packet = struct.unpack_from("<blbb", data, offset)
+            offset += 7
+        packets.append(packet)
+    return packets
+
+
+class ProxyConnectionCase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    async def _test_coalescing(self):
+        mux = MonitorMux()
+        mux.comm_moninj = FakeCommMonInj()
+        writer = FakeWriter()
+        connection = ProxyConnection(mux, None, writer)
+        mux.monitor_probe(connection, True, 1, 0)
+        mux.monitor_probe(connection, True, 2, 0)
+        mux.monitor_injection(connection, True, 1, 1)
+        self.assertEqual(mux.comm_moninj.monitored, {(1, 0), (2, 0)})
+        flush_task = asyncio.ensure_future(connection._flush_cr())
+        try:
+            mux.monitor_cb(1, 0, 10)
+            await asyncio.sleep(0.01)
+            self.assertEqual(decode(writer.data), [(0, 1, 0, 10)])
+
+            # The client is slow: a burst of updates is coalesced into the
+            # latest value of each channel.
+            writer.drained.clear()
+            mux.monitor_cb(1, 0, 11)
+            await asyncio.sleep(0.01)
+            for value in range(100):
+                mux.monitor_cb(1, 0, value)
+                mux.monitor_cb(2, 0, -value)
+                mux.injection_status_cb(1, 1, value % 2)
+            # Events of channels without listeners are ignored.
+            mux.monitor_cb(3, 0, 1)
+            writer.drained.set()
+            await asyncio.sleep(0.01)
+            self.assertEqual(decode(writer.data),
+                             [(0, 1, 0, 10), (0, 1, 0, 99), (0, 2, 0, -99),
+                              (1, 1, 1, 1)])
+
+            metrics = connection.get_metrics()
+            self.assertEqual(metrics["events"], 302)
+            self.assertEqual(metrics["coalesced_events"], 100 + 99*2)
+            self.assertEqual(metrics["bytes_sent"], len(writer.data))
+            self.assertEqual(metrics["pending_updates"], 0)
+            self.assertEqual(mux.events, 303)
+
+            control = ProxyControl(mux, FakeProxyServer({connection}))
+            metrics = control.get_metrics()
+            self.assertEqual(metrics["events"], 303)
+            self.assertEqual(metrics["monitored"], 3)
+            self.assertEqual(metrics["clients"][0]["events"], 302)
+
+            mux.remove_listener(connection)
+            self.assertEqual(mux.comm_moninj.monitored, set())
+        finally:
+            flush_task.cancel()
+
+    def test_coalescing(self):
+        self.loop.run_until_complete(self._test_coalescing())
@@ -0,0 +1,95 @@
+import asyncio
+import unittest
+
+from sipyco import pyon
+
+from artiq.master.publisher import Publisher, filtered_name
+
+
+class Notifier:
+    def __init__(self, raw_view):
+        self.raw_view = raw_view
+        self.publish = None
+
+    def __setitem__(self, key, value):
+        self.raw_view[key] = value
+        self.publish({"action": "setitem", "path": [], "key": key,
+                      "value": value})
+
+    def mutate(self, key, index, value):
+        self.raw_view[key][1][index] = value
+        self.publish({"action": "setitem", "path": [key, 1], "key": index,
+                      "value": value})
+
+
+test_port = 7777
+
+
+async def subscribe(name):
+    reader, writer = await asyncio.open_connection("::1", test_port)
+    writer.write(b"ARTIQ sync_struct\n" + name.encode() + b"\n")
+    return reader, writer
+
+
+async def receive(reader, count):
+    return [pyon.decode((await reader.readline()).decode())
+            for _ in range(count)]
+
+
+class PublisherCase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    async def _test_filters(self):
+        datasets = Notifier({"a": (False, 1), "b": (False, [0, 0]),
+                             "scan.x": (False, 2), "scan.y": (False, 3)})
+        publisher = Publisher({"datasets": datasets})
+        await publisher.start("::1", test_port)
+        try:
+            all_ = await subscribe("datasets")
+            keys = await subscribe(filtered_name("datasets", keys={"b"}))
+            prefix = await subscribe(filtered_name("datasets",
+                                                   prefixes=["scan."]))
+            init, = await receive(all_[0], 1)
+            self.assertEqual(set(init["struct"].keys()),
+                             {"a", "b", "scan.x", "scan.y"})
+            init, = await receive(keys[0], 1)
+            self.assertEqual(init["struct"], {"b": (False, [0, 0])})
+            init, = await receive(prefix[0], 1)
+            self.assertEqual(set(init["struct"].keys()), {"scan.x", "scan.y"})
+            # Let the publisher register the subscribers.
+            await asyncio.sleep(0.1)
+
+            datasets["a"] = (False, 10)
+            datasets.mutate("b", 1, 5)
+            datasets["scan.z"] = (False, 4)
+            datasets["c"] = (False, 6)
+
+            mods = await receive(all_[0], 4)
+            self.assertEqual([mod["key"] for mod in mods],
+                             ["a", 1, "scan.z", "c"])
+            mod, = await receive(keys[0], 1)
+            self.assertEqual(mod["path"], ["b", 1])
+            self.assertEqual(mod["value"], 5)
+            mod, = await receive(prefix[0], 1)
+            self.assertEqual(mod["key"], "scan.z")
+            for reader, writer in all_, keys, prefix:
+                writer.close()
+            await asyncio.sleep(0.1)
+            datasets["b"] = (False, None)
+        finally:
+            await publisher.stop()
+
+    def test_filters(self):
+        self.loop.run_until_complete(self._test_filters())
+
+    def test_filtered_name(self):
+        # Optional datasets that were not given are None.
+        name = filtered_name("datasets", keys={"b", None, "a"})
+        self.assertEqual(name, filtered_name("datasets", keys=["a", "b"]))
+        self.assertEqual(pyon.decode(name.partition("?")[2])["keys"],
+                         ["a", "b"])
@@ -0,0 +1,140 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import h5py
+
+from sipyco import pyon
+
+from artiq.master.results_catalog import (
+    CATALOG_NAME, ResultsCatalog, CatalogIndexer, find_catalog, read_metadata)
+
+
+def write_results(filename, rid, thumbnail=None):
+    with h5py.File(filename, "w") as f:
+        f["artiq_version"] = "7.0"
+        f["rid"] = rid
+        f["start_time"] = 1234.5
+        f["run_time"] = 1235.5
+        f["expid"] = pyon.encode({"class_name": "Foo", "repo_rev": "abc"})
+        if thumbnail is not None:
+            f["datasets/thumbnail"] = thumbnail
+
+
+class ResultsCatalogCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+        self.catalog = ResultsCatalog(os.path.join(self.root, "catalog.db"))
+
+    def tearDown(self):
+        self.catalog.close()
+        self.tmpdir.cleanup()
+
+    def results_file(self, name, rid, thumbnail=None):
+        directory = os.path.join(self.root, "2021-01-01", "12")
+        os.makedirs(directory, exist_ok=True)
+        filename = os.path.join(directory, name)
+        write_results(filename, rid, thumbnail)
+        return filename
+
+    def test_add(self):
+        filename = self.results_file("000000001-Foo.h5", 1, b"\x89PNG")
+        self.assertIsNone(self.catalog.lookup(filename))
+        with h5py.File(filename, "r") as f:
+            metadata = read_metadata(f)
+        self.catalog.add(filename, metadata)
+        entry = self.catalog.lookup(filename)
+        self.assertEqual(entry["rid"], 1)
+        self.assertEqual(entry["start_time"], 1234.5)
+        self.assertEqual(entry["artiq_version"], "7.0")
+        self.assertEqual(entry["expid"]["class_name"], "Foo")
+        self.assertTrue(entry["has_thumbnail"])
+        self.assertEqual(self.catalog.thumbnail(filename), b"\x89PNG")
+        # Paths are relative to the catalog.
+        self.assertEqual(
+            self.catalog._connection().execute(
+                "SELECT path FROM results").fetchall(),
+            [(os.path.join("2021-01-01", "12", "000000001-Foo.h5"), )])
+
+    def test_stale(self):
+        filename = self.results_file("000000001-Foo.h5", 1)
+        self.assertFalse(self.catalog.index(filename)["has_thumbnail"])
+        write_results(filename, 2, b"thumbnail")
+        st = os.stat(filename)
+        os.utime(filename, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertIsNone(self.catalog.lookup(filename))
+        self.assertIsNone(self.catalog.thumbnail(filename))
+        self.assertEqual(self.catalog.index(filename)["rid"], 2)
+
+    def test_unreadable(self):
+        filename = self.results_file("000000001-Foo.h5", 1)
+        with h5py.File(filename, "w") as f:
+            f["rid"] = 1
+        entry = self.catalog.index(filename)
+        self.assertIsNone(entry["rid"])
+        self.assertIsNone(entry["expid"])
+
+    def test_index_tree(self):
+        filenames = [self.results_file("00000000{}-Foo.h5".format(i), i)
+                     for i in range(3)]
+        self.assertEqual(self.catalog.index_tree(self.root), 3)
+        self.assertEqual(self.catalog.index_tree(self.root), 0)
+        os.unlink(filenames[0])
+        self.catalog.index_tree(self.root)
+        self.assertEqual(
+            self.catalog._connection().execute(
+                "SELECT rid FROM results ORDER BY rid").fetchall(),
+            [(1, ), (2, )])
+
+    def test_indexer(self):
+        filenames = [self.results_file("00000000{}-Foo.h5".format(i), i)
+                     for i in range(3)]
+        indexed = []
+        indexer = CatalogIndexer(
+            self.catalog, lambda filename, entry:
+                indexed.append((filename, entry["rid"])))
+        try:
+            indexer.request(os.path.dirname(filenames[0]))
+            indexer.join()
+            indexer.request(filenames[1])
+            indexer.join()
+        finally:
+            indexer.close()
+        self.assertEqual(indexed, list(zip(filenames, range(3))) +
+                         [(filenames[1], 1)])
+
+    def test_indexer_requests(self):
+        filenames = [self.results_file("00000000{}-Foo.h5".format(i), i)
+                     for i in range(3)]
+        indexed = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def callback(filename, entry):
+            started.set()
+            release.wait()
+            indexed.append(entry["rid"])
+
+        indexer = CatalogIndexer(self.catalog, callback)
+        try:
+            indexer.request(filenames[0])
+            started.wait()
+            # Requests are served most recent first, once.
+            for filename in filenames[1], filenames[2], filenames[1]:
+                indexer.request(filename)
+            release.set()
+            indexer.join()
+        finally:
+            indexer.close()
+        self.assertEqual(indexed, [0, 1, 2])
+
+    def test_find_catalog(self):
+        self.assertIsNone(find_catalog(self.root))
+        results_dir = os.path.join(self.root, "results")
+        os.mkdir(results_dir)
+        filename = os.path.join(results_dir, CATALOG_NAME)
+        ResultsCatalog(filename).close()
+        self.assertEqual(find_catalog(self.root), filename)
+        self.assertEqual(find_catalog(results_dir), filename)
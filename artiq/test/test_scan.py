@@ -0,0 +1,95 @@
+import unittest
+
+import numpy
+
+from artiq.language.scan import (NoScan, RangeScan, CenterScan, ExplicitScan,
+                                 MultiScanManager)
+
+
+class ScanCase(unittest.TestCase):
+    def test_range(self):
+        self.assertEqual(list(RangeScan(0, 10, 4)), [0., 10/3, 20/3, 10.])
+        self.assertEqual(list(RangeScan(5, 6, 1)), [5])
+        self.assertEqual(list(RangeScan(5, 6, 0)), [])
+        self.assertEqual(RangeScan(5, 6, 0).sequence, [])
+
+        scan = RangeScan(-1., 1., 100001)
+        self.assertEqual(len(scan), 100001)
+        self.assertEqual(scan.points[50000], 0.)
+        self.assertEqual(scan.points[-1], 1.)
+        numpy.testing.assert_array_equal(scan.points[10:20],
+                                         list(scan)[10:20])
+
+    def test_sequence(self):
+        for scan in (RangeScan(0, 10, 4, randomize=True, seed=1),
+                     CenterScan(10., 4., 1.)):
+            self.assertIsInstance(scan.sequence, list)
+            self.assertEqual(scan.sequence, list(scan))
+            self.assertEqual(type(scan.sequence[0]), float)
+        scan = RangeScan(0, 10, 4)
+        scan.sequence = [1., 2.]
+        self.assertEqual(list(scan), [1., 2.])
+        msm = MultiScanManager(("x", scan))
+        self.assertEqual([p.x for p in msm], [1., 2.])
+        self.assertEqual(msm[1].x, 2.)
+
+    def test_center(self):
+        self.assertEqual(list(CenterScan(10., 4., 1.)),
+                         [10., 9., 11., 8., 12.])
+        self.assertEqual(list(CenterScan(10., 2., 0.)), [])
+        self.assertEqual(len(CenterScan(10., 5., 1.)), 5)
+
+    def test_randomize(self):
+        scan = RangeScan(0, 1, 101, randomize=True, seed=42)
+        self.assertEqual(sorted(scan), list(RangeScan(0, 1, 101)))
+        self.assertEqual(list(scan), list(scan))
+        self.assertEqual(list(scan),
+                         list(RangeScan(0, 1, 101, randomize=True, seed=42)))
+        self.assertNotEqual(list(scan), sorted(scan))
+
+        scan = CenterScan(0., 10., 1., randomize=True)
+        self.assertEqual(list(scan), list(scan))
+        self.assertEqual(sorted(scan), sorted(CenterScan(0., 10., 1.)))
+
+
+class MultiScanManagerCase(unittest.TestCase):
+    def test_indexing(self):
+        msm = MultiScanManager(("a", RangeScan(0, 3, 4)),
+                               ("b", NoScan(7, 2)),
+                               ("c", ExplicitScan([1, 2, 3])))
+        points = [(p.a, p.b, p.c) for p in msm]
+        self.assertEqual(len(msm), len(points))
+        self.assertEqual([(msm[i].a, msm[i].b, msm[i].c)
+                          for i in range(len(msm))], points)
+
+        chunks = list(msm.chunks(5))
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(list(zip(*(numpy.concatenate([getattr(c, name)
+                                                       for c in chunks])
+                                    for name in "abc"))),
+                         points)
+
+    def test_empty(self):
+        msm = MultiScanManager(("x", RangeScan(5, 6, 0)),
+                               ("y", RangeScan(0, 1, 2)))
+        self.assertEqual(len(msm), 0)
+        self.assertEqual(list(msm), [])
+        self.assertEqual(len(msm[:].x), 0)
+        self.assertEqual(list(msm.chunks(10)), [])
+
+    def test_large(self):
+        msm = MultiScanManager(("x", RangeScan(0, 1, 1001)),
+                               ("y", RangeScan(0, 1, 1001)),
+                               ("z", CenterScan(0, 1, 0.01)))
+        self.assertEqual(len(msm), 1001*1001*101)
+        point = msm[-1]
+        self.assertEqual((point.x, point.y, point.z), (1., 1., 0.5))
+        start = 1001*101 - 150
+        chunk = msm[start:start + 300]
+        self.assertEqual(len(chunk.z), 300)
+        self.assertEqual(chunk.x[0], 0.)
+        self.assertEqual(chunk.x[-1], 0.001)
+        for i in range(0, 300, 7):
+            point = msm[start + i]
+            self.assertEqual((point.x, point.y, point.z),
+                             (chunk.x[i], chunk.y[i], chunk.z[i]))
@@ -0,0 +1,250 @@
+import threading
+import unittest
+
+from artiq.coredevice import exceptions
+from artiq.coredevice.comm_kernel import CommKernel, LoadError
+from artiq.sim.comm_kernel import CoreEmulator
+
+try:
+    from llvmlite import binding as llvm
+except ImportError:
+    llvm = None
+
+
+class EmbeddingMap:
+    def __init__(self, objects):
+        self.objects = objects
+        self.strings = ["0:artiq.coredevice.exceptions.RuntimeError",
+                        "0:artiq.coredevice.exceptions.RTIOUnderflow"]
+
+    def retrieve_object(self, key):
+        return self.objects[key]
+
+    def store_str(self, s):
+        if s not in self.strings:
+            self.strings.append(s)
+        return self.strings.index(s)
+
+    def retrieve_str(self, key):
+        return self.strings[key]
+
+
+class PythonExecutor:
+    """Executor running Python functions, looked up by kernel library."""
+    def __init__(self, kernels):
+        self.kernels = kernels
+
+    def load(self, library):
+        return self.kernels[bytes(library)]
+
+
+class PythonKernel:
+    def __init__(self, function):
+        self.function = function
+
+    def run(self, context):
+        self.function(context)
+
+
+def rtio_kernel(context):
+    context.rtio_output(1000, 0x100, 1)
+    context.rtio_output(1008, 0x100, 0)
+
+
+def rpc_kernel(context):
+    total = context.rpc(1, b"i:i", [41])
+    context.rpc(2, b"I:n", [total], is_async=True)
+    values = context.rpc(3, b"i:li", [4])
+    context.rpc(2, b"I:n", [int(sum(values))], is_async=True)
+    context.rpc(2, b"s:n", [context.rpc(4, b":s", [])], is_async=True)
+
+
+def rpc_exception_kernel(context):
+    context.rpc(5, b":n", [])
+    context.rtio_output(1000, 0x100, 1)
+
+
+def underflow_kernel(context):
+    context.rtio_output(0, 0x200, 1)
+
+
+class CoreEmulatorCase(unittest.TestCase):
+    def setUp(self):
+        self.results = []
+
+        def fail():
+            raise ValueError("failed")
+
+        self.embedding_map = EmbeddingMap({
+            1: lambda x: x + 1,
+            2: self.results.append,
+            3: lambda n: list(range(n)),
+            4: lambda: "hello",
+            5: fail,
+        })
+        self.executor = PythonExecutor({
+            b"rtio": PythonKernel(rtio_kernel),
+            b"rpc": PythonKernel(rpc_kernel),
+            b"rpc_exception": PythonKernel(rpc_exception_kernel),
+            b"underflow": PythonKernel(underflow_kernel),
+        })
+        self.emulator = CoreEmulator(self.executor, port=0)
+        self.emulator.start()
+        self.comm = CommKernel("127.0.0.1", self.emulator.port)
+        self.comm.check_system_info()
+
+    def tearDown(self):
+        self.comm.close()
+        self.emulator.stop()
+
+    def run_kernel(self, library):
+        self.comm.load_and_run(library)
+        self.comm.serve(self.embedding_map, lambda addresses: [],
+                        lambda names: names)
+
+    def test_system_info(self):
+        self.assertTrue(self.comm.kernel_cache)
+
+    def test_rtio(self):
+        self.run_kernel(b"rtio")
+        events = self.emulator.sed.events()
+        self.assertEqual(events["timestamp"].tolist(), [1000, 1008])
+        self.assertEqual(events["channel"].tolist(), [1, 1])
+        self.assertEqual(events["data"].tolist(), [1, 0])
+
+    def test_rpc(self):
+        self.run_kernel(b"rpc")
+        self.assertEqual(self.results, [42, 6, "hello"])
+        self.assertEqual(self.emulator.rpc_count, 6)
+
+    def test_rpc_exception(self):
+        with self.assertRaises(ValueError):
+            self.run_kernel(b"rpc_exception")
+        self.assertEqual(len(self.emulator.sed.events()), 0)
+        # The session is still usable.
+        self.run_kernel(b"rtio")
+
+    def test_underflow(self):
+        with self.assertRaises(exceptions.RTIOUnderflow) as cm:
+            self.run_kernel(b"underflow")
+        self.assertIn("channel 2", str(cm.exception))
+
+    def test_load_failed(self):
+        with self.assertRaises(LoadError):
+            self.run_kernel(b"nonexistent")
+
+    def test_kernel_cache(self):
+        self.run_kernel(b"rtio")
+        self.run_kernel(b"rtio")
+        self.assertEqual(self.comm.kernel_cache_hits, 1)
+        self.assertEqual(self.emulator.kernels_run, 2)
+
+
+native_kernel = r"""
+%CSlice = type { i8*, i32 }
+
+@now = external global i64
+@tag = private constant [3 x i8] c"i:i"
+@tag.slice = private constant %CSlice {
+    i8* getelementptr ([3 x i8], [3 x i8]* @tag, i32 0, i32 0), i32 3 }
+
+declare void @rtio_output(i32, i32)
+declare void @rpc_send(i32, %CSlice*, i8**)
+declare i32 @rpc_recv(i8*)
+
+define void @__modinit__() {
+entry:
+  %now.hi = bitcast i64* @now to i32*
+  %now.lo = getelementptr i32, i32* %now.hi, i32 1
+  store i32 0, i32* %now.hi
+  store i32 1000, i32* %now.lo
+  call void @rtio_output(i32 256, i32 1)
+
+  %arg = alloca i32
+  store i32 41, i32* %arg
+  %args = alloca i8*
+  %arg.ptr = bitcast i32* %arg to i8*
+  store i8* %arg.ptr, i8** %args
+  call void @rpc_send(i32 1, %CSlice* @tag.slice, i8** %args)
+  %ret = alloca i32
+  %ret.ptr = bitcast i32* %ret to i8*
+  %size = call i32 @rpc_recv(i8* %ret.ptr)
+  %value = load i32, i32* %ret
+  call void @rtio_output(i32 512, i32 %value)
+  ret void
+}
+"""
+
+
+native_handler_kernel = r"""
+declare i32 @__artiq_personality(...)
+declare void @rtio_output(i32, i32)
+
+define void @__modinit__() personality i32 (...)* @__artiq_personality {
+entry:
+  invoke void @rtio_output(i32 256, i32 1) to label %done unwind label %catch
+done:
+  ret void
+catch:
+  %exn = landingpad { i8*, i8* } catch i8* null
+  ret void
+}
+"""
+
+
+@unittest.skipIf(llvm is None, "llvmlite is not available")
+class NativeExecutorCase(unittest.TestCase):
+    def compile(self, source):
+        llvm.initialize_native_target()
+        llvm.initialize_native_asmprinter()
+        target_machine = \
+            llvm.Target.from_default_triple().create_target_machine()
+        return target_machine.emit_object(llvm.parse_assembly(source))
+
+    def setUp(self):
+        self.emulator = CoreEmulator(port=0)
+        self.emulator.start()
+        self.comm = CommKernel("127.0.0.1", self.emulator.port)
+        self.comm.check_system_info()
+
+    def tearDown(self):
+        self.comm.close()
+        self.emulator.stop()
+
+    def test_run(self):
+        self.comm.load_and_run(self.compile(native_kernel))
+        self.comm.serve(EmbeddingMap({1: lambda x: x + 1}),
+                        lambda addresses: [], lambda names: names)
+        events = self.emulator.sed.events()
+        self.assertEqual(events["timestamp"].tolist(), [1000, 1000])
+        self.assertEqual(events["channel"].tolist(), [1, 2])
+        self.assertEqual(events["data"].tolist(), [1, 42])
+
+    def test_unsupported_symbol(self):
+        library = self.compile(native_kernel.replace("rtio_output",
+                                                     "dma_playback"))
+        with self.assertRaises(LoadError) as cm:
+            self.comm.load(library)
+        self.assertIn("dma_playback", str(cm.exception))
+
+    def test_exception(self):
+        threads = threading.active_count()
+        underflow = self.compile(native_kernel.replace("i32 1000", "i32 0"))
+        for _ in range(40):
+            with self.assertRaises(exceptions.RTIOUnderflow):
+                self.comm.load_and_run(underflow)
+                self.comm.serve(EmbeddingMap({}), lambda addresses: [],
+                                lambda names: names)
+        # The threads of terminated kernels end, except possibly the last
+        # one, which may still be exiting.
+        self.assertLessEqual(threading.active_count(), threads + 1)
+        self.comm.load_and_run(self.compile(native_kernel))
+        self.comm.serve(EmbeddingMap({1: lambda x: x + 1}),
+                        lambda addresses: [], lambda names: names)
+        events = self.emulator.sed.events()
+        self.assertEqual(events["data"].tolist()[-2:], [1, 42])
+
+    def test_exception_handler(self):
+        with self.assertRaises(LoadError) as cm:
+            self.comm.load(self.compile(native_handler_kernel))
+        self.assertIn("catches exceptions", str(cm.exception))
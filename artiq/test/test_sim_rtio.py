@@ -0,0 +1,102 @@
+import unittest
+
+from artiq.coredevice.exceptions import RTIOUnderflow
+from artiq.language.core import (at_mu, delay_mu, now_mu, parallel,
+                                 sequential)
+from artiq.sim import devices, time
+from artiq.sim.rtio import (SED, EVENT_UNDERFLOW, EVENT_SEQUENCE_ERROR,
+                            EVENT_COLLISION, EVENT_REPLACED, install)
+
+
+class SEDCase(unittest.TestCase):
+    def test_lanes(self):
+        sed = SED(lane_count=4)
+        sed.write(1000, 0, 0, 1)
+        sed.write(1008, 1, 0, 1)
+        sed.write(1000, 2, 0, 1)  # rewind: next lane
+        sed.write(1000, 3, 0, 1)  # same coarse timestamp: next lane
+        self.assertEqual(list(sed.events()["lane"]), [0, 0, 1, 2])
+        self.assertEqual(list(sed.events()["flags"]), [0]*4)
+
+    def test_sequence_error(self):
+        sed = SED(lane_count=2)
+        sed.write(1000, 0, 0, 1)
+        sed.write(1000, 1, 0, 1)
+        sed.write(1000, 2, 0, 1)
+        self.assertEqual(sed.sequence_errors, 1)
+        self.assertEqual(sed.events()["flags"][-1], EVENT_SEQUENCE_ERROR)
+        self.assertEqual(len(sed.output_events()), 2)
+
+    def test_replace(self):
+        sed = SED(replace_channels={0})
+        sed.write(1000, 0, 0, 1)
+        sed.write(1000, 0, 0, 0)
+        self.assertEqual(sed.replacements, 1)
+        self.assertEqual(sed.collisions, 0)
+        self.assertEqual(list(sed.events()["flags"]), [EVENT_REPLACED, 0])
+        self.assertEqual(list(sed.output_events()["data"]), [0])
+
+    def test_collision(self):
+        sed = SED(replace_channels={0})
+        sed.write(1000, 1, 0, 1)
+        sed.write(1000, 1, 0, 0)
+        sed.write(1000, 0, 0, 1)
+        sed.write(1001, 0, 0, 0)  # different fine timestamp
+        self.assertEqual(sed.collisions, 2)
+        self.assertEqual(list(sed.events()["flags"]),
+                         [EVENT_REPLACED, EVENT_COLLISION]*2)
+        self.assertEqual(len(sed.output_events()), 0)
+
+    def test_underflow(self):
+        sed = SED(write_cost=100)
+        with self.assertRaises(RTIOUnderflow):
+            sed.write(96, 0, 0, 1)
+        self.assertEqual(sed.events()["flags"][0], EVENT_UNDERFLOW)
+
+        sed = SED(write_cost=100, raise_underflow=False)
+        sed.write(96, 0, 0, 1)
+        self.assertEqual(sed.underflows, 1)
+
+    def test_stall(self):
+        sed = SED(lane_count=2, fifo_depth=4, write_cost=1)
+        for i in range(4):
+            sed.write(1000 + 8*i, 0, 0, i)
+        # The CPU waits until the first event leaves the lane.
+        self.assertEqual(sed.counter, 1000)
+        self.assertEqual(sed.stall_time, 1000 - 4)
+        # With spreading, the next event goes to the other lane.
+        sed.write(2000, 0, 0, 0)
+        self.assertEqual(sed.events()["lane"][-1], 1)
+
+
+class DeviceManager:
+    def __init__(self):
+        self.devices = dict()
+
+    def get(self, name):
+        return self.devices[name]
+
+
+class ManagerCase(unittest.TestCase):
+    def setUp(self):
+        self.previous_manager = time.manager
+        dmgr = DeviceManager()
+        self.core = dmgr.devices["core"] = devices.RTIOCore(
+            dmgr, print_timeline=False)
+        self.ttl0 = devices.TTLOut(dmgr, 0)
+        self.ttl1 = devices.TTLOut(dmgr, 1)
+
+    def tearDown(self):
+        install(self.previous_manager)
+
+    def test_parallel(self):
+        at_mu(1000)
+        with parallel:
+            self.ttl0.on()
+            with sequential:
+                delay_mu(50)
+                self.ttl1.pulse_mu(200)
+        self.assertEqual(now_mu(), 1250)
+        events = self.core.sed.output_events()
+        self.assertEqual(list(events["channel"]), [0, 1, 1])
+        self.assertEqual(list(events["timestamp"]), [1000, 1050, 1250])
@@ -0,0 +1,39 @@
+import unittest
+
+import numpy as np
+from numpy import int32
+
+from artiq.coredevice.spline import Spline
+
+
+class _Core:
+    coarse_ref_period = 8e-9
+
+
+class SplinePackCase(unittest.TestCase):
+    def check(self, spline):
+        rng = np.random.default_rng(0)
+        for order in range(1, 5):
+            with self.subTest(order=order):
+                coeff64 = rng.integers(-1 << 63, 1 << 63, (100, order),
+                                       dtype=np.int64)
+                coeff64 >>= rng.integers(0, 64, (100, order))
+                packed = spline.coeff_array_as_packed_mu(coeff64)
+                self.assertEqual(packed.dtype, int32)
+                for c, p in zip(coeff64, packed):
+                    self.assertEqual(spline.coeff_as_packed_mu(list(c)),
+                                     list(p))
+
+                coeff = rng.uniform(-.5, .5, (100, order))
+                coeff /= spline.time_scale**np.arange(order)
+                packed = spline.coeff_array_as_packed(coeff)
+                for c, p in zip(coeff, packed):
+                    self.assertEqual(spline.coeff_as_packed(list(c)),
+                                     list(p))
+
+    def test_sawg(self):
+        self.check(Spline(16, 16, 0, _Core()))
+
+    def test_wide(self):
+        # coefficients are wider than 64 bits
+        self.check(Spline(48, 32, 0, _Core()))
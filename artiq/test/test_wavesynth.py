@@ -1,10 +1,26 @@
 # Copyright (C) 2014, 2015 Robert Jordens <jordens@gmail.com>
 
 import unittest
+import logging
+import random
+from fractions import Fraction
+import time
+
+import numpy as np
 
 from artiq.wavesynth import compute_samples
 
 
+logger = logging.getLogger(__name__)
+
+
+class ReferenceSynthesizer(compute_samples.Synthesizer):
+    """Evaluates the channels sample by sample."""
+    def _line_samples(self, n):
+        return [np.array([channel.next() for _ in range(n)])
+                for channel in self.channels]
+
+
 class TestSynthesizer(unittest.TestCase):
     program = [
         [
@@ -125,3 +141,85 @@ class TestSynthesizer(unittest.TestCase):
         x, y = self.drive()
         plt.plot(x, y)
         plt.show()
+
+
+def random_program(seed, nchannels, nframes=3, nlines=5, max_duration=3000):
+    rng = random.Random(seed)
+
+    def coefficients(order):
+        return [rng.uniform(-1, 1)*10**-i for i in range(order)]
+
+    program = []
+    for frame in range(nframes):
+        lines = []
+        for line in range(nlines):
+            lines.append({
+                "duration": rng.randrange(1, max_duration),
+                "trigger": line in (0, nlines//2),
+                "channel_data": [{
+                    "bias": {"amplitude": coefficients(rng.randrange(5))},
+                    "dds": {"amplitude": coefficients(rng.randrange(1, 5)),
+                            "phase": coefficients(rng.randrange(1, 4)),
+                            "clear": rng.random() < 0.3},
+                    "silence": rng.random() < 0.2
+                } for channel in range(nchannels)]
+            })
+        program.append(lines)
+    return program
+
+
+class TestVectorizedSynthesizer(unittest.TestCase):
+    def run_program(self, cls, nchannels, program):
+        s = cls(nchannels, program)
+        r = []
+        for frame in range(len(program)):
+            s.select(frame)
+            while s.line_iter is not None:
+                r.append(s.trigger())
+        return r
+
+    def check(self, nchannels, program):
+        t0 = time.monotonic()
+        ref = self.run_program(ReferenceSynthesizer, nchannels, program)
+        t1 = time.monotonic()
+        r = self.run_program(compute_samples.Synthesizer, nchannels, program)
+        t2 = time.monotonic()
+        ref = np.array([x for y in ref for c in y for x in c])
+        r = np.array([x for y in r for c in y for x in c])
+        self.assertEqual(len(r), len(ref))
+        # The phase is evaluated in closed form instead of accumulated, and
+        # the rounding errors of both phases are scaled by the amplitude.
+        np.testing.assert_allclose(r, ref, rtol=0,
+                                   atol=1e-6*np.abs(ref).max(initial=1.))
+        return len(r), t1 - t0, t2 - t1
+
+    def test_reference(self):
+        self.check(1, TestSynthesizer.program)
+        for seed in range(3):
+            self.check(4, random_program(seed, 4))
+
+    def test_phase(self):
+        for c in [0.3], [0.1, 0.7], [0.2, -0.3, 1e-3], [0.9, 0.1, -1e-2, 1e-5]:
+            spline = compute_samples.SplinePhase()
+            spline.set_coefficients([0.25] + c[1:])
+            spline.c[0] = c[0]
+            exact = [Fraction(x) for x in spline.c]
+            for n in 0, 1, 1000, 7:
+                expected = []
+                for _ in range(n):
+                    expected.append(float(exact[0] + Fraction(0.25)))
+                    for i in range(len(exact) - 1):
+                        exact[i] = (exact[i] + exact[i + 1]) % 1
+                # Phases that differ by whole turns are equivalent.
+                difference = (spline.next_samples(n) - expected + 0.5) % 1.
+                self.assertLess(np.abs(difference - 0.5).max(initial=0.),
+                                1e-9)
+                difference = (np.array(spline.c) - exact + 0.5) % 1.
+                self.assertLess(np.abs(difference - 0.5).max(), 1e-9)
+
+    def test_benchmark(self):
+        samples, t_ref, t = self.check(
+            8, random_program(0, 8, max_duration=10000))
+        logger.debug("%d samples: reference %.3f s, vectorized %.3f s "
+                     "(%.1fx)", samples, t_ref, t, t_ref/t)
+        self.assertGreater(samples, 0)
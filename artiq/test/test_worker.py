@@ -1,8 +1,13 @@
 import unittest
 import logging
 import asyncio
+import glob
+import os
 import sys
-from time import sleep
+import tempfile
+from time import sleep, monotonic
+
+import h5py
 
 from artiq.experiment import *
 from artiq.master.worker import *
@@ -52,6 +57,14 @@ class WatchdogTimeoutInBuild(EnvExperiment):
         pass
 
 
+class DatasetExperiment(EnvExperiment):
+    def build(self):
+        pass
+
+    def run(self):
+        self.set_dataset("x", 42)
+
+
 async def _call_worker(worker, expid):
     try:
         await worker.build(0, "main", None, expid, 0)
@@ -62,7 +75,21 @@ async def _call_worker(worker, expid):
         await worker.close()
 
 
-def _run_experiment(class_name):
+_examined_experiments = """
+from artiq.experiment import *
+
+class DeviceDBExperiment1(EnvExperiment):
+    def build(self):
+        self.setattr_argument("devices", EnumerationValue(
+            sorted(self.get_device_db())))
+
+class DeviceDBExperiment2(EnvExperiment):
+    def build(self):
+        self.get_device_db()
+"""
+
+
+def _run_experiment(class_name, **kwargs):
     expid = {
         "log_level": logging.WARNING,
         "file": sys.modules[__name__].__file__,
@@ -70,7 +97,7 @@ def _run_experiment(class_name):
         "arguments": dict()
     }
     loop = asyncio.get_event_loop()
-    worker = Worker({})
+    worker = Worker({}, **kwargs)
     loop.run_until_complete(_call_worker(worker, expid))
 
 
@@ -101,5 +128,53 @@ class WorkerCase(unittest.TestCase):
         with self.assertRaises(WorkerWatchdogTimeout):
             _run_experiment("WatchdogTimeoutInBuild")
 
+    def test_background_results(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.chdir(tmpdir)
+            try:
+                _run_experiment("DatasetExperiment", background_results=True)
+                # The results file is written by a child process of the
+                # worker, which may still be running.
+                pattern = os.path.join("results", "*", "*",
+                                       "*-DatasetExperiment.h5")
+                deadline = monotonic() + 10.0
+                while True:
+                    try:
+                        filename, = glob.glob(pattern)
+                        with h5py.File(filename, "r") as f:
+                            value = f["datasets"]["x"][()]
+                        break
+                    except (ValueError, OSError, KeyError):
+                        if monotonic() > deadline:
+                            raise
+                        sleep(0.05)
+                self.assertEqual(value, 42)
+            finally:
+                os.chdir(cwd)
+
+    def test_examine_device_db(self):
+        requests = []
+
+        def get_device_db():
+            requests.append(None)
+            return {"core": {"type": "local"}, "ttl0": {"type": "local"}}
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file = os.path.join(tmpdir, "examined.py")
+            with open(file, "w") as f:
+                f.write(_examined_experiments)
+            worker = Worker({"get_device_db": get_device_db})
+            try:
+                r = self.loop.run_until_complete(worker.examine("examine", file))
+            finally:
+                self.loop.run_until_complete(worker.close())
+        self.assertEqual(sorted(r), ["DeviceDBExperiment1",
+                                     "DeviceDBExperiment2"])
+        procdesc = r["DeviceDBExperiment1"]["arginfo"]["devices"][0]
+        self.assertEqual(procdesc["choices"], ["core", "ttl0"])
+        # The device database is requested once, and only when needed.
+        self.assertEqual(len(requests), 1)
+
     def tearDown(self):
         self.loop.close()
@@ -20,7 +20,8 @@ from artiq.language.environment import is_public_experiment
 __all__ = ["parse_arguments", "elide", "short_format", "file_import",
            "get_experiment",
            "exc_to_warning", "asyncio_wait_or_cancel",
-           "get_windows_drives", "get_user_config_dir"]
+           "get_windows_drives", "get_user_config_dir",
+           "array_delta", "DatasetVersionChecker"]
 
 
 logger = logging.getLogger(__name__)
@@ -147,3 +148,64 @@ def get_user_config_dir():
     dir = user_config_dir("artiq", "m-labs", major)
     os.makedirs(dir, exist_ok=True)
     return dir
+
+
+def array_delta(old, new, max_fraction=0.5, merge_bytes=256):
+    """Compares two arrays of the same shape and type along their first
+    axis.
+
+    Returns the list of ``(start, stop)`` ranges of rows of ``new`` that
+    differ from ``old``, comparing the raw bytes of the elements, with ranges
+    separated by less than ``merge_bytes`` merged. Returns ``None`` if the
+    arrays cannot be compared this way, or if the ranges cover more than
+    ``max_fraction`` of ``new``.
+    """
+    if not (isinstance(old, np.ndarray) and isinstance(new, np.ndarray)):
+        return None
+    if (old.shape != new.shape or old.dtype != new.dtype or
+            new.ndim == 0 or new.dtype.hasobject or new.size == 0):
+        return None
+    rows = new.shape[0]
+    old_bytes = np.ascontiguousarray(old).view(np.uint8).reshape(rows, -1)
+    new_bytes = np.ascontiguousarray(new).view(np.uint8).reshape(rows, -1)
+    changed = (old_bytes != new_bytes).any(axis=1)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], changed, [0]))))
+    starts, stops = edges[::2], edges[1::2]
+    if len(starts) == 0:
+        return []
+    row_bytes = new_bytes.shape[1]
+    merge = (starts[1:] - stops[:-1])*row_bytes < merge_bytes
+    starts = np.concatenate((starts[:1], starts[1:][~merge]))
+    stops = np.concatenate((stops[:-1][~merge], stops[-1:]))
+    if (stops - starts).sum() > max_fraction*rows:
+        return None
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+class DatasetVersionChecker:
+    """Detects missed mods of the dataset database on the subscriber side,
+    from the versions sent by :class:`artiq.master.databases.DatasetDB`.
+
+    The version of a key is only known from its first mod after the initial
+    structure, which is not versioned.
+    """
+    def __init__(self):
+        self.versions = dict()
+
+    def check(self, mod):
+        """Processes a mod received by the subscriber, and returns False if
+        a mod of the key it modifies was missed."""
+        if mod["action"] == "init":
+            self.versions.clear()
+            return True
+        version = mod.get("version")
+        if version is None:
+            return True
+        epoch, counter = version
+        key = mod["path"][0] if mod["path"] else mod["key"]
+        last = self.versions.get(key)
+        if mod["action"] == "delitem" and not mod["path"]:
+            self.versions.pop(key, None)
+        else:
+            self.versions[key] = epoch, counter
+        return last is None or last == (epoch, counter - 1)
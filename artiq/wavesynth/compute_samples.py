@@ -2,11 +2,37 @@
 # Copyright (C) 2014, 2015 Robert Jordens <jordens@gmail.com>
 
 from copy import copy
-from math import cos, pi
+from math import comb, cos, pi
+
+import numpy as np
 
 from artiq.wavesynth.coefficients import discrete_compensate
 
 
+def accumulate(c, n):
+    """Evaluates chains of discrete accumulators over `n` samples.
+
+    Each row of `c` holds the coefficients of one chain. At each sample,
+    each coefficient is incremented by the next one, as in
+    :meth:`Spline.next`. The additions are carried out in the same order
+    (as cumulative sums over time), so that the results are identical to
+    the sample by sample evaluation.
+
+    Returns the values of the first coefficient of each chain at each
+    sample, and the coefficients after `n` samples.
+    """
+    c = np.array(c, dtype=float, ndmin=2)
+    order = c.shape[1]
+    end = c.copy()
+    # values of coefficient i at samples 0 to n
+    level = np.repeat(c[:, order - 1:], n + 1, axis=1)
+    for i in reversed(range(order - 1)):
+        level = np.concatenate([c[:, i:i + 1], level[:, :n]], axis=1)
+        np.add.accumulate(level, axis=1, out=level)
+        end[:, i] = level[:, n]
+    return level[:, :n], end
+
+
 class Spline:
     def __init__(self):
         self.c = [0.0]
@@ -23,6 +49,13 @@ class Spline:
             self.c[i] += self.c[i + 1]
         return r
 
+    def next_samples(self, n):
+        """Returns the next `n` samples as an array. Equivalent to `n`
+        calls to :meth:`next`."""
+        r, c = accumulate([self.c], n)
+        self.c = c[0].tolist()
+        return r[0]
+
 
 class SplinePhase:
     def __init__(self):
@@ -47,6 +80,29 @@ class SplinePhase:
             self.c[i] %= 1.0
         return r + self.c0
 
+    def next_samples(self, n):
+        """Returns the next `n` samples as an array. Equivalent to `n`
+        calls to :meth:`next`, up to rounding errors.
+
+        The wrapping accumulators are evaluated in closed form: after `t`
+        samples, coefficient `i` is the sum over `k` of
+        ``binomial(t, k)*c[i + k]``, modulo 1."""
+        c = self.c
+        t = np.arange(n, dtype=float)
+        r = np.zeros(n)
+        binomial = np.ones(n)
+        for k, ck in enumerate(c):
+            if k:
+                # exact for integers below 2**53
+                binomial = binomial*(t - (k - 1))/k
+            r += (binomial*ck) % 1.0
+        if n:
+            # the last coefficient is not accumulated
+            self.c = [sum(comb(n, k - i)*c[k] % 1.0
+                          for k in range(i, len(c))) % 1.0
+                      for i in range(len(c) - 1)] + c[-1:]
+        return r % 1.0 + self.c0
+
 
 class DDS:
     def __init__(self):
@@ -56,6 +112,11 @@ class DDS:
     def next(self):
         return self.amplitude.next()*cos(2*pi*self.phase.next())
 
+    def next_samples(self, n, amplitude=None):
+        if amplitude is None:
+            amplitude = self.amplitude.next_samples(n)
+        return amplitude*np.cos(self.phase.next_samples(n)*(2*pi))
+
 
 class Channel:
     def __init__(self):
@@ -70,6 +131,21 @@ class Channel:
             self.v = v
         return self.v
 
+    def next_samples(self, n, bias=None, amplitude=None):
+        """Returns the next `n` samples as an array. Equivalent to `n`
+        calls to :meth:`next`, up to the rounding errors of the phase.
+
+        The samples of the bias and of the DDS amplitude can be passed if
+        they have already been computed."""
+        if bias is None:
+            bias = self.bias.next_samples(n)
+        v = bias + self.dds.next_samples(n, amplitude)
+        if self.silence:
+            return np.full(n, self.v)
+        if n:
+            self.v = float(v[-1])
+        return v
+
     def set_silence(self, s):
         self.silence = s
 
@@ -92,6 +168,28 @@ class Synthesizer:
         self.line_iter = iter(self.program[selection])
         self.line = next(self.line_iter)
 
+    @staticmethod
+    def _spline_samples(splines, n):
+        # Splines of the same order are evaluated together.
+        r = [None]*len(splines)
+        by_order = dict()
+        for i, spline in enumerate(splines):
+            by_order.setdefault(len(spline.c), []).append(i)
+        for indices in by_order.values():
+            samples, c = accumulate([splines[i].c for i in indices], n)
+            for i, si, ci in zip(indices, samples, c):
+                r[i] = si
+                splines[i].c = ci.tolist()
+        return r
+
+    def _line_samples(self, n):
+        bias = self._spline_samples(
+            [channel.bias for channel in self.channels], n)
+        amplitude = self._spline_samples(
+            [channel.dds.amplitude for channel in self.channels], n)
+        return [channel.next_samples(n, b, a)
+                for channel, b, a in zip(self.channels, bias, amplitude)]
+
     def trigger(self):
         if self.line_iter is None:
             raise TriggerError("no frame selected")
@@ -120,9 +218,8 @@ class Synthesizer:
             if line.get("dac_divider", 1) != 1:
                 raise NotImplementedError
 
-            for channel, rc in zip(self.channels, r):
-                for i in range(line["duration"]):
-                    rc.append(channel.next())
+            for rc, samples in zip(r, self._line_samples(line["duration"])):
+                rc.extend(samples.tolist())
 
             try:
                 self.line = line = next(self.line_iter)